@@ -2,10 +2,14 @@
 # one directory. This should be the only module directly
 # included/executed from blender.
 #
+# the operator modules imported here only define the operators and menu
+# entries; they import the loaders, writers and rig modules (and with
+# them numpy, json, gzip, mathutils, bmesh) when an operator is run for
+# the first time, so enabling the add-on at startup stays cheap.
+# Logging is left to blender (or to the script running it).
 
 import logging
 
-logging.basicConfig (level = logging.INFO)
 log = logging.getLogger ('dsf')
 
 try:
@@ -23,7 +27,7 @@ except ImportError as e:
   # file is not included from within blender. Do not abort in this
   # case, because parts of this module are still useful.
   if str (e).find ('bpy') >= 0:
-    log.warn ("import error ignored: %s", e)
+    log.warning ("import error ignored: %s", e)
   else:
     raise
 
@@ -0,0 +1,43 @@
+# benchmarks for the parts of dsf-utils that do not need blender.
+# run a benchmark from the top directory, eg.:
+#   python bench/bench_linker.py
+import importlib, os, sys, time
+
+# the top directory of the add-on; modules there are imported directly.
+root_dir = os.path.dirname (os.path.dirname (os.path.abspath (__file__)))
+
+def setup_path ():
+  """make the modules of the add-on (and of modules/) importable.
+  """
+  for path in [root_dir, os.path.join (root_dir, 'modules')]:
+    if path not in sys.path:
+      sys.path.insert (0, path)
+
+def import_addon_module (name):
+  """import a module of the add-on as part of the add-on package, as
+     needed for modules with relative imports (eg. dsf_weightmap).
+  """
+  parent = os.path.dirname (root_dir)
+  if parent not in sys.path:
+    sys.path.insert (0, parent)
+  return importlib.import_module (os.path.basename (root_dir) + '.' + name)
+
+def measure (func, repeat = 5):
+  """call func repeat times and return the best time in seconds.
+  """
+  best = None
+  for i in range (repeat):
+    start = time.perf_counter ()
+    func ()
+    elapsed = time.perf_counter () - start
+    if best is None or elapsed < best:
+      best = elapsed
+  return best
+
+def report (name, seconds, count = None):
+  """print the result of a benchmark.
+  """
+  if count:
+    print ("%-30s %9.4fs  %10.0f/s" % (name, seconds, count / seconds))
+  else:
+    print ("%-30s %9.4fs" % (name, seconds))
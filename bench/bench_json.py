@@ -0,0 +1,88 @@
+# compare the json backends of dsf_io on a synthetic figure file.
+import argparse, gzip, json, os, sys, tempfile
+import numpy as np
+
+sys.path.insert (0, os.path.dirname (os.path.dirname (os.path.abspath (__file__))))
+import bench
+bench.setup_path ()
+import dsf_io
+
+# approximate size in bytes of the data written for one vertex.
+bytes_per_vertex = 100
+
+def make_figure (n_verts):
+  """create the json data of a figure with a quad grid of n_verts
+     vertices, a uv set and a morph.
+  """
+  side = max (2, int (n_verts ** 0.5))
+  rng = np.random.default_rng (1)
+  coords = np.round (rng.random ((side * side, 3)) * 100, 4)
+  (rows, cols) = np.mgrid[0:side-1,0:side-1]
+  first = (rows * side + cols).ravel ()
+  quads = np.stack ((first, first + 1, first + side + 1, first + side),
+                    axis = 1)
+  polys = np.concatenate\
+    ((np.zeros ((len (quads), 2), dtype = np.int64), quads), axis = 1)
+  uvs = np.round (rng.random ((side * side, 2)), 5)
+  deltas = np.concatenate\
+    ((np.arange (0, side * side, 3)[:,None],
+      np.round (rng.random ((len (range (0, side * side, 3)), 3)), 5)), axis = 1)
+  return {
+    'asset_info': {'id': '/data/bench/figure.dsf', 'type': 'figure'},
+    'geometry_library': [{
+      'id': 'geometry', 'type': 'polygon_mesh',
+      'vertices': {'count': len (coords), 'values': coords.tolist ()},
+      'polygon_groups': {'count': 1, 'values': ['default']},
+      'polygon_material_groups': {'count': 1, 'values': ['default']},
+      'polylist': {'count': len (polys), 'values': polys.tolist ()},
+    }],
+    'uv_set_library': [{
+      'id': 'default', 'vertex_count': len (uvs),
+      'uvs': {'count': len (uvs), 'values': uvs.tolist ()},
+      'polygon_vertex_indices': [],
+    }],
+    'modifier_library': [{
+      'id': 'morph', 'parent': '#geometry',
+      'morph': {'vertex_count': len (coords),
+                'deltas': {'count': len (deltas),
+                           'values': deltas.tolist ()}},
+    }],
+  }
+
+def read_codecs (filename):
+  """the old way of reading: json.load through a codecs reader.
+  """
+  return json.load (dsf_io.open_text_file (filename, encoding = 'latin1'))
+
+def main ():
+  parser = argparse.ArgumentParser\
+    (description = 'compare the json backends of dsf_io.')
+  parser.add_argument ('--size-mb', type = float, default = 100)
+  parser.add_argument ('--repeat', type = int, default = 3)
+  parser.add_argument ('--dir', default = None,
+                       help = 'directory for the generated files')
+  args = parser.parse_args ()
+  n_verts = int (args.size_mb * 2**20 / bytes_per_vertex)
+  with tempfile.TemporaryDirectory (dir = args.dir) as tmpdir:
+    plain = os.path.join (tmpdir, 'figure.dsf')
+    packed = os.path.join (tmpdir, 'figure-gz.dsf')
+    text = json.dumps (make_figure (n_verts))
+    with open (plain, 'w') as ofh:
+      ofh.write (text)
+    with gzip.open (packed, 'wt') as ofh:
+      ofh.write (text)
+    del text
+    size_mb = os.path.getsize (plain) / 2**20
+    print ("figure file: %.1f MB, gzipped %.1f MB"
+           % (size_mb, os.path.getsize (packed) / 2**20))
+    for (label, filename) in [('plain', plain), ('gzip', packed)]:
+      seconds = bench.measure (lambda: read_codecs (filename), args.repeat)
+      bench.report ("%s codecs/json" % (label), seconds)
+      for name in sorted (dsf_io.json_backends):
+        dsf_io.set_json_backend (name)
+        seconds = bench.measure\
+          (lambda: dsf_io.read_json_data (filename), args.repeat)
+        bench.report ("%s %s" % (label, name), seconds)
+
+if __name__ == '__main__':
+  main ()
@@ -0,0 +1,44 @@
+# resolve many references with dsf_linker.
+import argparse, os, sys
+
+sys.path.insert (0, os.path.dirname (os.path.dirname (os.path.abspath (__file__))))
+import bench
+bench.setup_path ()
+import dsf_linker
+
+class named (object):
+  """stand-in for a blender object; the linker only uses the name.
+  """
+  def __init__ (self, name):
+    self.name = name
+
+def run (refs, objects, contexts):
+  """create ids for objects spread over contexts and refs references
+     to them (from all contexts), then resolve them.
+  """
+  objs = [named ("object%d" % (i)) for i in range (objects)]
+  lnk = dsf_linker.linker ()
+  for (i, obj) in enumerate (objs):
+    lnk.push_context ("/data/file%d.dsf" % (i % contexts))
+    lnk.add_id ({}, 'id', obj, 'node')
+    lnk.pop_context ()
+  for i in range (refs):
+    lnk.push_context ("/data/file%d.dsf" % (i % contexts))
+    lnk.get_ref ({}, 'url', objs[(i * 7919) % objects], 'node')
+    lnk.pop_context ()
+  lnk.resolve ()
+
+def main ():
+  parser = argparse.ArgumentParser\
+    (description = 'resolve many references with dsf_linker.')
+  parser.add_argument ('--refs', type = int, default = 100000)
+  parser.add_argument ('--objects', type = int, default = 10000)
+  parser.add_argument ('--contexts', type = int, default = 100)
+  parser.add_argument ('--repeat', type = int, default = 5)
+  args = parser.parse_args ()
+  seconds = bench.measure\
+    (lambda: run (args.refs, args.objects, args.contexts), args.repeat)
+  bench.report ("linker: %d refs" % (args.refs), seconds, args.refs)
+
+if __name__ == '__main__':
+  main ()
@@ -0,0 +1,272 @@
+# time and memory-profile the loader stages on synthetic content and
+# compare the results with a stored baseline:
+#   python bench/bench_loaders.py --output results.json
+#   python bench/bench_loaders.py --save-baseline bench/baseline_loaders.json
+# the exit status is 1 if a stage got slower or needs more memory than
+# the baseline allows. The times of the baseline are those of the machine
+# it was made on: regenerate it (--save-baseline) on the machine running
+# the comparison, or compare the times relative to a reference stage
+# measured in the same run (eg. --relative-to parse). Use at least the
+# repeat count of the baseline, single runs are too noisy.
+import argparse, json, logging, os, platform, sys, tempfile, tracemalloc
+import numpy as np
+
+sys.path.insert (0, os.path.dirname (os.path.dirname (os.path.abspath (__file__))))
+import bench
+bench.setup_path ()
+from bench import synth
+
+dsf_io = bench.import_addon_module ('dsf_io')
+dsf_geom_load = bench.import_addon_module ('dsf_geom_load')
+dsf_uvset_load = bench.import_addon_module ('dsf_uvset_load')
+dsf_weightmap = bench.import_addon_module ('dsf_weightmap')
+dsf_morph_load = bench.import_addon_module ('dsf_morph_load')
+dsf_armature = bench.import_addon_module ('dsf_armature')
+dsf_linker = bench.import_addon_module ('dsf_linker')
+
+log = logging.getLogger ('bench-loaders')
+
+default_baseline = os.path.join (bench.root_dir, 'bench',
+                                 'baseline_loaders.json')
+
+class named (object):
+  """stand-in for a blender object; the linker only uses the name.
+  """
+  def __init__ (self, name):
+    self.name = name
+
+class loader_stages (object):
+  """the benchmarked stages. Each stage is a method stage_<name>
+     returning the number of items it processed.
+  """
+  stages = ['parse', 'parse_gzip', 'parse_morphs', 'geom_intern', 'uvset',
+            'uvset_bulk', 'skin', 'morph_load', 'armature', 'linker']
+
+  def __init__ (self, plain_files, gzip_files):
+    self.plain_files = plain_files
+    self.gzip_files = gzip_files
+    self.figure = dsf_io.read_json_data (plain_files[0])
+    self.morphs = [dsf_io.read_json_data (path) for path in plain_files[1:]]
+    self.geom = dsf_geom_load.dsf_geom_load.intern_geometry\
+      (self.figure['geometry_library'][0])
+    self.face_offsets = np.zeros (len (self.geom['f']) + 1, dtype = np.int64)
+    np.cumsum ([len (verts) for verts in self.geom['f']],
+               out = self.face_offsets[1:])
+    self.face_indices = np.array\
+      ([vi for verts in self.geom['f'] for vi in verts], dtype = np.int32)
+
+  def stage_parse (self):
+    dsf_io.read_json_data (self.plain_files[0])
+    return len (self.figure['geometry_library'][0]['vertices']['values'])
+
+  def stage_parse_gzip (self):
+    dsf_io.read_json_data (self.gzip_files[0])
+    return len (self.figure['geometry_library'][0]['vertices']['values'])
+
+  def stage_parse_morphs (self):
+    for path in self.plain_files[1:]:
+      dsf_io.read_json_data (path)
+    return len (self.plain_files) - 1
+
+  def stage_geom_intern (self):
+    geom = dsf_geom_load.dsf_geom_load.intern_geometry\
+      (self.figure['geometry_library'][0])
+    return len (geom['f'])
+
+  def stage_uvset (self):
+    uvset = dsf_uvset_load.dsf_uvset (self.figure['uv_set_library'][0])
+    for (fidx, verts) in enumerate (self.geom['f']):
+      uvset.get_uvs (fidx, verts)
+    return len (self.geom['f'])
+
+  def stage_uvset_bulk (self):
+    uvset = dsf_uvset_load.dsf_uvset (self.figure['uv_set_library'][0])
+    uvset.get_loop_uvs (self.face_offsets, self.face_indices)
+    return len (self.geom['f'])
+
+  def stage_skin (self):
+    skin_node = self.figure['modifier_library'][0]['skin']
+    skin = dsf_weightmap.skin (skin_node)
+    skin.collect_all_paint_maps (scale = True)
+    return len (skin_node['joints'])
+
+  def stage_morph_load (self):
+    count = 0
+    for jdata in self.morphs:
+      mod_lib = dsf_morph_load.modifier_lib (jdata['modifier_library'])
+      for mod in mod_lib.filter_modifiers ('morph'):
+        count += len (mod.delta_arrays ()[0])
+    return count
+
+  def stage_armature (self):
+    nodes = self.figure['node_library']
+    arm = dsf_armature.armature (nodes)
+    for node in nodes:
+      arm.get_children (arm.get_bone (node['id']))
+    return len (nodes)
+
+  def stage_linker (self):
+    """link the nodes, their parents, the joints of the skin and the
+       parents of the morphs like the importers do.
+    """
+    figure_path = '/data/synth/Figure.dsf'
+    lnk = dsf_linker.linker ()
+    objs = {}
+    lnk.push_context (figure_path)
+    for node in self.figure['node_library']:
+      objs[node['id']] = named (node['id'])
+      lnk.add_id ({}, 'id', objs[node['id']], 'node')
+    geom = named ('geometry')
+    lnk.add_id ({}, 'id', geom, 'geometry')
+    count = 0
+    for node in self.figure['node_library']:
+      if 'parent' in node:
+        lnk.get_ref ({}, 'parent', objs[node['parent'][1:]], 'node')
+        count += 1
+    for joint in self.figure['modifier_library'][0]['skin']['joints']:
+      lnk.get_ref ({}, 'node', objs[joint['id']], 'node')
+      count += 1
+    lnk.pop_context ()
+    for jdata in self.morphs:
+      lnk.push_context (jdata['asset_info']['id'])
+      for mod in jdata['modifier_library']:
+        lnk.get_ref ({}, 'parent', geom, 'geometry')
+        count += 1
+      lnk.pop_context ()
+    lnk.resolve ()
+    return count
+
+  def run (self, name, repeat):
+    """run a stage repeat times for the best time, then once more with
+       tracemalloc for the peak memory.
+    """
+    func = getattr (self, 'stage_' + name)
+    seconds = bench.measure (func, repeat)
+    tracemalloc.start ()
+    try:
+      items = func ()
+      peak = tracemalloc.get_traced_memory ()[1]
+    finally:
+      tracemalloc.stop ()
+    return {'seconds': round (seconds, 6), 'peak_bytes': peak,
+            'items': items}
+
+def run_stages (params, names, repeat, dirpath):
+  """generate the content into dirpath and run the stages.
+  """
+  plain_files = synth.write_content\
+    (os.path.join (dirpath, 'plain'), params)
+  gzip_files = synth.write_content\
+    (os.path.join (dirpath, 'gzip'), params, compress = True)
+  stages = loader_stages (plain_files, gzip_files)
+  results = {}
+  for name in names:
+    results[name] = stages.run (name, repeat)
+    bench.report (name, results[name]['seconds'])
+  return results
+
+def get_times (results, reference = None):
+  """return the times of the stages by name, as fractions of the time
+     of the stage reference if given.
+  """
+  stages = results['stages']
+  unit = 1.0
+  if reference is not None:
+    unit = max (stages[reference]['seconds'], 1e-9)
+  return { name: stage['seconds'] / unit for (name, stage) in stages.items () }
+
+def compare (results, baseline, time_tolerance, memory_tolerance,
+             reference = None):
+  """compare the stage results with a baseline. A stage fails if it takes
+     more than (1 + time_tolerance) times the baseline time or more than
+     (1 + memory_tolerance) times its peak memory. If reference is given,
+     the times are compared relative to the time of that stage, which
+     takes out the speed of the machine. Returns the list of failed
+     stages.
+  """
+  if baseline['params'] != results['params']:
+    log.warning ("baseline was made with other parameters")
+  if results['repeat'] < baseline.get ('repeat', 1):
+    log.warning ("fewer repeats than the baseline (%d < %d), expect noise",
+                 results['repeat'], baseline['repeat'])
+  if reference is not None and (reference not in results['stages']
+                                or reference not in baseline['stages']):
+    raise KeyError ("reference stage %s was not run" % (reference))
+  now_times = get_times (results, reference)
+  base_times = get_times (baseline, reference)
+  failed = []
+  print ("%-14s %10s %10s %7s %12s %12s %7s"
+         % ('stage', 'base', 'now', 'ratio', 'base mem', 'now mem', 'ratio'))
+  for (name, now) in sorted (results['stages'].items ()):
+    base = baseline['stages'].get (name)
+    if base is None:
+      print ("%-14s (not in baseline)" % (name))
+      continue
+    time_ratio = now_times[name] / max (base_times[name], 1e-9)
+    memory_ratio = now['peak_bytes'] / max (base['peak_bytes'], 1)
+    status = ''
+    if time_ratio > 1 + time_tolerance or memory_ratio > 1 + memory_tolerance:
+      failed.append (name)
+      status = 'FAILED'
+    print ("%-14s %10.4f %10.4f %7.2f %12d %12d %7.2f %s"
+           % (name, base_times[name], now_times[name], time_ratio,
+              base['peak_bytes'], now['peak_bytes'], memory_ratio, status))
+  return failed
+
+def main ():
+  parser = argparse.ArgumentParser\
+    (description = 'benchmark the loader stages on synthetic content.')
+  for key in ['vertices', 'faces', 'seams', 'joints', 'depth', 'morphs']:
+    parser.add_argument ('--' + key, type = int, default = synth.defaults[key])
+  parser.add_argument ('--weights', default = synth.defaults['weights'],
+                       choices = ['local', 'node', 'both'])
+  parser.add_argument ('--stages', nargs = '+',
+                       choices = loader_stages.stages,
+                       default = loader_stages.stages)
+  parser.add_argument ('--repeat', type = int, default = 3)
+  parser.add_argument ('--dir', default = None,
+                       help = 'directory for the generated files')
+  parser.add_argument ('--output', '-o', default = None,
+                       help = 'write the results to this json file')
+  parser.add_argument ('--baseline', default = default_baseline,
+                       help = 'json file with the baseline results')
+  parser.add_argument ('--save-baseline', default = None, metavar = 'FILE',
+                       help = 'store the results as new baseline')
+  parser.add_argument ('--time-tolerance', type = float, default = 0.5,
+                       help = 'allowed relative increase of the times')
+  parser.add_argument ('--memory-tolerance', type = float, default = 0.1,
+                       help = 'allowed relative increase of the memory')
+  parser.add_argument ('--relative-to', default = None, metavar = 'STAGE',
+                       choices = loader_stages.stages,
+                       help = 'compare the times as fractions of the '
+                       'time of this stage')
+  args = parser.parse_args ()
+  params = synth.get_params (**{
+    key: getattr (args, key) for key in
+    ['vertices', 'faces', 'seams', 'joints', 'depth', 'morphs', 'weights']
+  })
+  with tempfile.TemporaryDirectory (dir = args.dir) as tmpdir:
+    stages = run_stages (params, args.stages, args.repeat, tmpdir)
+  results = {
+    'params': params,
+    'repeat': args.repeat,
+    'python': platform.python_version (),
+    'machine': platform.machine (),
+    'json_backend': dsf_io.get_json_backend ().name,
+    'stages': stages,
+  }
+  for path in [args.output, args.save_baseline]:
+    if path is not None:
+      with open (path, 'w') as ofh:
+        json.dump (results, ofh, indent = 2, sort_keys = True)
+  if args.save_baseline is None and os.path.exists (args.baseline):
+    with open (args.baseline) as ifh:
+      baseline = json.load (ifh)
+    failed = compare (results, baseline, args.time_tolerance,
+                      args.memory_tolerance, args.relative_to)
+    if failed:
+      print ("regressions: %s" % (', '.join (failed)))
+      sys.exit (1)
+
+if __name__ == '__main__':
+  main ()
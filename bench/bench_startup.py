@@ -0,0 +1,144 @@
+# measure the time blender spends on the add-on at startup: importing the
+# package and calling its register function. Blender is replaced by a stub
+# bpy (and stubs of the other blender-only modules), so this measures the
+# python side only. Each measurement runs in a fresh interpreter, eg.:
+#   python bench/bench_startup.py --repeat 10
+import argparse, json, os, subprocess, sys, time, types
+
+sys.path.insert (0, os.path.dirname (os.path.dirname (os.path.abspath (__file__))))
+import bench
+
+# modules whose loading at startup is reported.
+watched = ['json', 'gzip', 'numpy', 'mathutils', 'bmesh', 'inspect',
+           'tracemalloc', 'concurrent.futures']
+
+class stub_value (object):
+  """stands in for any blender object: every attribute, call, item and
+     operation yields another stub.
+  """
+  def __init__ (self, *arg, **kwarg):
+    pass
+  def __getattr__ (self, name):
+    if name.startswith ('__'):
+      raise AttributeError (name)
+    return stub_value ()
+  def __call__ (self, *arg, **kwarg):
+    return stub_value ()
+  def __getitem__ (self, key):
+    return stub_value ()
+  def __iter__ (self):
+    return iter (())
+  def __mul__ (self, other):
+    return stub_value ()
+  __rmul__ = __matmul__ = __add__ = __sub__ = __mul__
+
+class stub_module (types.ModuleType):
+  """module creating a stub class for every attribute asked for.
+  """
+  def __getattr__ (self, name):
+    if name.startswith ('__'):
+      raise AttributeError (name)
+    value = type (name, (stub_value,), {})
+    setattr (self, name, value)
+    return value
+
+class stub_menu (object):
+  """a menu class of bpy.types (eg. INFO_MT_file_import).
+  """
+  funcs = []
+  @classmethod
+  def append (self, func):
+    self.funcs.append (func)
+  @classmethod
+  def remove (self, func):
+    self.funcs.remove (func)
+
+def stub_property (*arg, **kwarg):
+  return ('property', arg, kwarg)
+
+def install_stubs ():
+  """put stubs for bpy and the other modules only available in blender
+     into sys.modules.
+  """
+  bpy = stub_module ('bpy')
+  bpy.types = stub_module ('bpy.types')
+  for name in ['INFO_MT_file_import', 'INFO_MT_file_export']:
+    setattr (bpy.types, name, type (name, (stub_menu,), {'funcs': []}))
+  bpy.props = stub_module ('bpy.props')
+  for name in ['BoolProperty', 'IntProperty', 'FloatProperty',
+               'StringProperty', 'EnumProperty', 'CollectionProperty',
+               'PointerProperty', 'FloatVectorProperty']:
+    setattr (bpy.props, name, stub_property)
+  bpy.utils = stub_module ('bpy.utils')
+  bpy.utils.registered = []
+  bpy.utils.register_class = bpy.utils.registered.append
+  bpy.utils.unregister_class = bpy.utils.registered.remove
+  bpy.app = stub_module ('bpy.app')
+  bpy.app.background = True
+  bpy.app.version = (2, 79, 0)
+  bpy.ops = stub_value ()
+  bpy.data = stub_value ()
+  bpy.context = stub_value ()
+  bpy_extras = stub_module ('bpy_extras')
+  bpy_extras.io_utils = stub_module ('bpy_extras.io_utils')
+  modules = {
+    'bpy': bpy, 'bpy.types': bpy.types, 'bpy.props': bpy.props,
+    'bpy.utils': bpy.utils, 'bpy.app': bpy.app,
+    'bpy_extras': bpy_extras, 'bpy_extras.io_utils': bpy_extras.io_utils,
+    'mathutils': stub_module ('mathutils'), 'bmesh': stub_module ('bmesh'),
+  }
+  sys.modules.update (modules)
+
+def run_child ():
+  """import and register the add-on once, print the timings as json.
+  """
+  install_stubs ()
+  before = set (sys.modules)
+  parent = os.path.dirname (bench.root_dir)
+  sys.path.insert (0, parent)
+  start = time.perf_counter ()
+  import importlib
+  addon = importlib.import_module (os.path.basename (bench.root_dir))
+  imported = time.perf_counter ()
+  addon.register ()
+  registered = time.perf_counter ()
+  loaded = set (sys.modules) - before
+  bpy = sys.modules['bpy']
+  result = {
+    'import': imported - start,
+    'register': registered - imported,
+    'modules': len (loaded),
+    'addon_modules': len ([name for name in loaded
+                           if name.startswith (addon.__name__ + '.')]),
+    'watched': [name for name in watched if name in loaded],
+    'classes': len (bpy.utils.registered),
+  }
+  addon.unregister ()
+  print (json.dumps (result))
+
+def run_once ():
+  output = subprocess.check_output\
+    ([sys.executable, os.path.abspath (__file__), '--child'])
+  return json.loads (output.decode ('utf-8').splitlines ()[-1])
+
+def main ():
+  parser = argparse.ArgumentParser\
+    (description = 'measure the startup time of the add-on.')
+  parser.add_argument ('--repeat', type = int, default = 5)
+  parser.add_argument ('--child', action = 'store_true',
+                       help = argparse.SUPPRESS)
+  args = parser.parse_args ()
+  if args.child:
+    run_child ()
+    return
+  runs = [run_once () for i in range (args.repeat)]
+  best = min (runs, key = lambda run: run['import'] + run['register'])
+  bench.report ('import', best['import'])
+  bench.report ('register', best['register'])
+  bench.report ('total', best['import'] + best['register'])
+  print ("%d modules loaded, %d of the add-on, %d classes registered"
+         % (best['modules'], best['addon_modules'], best['classes']))
+  print ("loaded: %s" % (', '.join (best['watched']) or '-'))
+
+if __name__ == '__main__':
+  main ()
@@ -0,0 +1,324 @@
+# generate synthetic dsf content for the benchmarks: a figure with a
+# grid mesh, a uv set with seams, a skin binding, a node hierarchy and
+# a set of morphs of different sparsity.
+#   python bench/synth.py --vertices 100000 --morphs 50 /tmp/synth
+import argparse, os, sys
+import numpy as np
+
+sys.path.insert (0, os.path.dirname (os.path.dirname (os.path.abspath (__file__))))
+import bench
+bench.setup_path ()
+import dsf.json_writer
+
+# default parameters of the generated content.
+defaults = {
+  'vertices': 20000,
+  # number of polygons; None for one quad per grid cell. Up to twice
+  # the number of cells can be requested, cells are then split into
+  # triangles.
+  'faces': None,
+  # number of grid columns along which the uvs are split.
+  'seams': 8,
+  'joints': 60,
+  # depth of the node hierarchy (the joints are distributed over
+  # chains of this length).
+  'depth': 12,
+  # 'local' (scale and local x/y/z maps), 'node' (node weights) or
+  # 'both'.
+  'weights': 'local',
+  'morphs': 20,
+  # fraction of the vertices moved by the morphs, used round robin.
+  'densities': [0.01, 0.05, 0.2, 1.0],
+  'groups': 4,
+  'materials': 3,
+  'seed': 1,
+}
+
+figure_name = 'Figure'
+
+def get_params (**kwarg):
+  """return the default parameters updated with kwarg.
+  """
+  params = dict (defaults)
+  for (key, value) in kwarg.items ():
+    if key not in params:
+      raise KeyError ("unknown parameter %s" % (key))
+    params[key] = value
+  return params
+
+def make_channels (values):
+  return [{'id': axis, 'type': 'float', 'value': float (value)}
+          for (axis, value) in zip ('xyz', values)]
+
+class figure_synth (object):
+  """create the json data of a synthetic figure. The mesh is a grid of
+     side x side vertices in the xy-plane.
+  """
+  def __init__ (self, params):
+    self.params = params
+    self.rng = np.random.default_rng (params['seed'])
+    self.side = max (2, int (round (params['vertices'] ** 0.5)))
+    self.n_verts = self.side * self.side
+    self.make_mesh ()
+
+  def make_mesh (self):
+    """create coords, the polygons (as flat array with offsets), and
+       the group and material of each polygon.
+    """
+    side = self.side
+    (rows, cols) = np.mgrid[0:side,0:side]
+    self.coords = np.stack\
+      ((cols.ravel () / (side - 1), rows.ravel () / (side - 1),
+        self.rng.random (self.n_verts) * 0.01), axis = 1)
+    (rows, cols) = np.mgrid[0:side-1,0:side-1]
+    first = (rows * side + cols).ravel ()
+    self.cell_cols = cols.ravel ()
+    quads = np.stack ((first, first + 1, first + side + 1, first + side),
+                      axis = 1)
+    n_cells = len (quads)
+    n_faces = self.params['faces'] or n_cells
+    if not 0 < n_faces <= 2 * n_cells:
+      raise ValueError ("faces must be in 1..%d" % (2 * n_cells))
+    # the first n_split cells get split into two triangles, the cells
+    # after n_faces are dropped.
+    n_split = max (0, n_faces - n_cells)
+    n_quads = min (n_faces, n_cells) - n_split
+    tris = np.concatenate\
+      ((quads[:n_split,[0,1,2]], quads[:n_split,[0,2,3]]), axis = 0)
+    self.face_cols = np.concatenate\
+      ((self.cell_cols[:n_split], self.cell_cols[:n_split],
+        self.cell_cols[n_split:n_split + n_quads]))
+    self.faces = [tris, quads[n_split:n_split + n_quads]]
+    self.n_faces = len (tris) + n_quads
+    rows = np.arange (self.n_faces) * side // max (1, self.n_faces)
+    self.face_groups = rows * self.params['groups'] // side
+    self.face_materials = rows * self.params['materials'] // side
+
+  def get_face_verts (self):
+    """return the vertex indices of all faces as flat array with the
+       offsets of the faces.
+    """
+    (tris, quads) = self.faces
+    verts = np.concatenate ((tris.ravel (), quads.ravel ()))
+    offsets = np.concatenate\
+      ((np.arange (len (tris)) * 3,
+        len (tris) * 3 + np.arange (len (quads) + 1) * 4))
+    return (verts, offsets)
+
+  def get_polylist (self):
+    """return the polylist rows [group, material, v0, v1, ...].
+    """
+    (verts, offsets) = self.get_face_verts ()
+    lengths = np.diff (offsets)
+    rows = np.empty (len (verts) + 2 * self.n_faces, dtype = np.int64)
+    row_offsets = np.concatenate (([0], np.cumsum (lengths + 2)))
+    starts = row_offsets[:-1]
+    rows[starts] = self.face_groups
+    rows[starts + 1] = self.face_materials
+    mask = np.ones (len (rows), dtype = bool)
+    mask[starts] = False
+    mask[starts + 1] = False
+    rows[mask] = verts
+    return dsf.json_writer.ragged_rows (rows, row_offsets)
+
+  def make_geometry (self):
+    return {
+      'id': 'geometry', 'name': figure_name, 'type': 'polygon_mesh',
+      'vertices': {'count': self.n_verts,
+                   'values': dsf.json_writer.array_rows (self.coords)},
+      'polygon_groups': {
+        'count': self.params['groups'],
+        'values': ["group%d" % (i) for i in range (self.params['groups'])]
+      },
+      'polygon_material_groups': {
+        'count': self.params['materials'],
+        'values': ["material%d" % (i)
+                   for i in range (self.params['materials'])]
+      },
+      'polylist': {'count': self.n_faces, 'values': self.get_polylist ()},
+    }
+
+  def make_uv_set (self):
+    """create a uv set with one uv per vertex; along the seam columns the
+       faces on the right side get their own uvs.
+    """
+    side = self.side
+    uvs = [self.coords[:,0:2]]
+    pvi = []
+    n_seams = min (self.params['seams'], side - 2)
+    seam_cols = np.linspace (1, side - 2, n_seams).astype (np.int64)\
+      if n_seams > 0 else []
+    (verts, offsets) = self.get_face_verts ()
+    face_idx = np.repeat (np.arange (self.n_faces), np.diff (offsets))
+    n_uvs = self.n_verts
+    for col in seam_cols:
+      # the vertices on the seam, used by faces right of it.
+      seam_verts = np.arange (side) * side + col
+      uvs.append (self.coords[seam_verts,0:2] + [0.001, 0])
+      mask = (self.face_cols[face_idx] == col) & (verts % side == col)
+      sel_verts = verts[mask]
+      pvi.append (np.stack ((face_idx[mask], sel_verts,
+                             n_uvs + sel_verts // side), axis = 1))
+      n_uvs += side
+    uvs = np.concatenate (uvs)
+    pvi = np.concatenate (pvi) if pvi\
+      else np.zeros ((0, 3), dtype = np.int64)
+    return {
+      'id': 'default', 'name': 'Default UVs',
+      'vertex_count': self.n_verts,
+      'uvs': {'count': len (uvs), 'values': dsf.json_writer.array_rows (uvs)},
+      'polygon_vertex_indices': dsf.json_writer.array_rows (pvi),
+    }
+
+  def get_joint_names (self):
+    return ["joint%d" % (i) for i in range (self.params['joints'])]
+
+  def make_nodes (self):
+    """create the node library: the figure node and the joints, arranged
+       in chains of depth joints that branch off the root joint.
+    """
+    depth = max (1, self.params['depth'])
+    names = self.get_joint_names ()
+    nodes = [{
+      'id': figure_name, 'name': figure_name, 'type': 'figure',
+      'center_point': make_channels ((0, 0, 0)),
+      'end_point': make_channels ((0, 0.1, 0)),
+      'orientation': make_channels ((0, 0, 0)),
+      'rotation_order': 'XYZ',
+    }]
+    for (i, name) in enumerate (names):
+      if i == 0:
+        parent = figure_name
+      elif (i - 1) % depth == 0:
+        parent = names[0]
+      else:
+        parent = names[i - 1]
+      level = (i - 1) % depth + 1 if i > 0 else 0
+      x = ((i - 1) // depth + 1) * 0.1 if i > 0 else 0
+      nodes.append ({
+        'id': name, 'name': name, 'type': 'bone',
+        'parent': "#%s" % (parent),
+        'center_point': make_channels ((x, level * 0.1, 0)),
+        'end_point': make_channels ((x, level * 0.1 + 0.1, 0)),
+        'orientation': make_channels ((0, 0, 0)),
+        'rotation_order': 'YZX',
+      })
+    return nodes
+
+  def make_weights (self, start, count):
+    """create a weight map for the vertices in a band of count vertices
+       beginning at start. Like in real maps, some vertices of the band
+       are left out.
+    """
+    band = np.arange (start, min (start + max (3, count), self.n_verts))
+    keep = self.rng.random (len (band)) < 0.8
+    # rig.weight_map needs at least one gap within the map.
+    keep[[0, -1]] = True
+    keep[len (band) // 2] = False
+    idx = band[keep]
+    count = len (idx)
+    wgt = np.round (self.rng.random (count), 4)
+    return {'count': count,
+            'values': dsf.json_writer.array_rows\
+              (np.stack ((idx, wgt), axis = 1))}
+
+  def make_skin (self):
+    """create the skin modifier; every joint influences an overlapping
+       band of vertices.
+    """
+    names = self.get_joint_names ()
+    band = 2 * self.n_verts // max (1, len (names))
+    joints = []
+    for (i, name) in enumerate (names):
+      start = i * self.n_verts // max (1, len (names))
+      joint = {'id': name, 'node': "#%s" % (name)}
+      if self.params['weights'] in ('local', 'both'):
+        joint['scale_weights'] = self.make_weights (start, band // 2)
+        joint['local_weights'] = {
+          axis: self.make_weights (start, band) for axis in 'xyz'
+        }
+      if self.params['weights'] in ('node', 'both'):
+        joint['node_weights'] = self.make_weights (start, band)
+      joints.append (joint)
+    return {
+      'id': 'SkinBinding', 'name': 'SkinBinding', 'parent': '#geometry',
+      'skin': {
+        'node': "#%s" % (figure_name), 'geometry': '#geometry',
+        'vertex_count': self.n_verts, 'joints': joints,
+      },
+    }
+
+  def make_figure (self):
+    """return the json data of the figure file.
+    """
+    return {
+      'file_version': '0.6.0.0',
+      'asset_info': {'id': '/data/synth/Figure.dsf', 'type': 'figure'},
+      'geometry_library': [self.make_geometry ()],
+      'uv_set_library': [self.make_uv_set ()],
+      'node_library': self.make_nodes (),
+      'modifier_library': [self.make_skin ()],
+    }
+
+  def make_morph (self, i):
+    """return the json data of the i-th morph file.
+    """
+    densities = self.params['densities']
+    density = densities[i % len (densities)]
+    count = max (1, int (self.n_verts * density))
+    idx = np.sort (self.rng.choice (self.n_verts, count, replace = False))
+    offsets = np.round (self.rng.normal (0, 0.01, (count, 3)), 5)
+    name = "morph%d" % (i)
+    return {
+      'file_version': '0.6.0.0',
+      'asset_info': {'id': "/data/synth/Morphs/%s.dsf" % (name),
+                     'type': 'modifier'},
+      'modifier_library': [{
+        'id': name, 'name': name,
+        'parent': '/data/synth/Figure.dsf#geometry',
+        'channel': {'id': 'value', 'type': 'float', 'value': 0,
+                    'min': 0, 'max': 1},
+        'morph': {
+          'vertex_count': self.n_verts,
+          'deltas': {'count': count,
+                     'values': dsf.json_writer.array_rows\
+                       (np.concatenate ((idx[:,None], offsets), axis = 1))},
+        },
+      }],
+    }
+
+def write_content (dirpath, params, compress = False):
+  """write the synthetic content to dirpath as a content library
+     (data/synth/Figure.dsf and data/synth/Morphs/morph*.dsf). Returns
+     the list of written files, the figure first.
+  """
+  synth = figure_synth (params)
+  figure_dir = os.path.join (dirpath, 'data', 'synth')
+  morph_dir = os.path.join (figure_dir, 'Morphs')
+  os.makedirs (morph_dir, exist_ok = True)
+  files = [os.path.join (figure_dir, 'Figure.dsf')]
+  dsf.json_writer.write_json (synth.make_figure (), files[0], compress)
+  for i in range (params['morphs']):
+    files.append (os.path.join (morph_dir, "morph%d.dsf" % (i)))
+    dsf.json_writer.write_json (synth.make_morph (i), files[-1], compress)
+  return files
+
+def main ():
+  parser = argparse.ArgumentParser\
+    (description = 'generate synthetic dsf content.')
+  parser.add_argument ('dest', help = 'output directory')
+  for key in ['vertices', 'faces', 'seams', 'joints', 'depth', 'morphs',
+              'seed']:
+    parser.add_argument ('--' + key, type = int, default = defaults[key])
+  parser.add_argument ('--weights', default = defaults['weights'],
+                       choices = ['local', 'node', 'both'])
+  parser.add_argument ('--compress', action = 'store_true')
+  args = parser.parse_args ()
+  params = get_params (**{key: getattr (args, key) for key in defaults
+                          if hasattr (args, key)})
+  files = write_content (args.dest, params, args.compress)
+  print ("wrote %d files, %.1f MB" % (len (files), sum
+    ([os.path.getsize (path) for path in files]) / 2**20))
+
+if __name__ == '__main__':
+  main ()
@@ -4,27 +4,36 @@ import bpy
 from bpy.props import StringProperty, BoolProperty
 from bpy_extras.io_utils import ImportHelper
 
-from . import dsf_armature
-from .rig import rig_define
+from . import dsf_modal
 
 log = logging.getLogger ("dsf-arm-imp")
 
 def load_node_lib (filepath):
   """load the dsf file, check that there is a node lib in it and return it.
   """
-<<<<<<< HEAD
   from . import dsf_io
-  jdata = dsf_io.read_json_data (filepath, encoding = 'latin1')
-=======
-  import dsf.dsf_io
-  jdata = dsf.dsf_io.read_json_data (filepath, encoding = 'latin1')
->>>>>>> 64d1a8da577389e9f24c88afd6ababff31e37f34
+  jdata = dsf_io.read_json_data (filepath)
   if 'node_library' in jdata:
     return jdata['node_library']
   else:
     raise KeyError ("data does not contain armature.")
 
-class import_dsf_arm (bpy.types.Operator):
+class arm_import_job (dsf_modal.import_job):
+  """define an armature from the node library of a file.
+  """
+  def parse (self):
+    self.nlib = load_node_lib (self.filepath)
+
+  def build (self, context):
+    from . import dsf_armature
+    from .rig import rig_define
+    log.info ("define: %s", self.filepath)
+    arm = dsf_armature.armature (self.nlib)
+    (armobj, bmap) = rig_define.define_armature (arm, context)
+    self.undo.add (dsf_modal.remove_object, armobj.name)
+    yield 1.0
+
+class import_dsf_arm (dsf_modal.modal_import, bpy.types.Operator):
   """operator to import a dsf armature.
   """
   bl_label = 'import dsf-arm'
@@ -43,19 +52,14 @@ class import_dsf_arm (bpy.types.Operator):
   scale = BoolProperty ('scale', description = 'import scaling bone.',
                         default = False)
 
-  def define_arm (self, ctx, jdata):
-    """define the armature from the loaded json data.
-    """
-    log.info ("define: %s", self.properties.filepath)
-    arm = dsf_armature.armature (jdata)
-    (armobj, bmap) = rig_define.define_armature (arm, ctx)
-  def execute (self, ctx):
-    """load the armature from a dsf and insert it into blender.
+  def get_errors (self):
+    return (KeyError,)
+  def create_job (self, ctx):
+    """create the job loading the armature from a dsf and inserting it
+       into blender.
     """
     log.info ("loading: %s", self.properties.filepath)
-    nlib = load_node_lib (self.properties.filepath)
-    self.define_arm (ctx, nlib)
-    return {'FINISHED'}
+    return arm_import_job (self.properties.filepath)
   def invoke (self, ctx, event):
     """called by the menu entry or the operator menu.
     """
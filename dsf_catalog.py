@@ -0,0 +1,295 @@
+# index the assets of daz content libraries in an sqlite catalog.
+import os, os.path, logging, sqlite3, time
+import urllib.parse
+
+from . import dsf_io
+from . import dsf_morph_load
+
+log = logging.getLogger ('dsf-catalog')
+
+# extensions of the indexed files (lowercase).
+extensions = ('.dsf', '.duf')
+
+# keys of json objects whose string values reference other assets.
+url_keys = ('url', 'parent', 'geometry', 'uv_set', 'node')
+
+schema = """
+create table if not exists roots (
+  id integer primary key,
+  path text unique not null
+);
+create table if not exists files (
+  id integer primary key,
+  root_id integer not null references roots (id),
+  path text not null,
+  mtime real not null,
+  size integer not null,
+  asset_id text,
+  asset_type text,
+  error text,
+  unique (root_id, path)
+);
+create table if not exists entries (
+  file_id integer not null references files (id),
+  library text not null,
+  id text not null,
+  type text,
+  parent_path text,
+  parent_id text
+);
+create table if not exists refs (
+  file_id integer not null references files (id),
+  key text not null,
+  url text not null,
+  target_path text not null,
+  target_id text
+);
+create index if not exists entries_id on entries (id);
+create index if not exists entries_parent on entries (parent_path, parent_id);
+create index if not exists refs_target on refs (target_path, target_id);
+create index if not exists entries_file on entries (file_id);
+create index if not exists refs_file on refs (file_id);
+"""
+
+def split_url (url, base = ''):
+  """split a dsf url into the unquoted file path and fragment id.
+     a url without a file path refers to base.
+  """
+  (path, _, fragment) = url.partition ('#')
+  path = urllib.parse.unquote (path) or base
+  fragment = urllib.parse.unquote (fragment) if fragment else None
+  return (path, fragment)
+
+def iter_urls (node, key = None):
+  """yield the pairs (key, url) of all asset references in a json node.
+  """
+  if isinstance (node, dict):
+    for (subkey, value) in node.items ():
+      if isinstance (value, str):
+        if subkey in url_keys and ('#' in value or value.startswith ('/')):
+          yield (subkey, value)
+      else:
+        yield from iter_urls (value, subkey)
+  elif isinstance (node, list) and not is_scalar_list (node):
+    for value in node:
+      yield from iter_urls (value, key)
+
+def is_scalar_list (node):
+  """check if the list node holds scalars or rows of scalars (like the
+     vertices of a geometry), which cannot contain references. The
+     arrays of dsf files are homogeneous, so the first item decides.
+  """
+  if len (node) == 0:
+    return True
+  first = node[0]
+  if isinstance (first, list):
+    return len (first) > 0 and not isinstance (first[0], (dict, list))
+  return not isinstance (first, dict)
+
+def get_entry_type (library, entry):
+  """return the type of a library entry.
+  """
+  if library == 'modifier':
+    return dsf_morph_load.get_modifier_type (entry)
+  else:
+    return entry.get ('type')
+
+def extract_asset (jdata, libpath):
+  """extract the catalog information of the parsed file jdata with
+     the library path libpath. Returns (asset_info, entries, refs):
+     asset_info is the pair (id, type), entries a list of tuples
+     (library, id, type, parent path, parent id) and refs a list of
+     (key, url, target path, target id).
+  """
+  info = jdata.get ('asset_info', {})
+  asset_info = (info.get ('id'), info.get ('type'))
+  entries = []
+  for (key, lib) in jdata.items ():
+    if not key.endswith ('_library') or not isinstance (lib, list):
+      continue
+    library = key[:-len ('_library')]
+    for entry in lib:
+      if not isinstance (entry, dict) or 'id' not in entry:
+        continue
+      if 'parent' in entry:
+        (parent_path, parent_id) = split_url (entry['parent'], libpath)
+      else:
+        (parent_path, parent_id) = (None, None)
+      entries.append ((library, entry['id'], get_entry_type (library, entry),
+                       parent_path, parent_id))
+  refs = [(key, url) + split_url (url, libpath)
+          for (key, url) in iter_urls (jdata)]
+  return (asset_info, entries, refs)
+
+class catalog (object):
+  """the index of one or more content libraries.
+  """
+  def __init__ (self, dbpath = ':memory:'):
+    """open (or create) the catalog stored in the file dbpath.
+    """
+    self.db = sqlite3.connect (dbpath)
+    self.db.executescript (schema)
+
+  def close (self):
+    self.db.close ()
+
+  def add_root (self, path):
+    """add a content library. path is the library directory or a file
+       or directory within it. returns the library directory.
+    """
+    root = dsf_io.find_data_parent (path) or path
+    root = os.path.abspath (root)
+    with self.db:
+      self.db.execute ("insert or ignore into roots (path) values (?)",
+                       (root,))
+    return root
+
+  def get_roots (self):
+    """return the list of content library directories.
+    """
+    return [row[0] for row in
+            self.db.execute ("select path from roots order by id")]
+
+  def scan (self, progress = None, batch = 500):
+    """bring the catalog up to date with the files in all roots. Only
+       files that are new or whose mtime or size changed get parsed.
+       progress is called with (root, libpath) for every parsed file.
+       returns a dictionary with counts of the files per outcome.
+    """
+    stats = dict (added = 0, updated = 0, removed = 0, unchanged = 0,
+                  failed = 0)
+    start = time.perf_counter ()
+    for (root_id, root) in self.db.execute\
+        ("select id, path from roots order by id").fetchall ():
+      self.scan_root (root_id, root, stats, progress, batch)
+    log.info ("scanned in %.2fs: %s", time.perf_counter () - start, stats)
+    return stats
+
+  def scan_root (self, root_id, root, stats, progress, batch):
+    """update the files of a single root (see scan).
+    """
+    known = {
+      path: (file_id, mtime, size) for (file_id, path, mtime, size)
+      in self.db.execute ("select id, path, mtime, size from files "
+                          "where root_id = ?", (root_id,))
+    }
+    pending = 0
+    for (dirpath, dirnames, filenames) in os.walk (root):
+      for filename in filenames:
+        if not filename.lower ().endswith (extensions):
+          continue
+        abspath = os.path.join (dirpath, filename)
+        libpath = '/' + os.path.relpath (abspath, root).replace (os.sep, '/')
+        st = os.stat (abspath)
+        old = known.pop (libpath, None)
+        if old is not None and old[1] == st.st_mtime and old[2] == st.st_size:
+          stats['unchanged'] += 1
+          continue
+        if progress is not None:
+          progress (root, libpath)
+        if old is not None:
+          self.remove_file (old[0])
+        if self.index_file (root_id, libpath, abspath, st):
+          stats['added' if old is None else 'updated'] += 1
+        else:
+          stats['failed'] += 1
+        pending += 1
+        if pending >= batch:
+          self.db.commit ()
+          pending = 0
+    # the remaining known files do not exist any more.
+    for (file_id, _, _) in known.values ():
+      self.remove_file (file_id)
+      stats['removed'] += 1
+    self.db.commit ()
+
+  def remove_file (self, file_id):
+    """remove a file and everything extracted from it.
+    """
+    self.db.execute ("delete from entries where file_id = ?", (file_id,))
+    self.db.execute ("delete from refs where file_id = ?", (file_id,))
+    self.db.execute ("delete from files where id = ?", (file_id,))
+
+  def index_file (self, root_id, libpath, abspath, st):
+    """parse a file and store its information. Files that can not be
+       parsed are recorded with the error, so they are only tried
+       again when they change. Returns True on success.
+    """
+    try:
+      jdata = dsf_io.read_json_data (abspath)
+      (asset_info, entries, refs) = extract_asset (jdata, libpath)
+      error = None
+    except (ValueError, OSError, AttributeError) as e:
+      log.warning ("cannot index %s: %s", abspath, e)
+      (asset_info, entries, refs) = ((None, None), [], [])
+      error = str (e)
+    cursor = self.db.execute\
+      ("insert into files (root_id, path, mtime, size, asset_id, "
+       "asset_type, error) values (?, ?, ?, ?, ?, ?, ?)",
+       (root_id, libpath, st.st_mtime, st.st_size) + asset_info + (error,))
+    file_id = cursor.lastrowid
+    self.db.executemany\
+      ("insert into entries (file_id, library, id, type, parent_path, "
+       "parent_id) values (?, ?, ?, ?, ?, ?)",
+       [(file_id,) + entry for entry in entries])
+    self.db.executemany\
+      ("insert into refs (file_id, key, url, target_path, target_id) "
+       "values (?, ?, ?, ?, ?)", [(file_id,) + ref for ref in refs])
+    return error is None
+
+  def get_abspath (self, root, libpath):
+    return os.path.join (root, os.path.normpath ('.' + libpath))
+
+  def find_entries (self, id = None, library = None, type = None,
+                    parent = None):
+    """find library entries. All given arguments must match, parent is
+       the url of the parent (eg. of a geometry for modifiers).
+       returns a list of tuples (abspath, library, id, type).
+    """
+    conds = []
+    args = []
+    for (column, value) in [('e.id', id), ('e.library', library),
+                            ('e.type', type)]:
+      if value is not None:
+        conds.append ("%s = ?" % (column))
+        args.append (value)
+    if parent is not None:
+      (parent_path, parent_id) = split_url (parent)
+      conds.append ("e.parent_path = ?")
+      args.append (parent_path)
+      if parent_id is not None:
+        conds.append ("e.parent_id = ?")
+        args.append (parent_id)
+    query = "select r.path, f.path, e.library, e.id, e.type "\
+      "from entries e join files f on e.file_id = f.id "\
+      "join roots r on f.root_id = r.id"
+    if conds:
+      query += " where " + " and ".join (conds)
+    return [(self.get_abspath (root, libpath), library, id, type)
+            for (root, libpath, library, id, type)
+            in self.db.execute (query + " order by r.id, f.path", args)]
+
+  def find_definitions (self, id):
+    """return the files defining a library entry with the given id.
+    """
+    return sorted (set ([entry[0] for entry in self.find_entries (id = id)]))
+
+  def find_morphs (self, geometry_url):
+    """return the morph modifiers for a geometry (given by its url).
+    """
+    return self.find_entries\
+      (library = 'modifier', type = 'morph', parent = geometry_url)
+
+  def find_referrers (self, url):
+    """return the files referencing the given url.
+    """
+    (path, id) = split_url (url)
+    query = "select distinct r.path, f.path from refs x "\
+      "join files f on x.file_id = f.id join roots r on f.root_id = r.id "\
+      "where x.target_path = ?"
+    args = [path]
+    if id is not None:
+      query += " and x.target_id = ?"
+      args.append (id)
+    return sorted ([self.get_abspath (root, libpath) for (root, libpath)
+                    in self.db.execute (query, args)])
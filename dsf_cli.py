@@ -0,0 +1,308 @@
+# command line tool for processing dsf files without blender, eg.
+#   python -m dsf-utils.dsf_cli validate --jobs 8 /path/to/library
+# results are written as json-lines, one object per file.
+import argparse, json, logging, os, os.path, sys, time
+import concurrent.futures
+
+from . import dsf_io
+from . import dsf_geom_load
+from . import dsf_morph_load
+from . import dsf_uvset_load
+from . import dsf_weightmap
+from . import dsf_armature
+
+log = logging.getLogger ('dsf-cli')
+
+extensions = ('.dsf', '.duf')
+
+def library_counts (jdata):
+  """return the number of entries of each *_library of jdata.
+  """
+  return {
+    key: len (value) for (key, value) in jdata.items ()
+    if key.endswith ('_library') and isinstance (value, list)
+  }
+
+def inspect_file (filename, opts):
+  """summarize the contents of a file.
+  """
+  jdata = dsf_io.read_json_data (filename)
+  info = jdata.get ('asset_info', {})
+  result = {
+    'id': info.get ('id'),
+    'type': info.get ('type'),
+    'libraries': library_counts (jdata),
+  }
+  result['geometries'] = [{
+    'id': geo['id'],
+    'vertices': geo.get ('vertices', {}).get ('count'),
+    'polygons': geo.get ('polylist', {}).get ('count'),
+  } for geo in jdata.get ('geometry_library', [])]
+  result['uv_sets'] = [{
+    'id': uvlib['id'],
+    'vertex_count': uvlib.get ('vertex_count'),
+    'uvs': uvlib['uvs']['count'],
+  } for uvlib in jdata.get ('uv_set_library', [])]
+  modifiers = dsf_morph_load.modifier_lib (jdata.get ('modifier_library', []))
+  result['modifiers'] = {
+    type: len (list (modifiers.filter_modifiers (type)))
+    for type in ['morph', 'skin', 'channel']
+  }
+  return result
+
+def check_indices (errors, what, indices, limit):
+  """append an error if an index is outside of 0..limit-1.
+  """
+  bad = [idx for idx in indices if not 0 <= idx < limit]
+  if bad:
+    errors.append ("%s: %d indices out of range 0..%d (first %s)"
+                   % (what, len (bad), limit - 1, bad[0]))
+
+def check_count (errors, what, block):
+  """append an error if the count of a {count, values} block is wrong.
+  """
+  if block['count'] != len (block['values']):
+    errors.append ("%s: count %d, but %d values"
+                   % (what, block['count'], len (block['values'])))
+
+def validate_geometry (errors, geo):
+  geom = dsf_geom_load.dsf_geom_load.intern_geometry (geo)
+  n_verts = len (geom['v']) // 3
+  what = "geometry %s" % (geo['id'])
+  check_count (errors, what + " vertices", geo['vertices'])
+  check_count (errors, what + " polylist", geo['polylist'])
+  check_indices (errors, what + " polygons",
+                 [vi for face in geom['f'] for vi in face], n_verts)
+  check_indices (errors, what + " groups", geom['g'], len (geom['gm']))
+  check_indices (errors, what + " materials", geom['m'], len (geom['mm']))
+
+def validate_uv_set (errors, uvlib):
+  uvset = dsf_uvset_load.dsf_uvset (uvlib)
+  what = "uv set %s" % (uvset.get_name ())
+  check_count (errors, what, uvlib['uvs'])
+  n_uvs = uvlib['uvs']['count']
+  check_indices (errors, what + " polygon_vertex_indices",
+                 [t[2] for t in uvlib.get ('polygon_vertex_indices', [])],
+                 n_uvs)
+  if uvset.get_vertex_count () is not None:
+    check_indices (errors, what + " vertices",
+                   [t[1] for t in uvlib.get ('polygon_vertex_indices', [])],
+                   uvset.get_vertex_count ())
+
+def validate_modifier (errors, node):
+  mod = dsf_morph_load.modifier (node)
+  what = "modifier %s" % (mod.name ())
+  if mod.get_type () == 'morph' and (mod.get_vertex_count () or 0) > 0:
+    (indices, offsets) = mod.delta_arrays ()
+    check_indices (errors, what + " deltas", indices.tolist (),
+                   mod.get_vertex_count ())
+  elif mod.get_type () == 'skin':
+    skin = dsf_weightmap.skin (node['skin'])
+    if not skin.vertex_count:
+      return
+    for joint in node['skin']['joints']:
+      for (key, block) in joint.items ():
+        if isinstance (block, dict) and 'values' in block:
+          check_indices (errors, what + " %s %s" % (joint['id'], key),
+                         [int (v[0]) for v in block['values']],
+                         skin.vertex_count)
+
+def validate_nodes (errors, nodes):
+  arm = dsf_armature.armature (nodes)
+  for node in nodes:
+    parent = arm.get_bone (node['id']).get_parent ()
+    if parent is not None and '#' not in parent\
+       and parent not in arm.bone_dic:
+      errors.append ("node %s: unknown parent %s" % (node['id'], parent))
+
+def validate_file (filename, opts):
+  """check the internal consistency of a file. Returns the list of
+     errors found.
+  """
+  jdata = dsf_io.read_json_data (filename)
+  errors = []
+  for geo in jdata.get ('geometry_library', []):
+    validate_geometry (errors, geo)
+  for uvlib in jdata.get ('uv_set_library', []):
+    validate_uv_set (errors, uvlib)
+  for node in jdata.get ('modifier_library', []):
+    validate_modifier (errors, node)
+  validate_nodes (errors, jdata.get ('node_library', []))
+  return {'ok': not errors, 'errors': errors}
+
+def convert_file (filename, opts):
+  """rewrite a file below the destination directory, (un-)compressed.
+  """
+  jdata = dsf_io.read_json_data (filename)
+  relpath = os.path.relpath (filename, opts['root'])
+  dest = os.path.join (opts['dest'], relpath)
+  dsf_io.write_json_data (jdata, dest, mkdir = True,
+                          compress = opts['compress'], level = opts['level'],
+                          precision = opts['precision'])
+  return {'output': dest, 'size': os.path.getsize (dest),
+          'input_size': os.path.getsize (filename)}
+
+def stats_file (filename, opts):
+  """statistics of the morphs in a file: number of deltas, sparsity and
+     size of the displacements.
+  """
+  jdata = dsf_io.read_json_data (filename)
+  mod_lib = dsf_morph_load.modifier_lib (jdata.get ('modifier_library', []))
+  morphs = []
+  for mod in mod_lib.filter_modifiers ('morph'):
+    (indices, offsets) = mod.delta_arrays ()
+    lengths = (offsets.astype ('float64') ** 2).sum (axis = 1) ** 0.5
+    n_verts = mod.get_vertex_count ()
+    morphs.append ({
+      'id': mod.name (),
+      'deltas': len (indices),
+      'vertex_count': n_verts,
+      'density': len (indices) / n_verts if (n_verts or 0) > 0 else None,
+      'max': float (lengths.max ()) if len (lengths) else 0.0,
+      'mean': float (lengths.mean ()) if len (lengths) else 0.0,
+    })
+  return {'morphs': morphs}
+
+commands = {
+  'inspect': inspect_file,
+  'validate': validate_file,
+  'convert': convert_file,
+  'stats': stats_file,
+}
+
+def process_chunk (command, filenames, opts):
+  """run a command on a list of files in a worker process. Returns a
+     list of result objects; errors are reported in the results.
+  """
+  func = commands[command]
+  results = []
+  for filename in filenames:
+    start = time.perf_counter ()
+    try:
+      result = func (filename, opts)
+      result['status'] = 'ok'
+    except Exception as e:
+      result = {'status': 'error', 'error': "%s: %s" % (type (e).__name__, e)}
+    result['file'] = filename
+    result['seconds'] = round (time.perf_counter () - start, 4)
+    results.append (result)
+  return results
+
+def collect_files (paths):
+  """return the sorted list of dsf/duf files in paths (files or
+     directories).
+  """
+  files = []
+  for path in paths:
+    if os.path.isdir (path):
+      for (dirpath, dirnames, filenames) in os.walk (path):
+        files.extend ([os.path.join (dirpath, name) for name in filenames
+                       if name.lower ().endswith (extensions)])
+    else:
+      files.append (path)
+  return sorted (set ([os.path.abspath (path) for path in files]))
+
+def read_checkpoint (filepath):
+  """return the set of files that are done according to the checkpoint.
+  """
+  if filepath is None or not os.path.exists (filepath):
+    return set ()
+  with open (filepath, 'r', encoding = 'utf-8') as ifh:
+    return set ([line.rstrip ('\n') for line in ifh if line.strip ()])
+
+def run (command, files, opts, jobs = None, chunk_size = 16, ofh = None,
+         checkpoint = None):
+  """run command on files in a pool of jobs processes. The files are
+     handed out in chunks of chunk_size, at most two chunks per process
+     are in flight. Results go to ofh as json-lines, finished files are
+     appended to the checkpoint file. returns the number of failures.
+  """
+  ofh = ofh or sys.stdout
+  done = read_checkpoint (checkpoint)
+  todo = [path for path in files if path not in done]
+  log.info ("%s: %d files, %d already done", command, len (todo),
+            len (files) - len (todo))
+  chunks = [todo[i:i + chunk_size] for i in range (0, len (todo), chunk_size)]
+  chunks.reverse ()
+  failures = 0
+  cfh = open (checkpoint, 'a', encoding = 'utf-8') if checkpoint else None
+  try:
+    with concurrent.futures.ProcessPoolExecutor (jobs) as executor:
+      pending = set ()
+      max_pending = 2 * (jobs or os.cpu_count () or 1)
+      while chunks or pending:
+        while chunks and len (pending) < max_pending:
+          pending.add (executor.submit\
+                       (process_chunk, command, chunks.pop (), opts))
+        (finished, pending) = concurrent.futures.wait\
+          (pending, return_when = concurrent.futures.FIRST_COMPLETED)
+        for future in finished:
+          for result in future.result ():
+            ofh.write (json.dumps (result, sort_keys = True) + '\n')
+            if result['status'] != 'ok' or not result.get ('ok', True):
+              failures += 1
+            if cfh is not None:
+              cfh.write (result['file'] + '\n')
+          ofh.flush ()
+          if cfh is not None:
+            cfh.flush ()
+  finally:
+    if cfh is not None:
+      cfh.close ()
+  return failures
+
+def main (argv = None):
+  parser = argparse.ArgumentParser\
+    (description = 'process dsf files without blender.')
+  parser.add_argument ('command', choices = sorted (commands))
+  parser.add_argument ('paths', nargs = '+',
+                       help = 'files or directories to process')
+  parser.add_argument ('--jobs', '-j', type = int, default = None,
+                       help = 'number of processes (default: cpus)')
+  parser.add_argument ('--chunk-size', type = int, default = 16,
+                       help = 'number of files handed to a process at once')
+  parser.add_argument ('--output', '-o', default = None,
+                       help = 'json-lines file for the results '
+                       '(appended to; default: stdout)')
+  parser.add_argument ('--checkpoint', default = None,
+                       help = 'file recording finished files; '
+                       'files listed there are skipped')
+  parser.add_argument ('--dest', default = None,
+                       help = 'convert: output directory')
+  parser.add_argument ('--root', default = None,
+                       help = 'convert: directory the output paths are '
+                       'relative to (default: common directory of paths)')
+  parser.add_argument ('--compress', action = 'store_true',
+                       help = 'convert: gzip the output files')
+  parser.add_argument ('--level', type = int, default = 6,
+                       help = 'convert: gzip compression level')
+  parser.add_argument ('--precision', type = int, default = None,
+                       help = 'convert: significant digits of floats '
+                       '(default: as many as needed to read back the '
+                       'same value)')
+  parser.add_argument ('--verbose', '-v', action = 'store_true')
+  args = parser.parse_args (argv)
+  logging.basicConfig (level = logging.INFO if args.verbose
+                       else logging.WARNING)
+  files = collect_files (args.paths)
+  opts = {
+    'compress': args.compress, 'level': args.level,
+    'precision': args.precision, 'dest': args.dest, 'root': args.root,
+  }
+  if args.command == 'convert':
+    if args.dest is None:
+      parser.error ("convert needs --dest")
+    if args.root is None:
+      opts['root'] = os.path.commonpath\
+        ([os.path.dirname (path) for path in files]) if files else '.'
+  if args.output:
+    with open (args.output, 'a', encoding = 'utf-8') as ofh:
+      failures = run (args.command, files, opts, args.jobs, args.chunk_size,
+                      ofh, args.checkpoint)
+  else:
+    failures = run (args.command, files, opts, args.jobs, args.chunk_size,
+                    None, args.checkpoint)
+  return 1 if failures else 0
+
+if __name__ == '__main__':
+  sys.exit (main ())
@@ -0,0 +1,109 @@
+# geometry fingerprints to check that morphs, uvs and weight maps
+# fit the mesh they get applied to.
+import hashlib, logging, urllib.parse
+import numpy as np
+
+log = logging.getLogger ('dsf-fingerprint')
+
+# name of the custom property of the object storing the fingerprint.
+fingerprint_prop = 'dsf_fingerprint'
+
+# coordinates are compared after rounding them to this precision.
+quantum = 1e-3
+
+class mismatch_error (ValueError):
+  """raised when data does not fit the geometry of an object.
+  """
+  pass
+
+def make_fingerprint (coords, face_sizes, face_verts):
+  """create the fingerprint string of a geometry.
+     coords is a flat sequence of vertex coordinates (xyz),
+     face_sizes the number of vertices of each face and face_verts the
+     concatenated vertex indices of all faces.
+     the result looks like "v<vertex count>f<face count>:<hash>".
+  """
+  coords = np.asarray (coords, dtype = np.float64).ravel ()
+  face_sizes = np.asarray (face_sizes, dtype = np.int32)
+  face_verts = np.asarray (face_verts, dtype = np.int32)
+  quantized = np.round (coords / quantum).astype (np.int64)
+  digest = hashlib.blake2b (digest_size = 16)
+  digest.update (face_sizes.tobytes ())
+  digest.update (face_verts.tobytes ())
+  digest.update (quantized.tobytes ())
+  return "v%df%d:%s" % (len (coords) // 3, len (face_sizes),
+                        digest.hexdigest ())
+
+def geometry_fingerprint (geom):
+  """fingerprint of an interned geometry (see dsf_geom_load).
+  """
+  face_sizes = [len (f) for f in geom['f']]
+  face_verts = [vi for f in geom['f'] for vi in f]
+  return make_fingerprint (geom['v'], face_sizes, face_verts)
+
+def mesh_fingerprint (msh):
+  """fingerprint of a blender mesh data object.
+  """
+  coords = np.zeros (3 * len (msh.vertices), dtype = np.float32)
+  msh.vertices.foreach_get ('co', coords)
+  face_sizes = np.zeros (len (msh.polygons), dtype = np.int32)
+  msh.polygons.foreach_get ('loop_total', face_sizes)
+  face_verts = np.zeros (len (msh.loops), dtype = np.int32)
+  msh.loops.foreach_get ('vertex_index', face_verts)
+  return make_fingerprint (coords, face_sizes, face_verts)
+
+def parse_fingerprint (fingerprint):
+  """split a fingerprint into (vertex count, face count, hash).
+  """
+  (counts, _, digest) = fingerprint.partition (':')
+  (vcount, _, fcount) = counts[1:].partition ('f')
+  return (int (vcount), int (fcount), digest)
+
+def get_object_fingerprint (obj):
+  """return the fingerprint stored with obj. It is calculated from the
+     mesh and stored if it is missing or if the vertex count has changed.
+  """
+  fingerprint = obj.get (fingerprint_prop)
+  if fingerprint is None or\
+     parse_fingerprint (fingerprint)[0] != len (obj.data.vertices):
+    fingerprint = mesh_fingerprint (obj.data)
+    obj[fingerprint_prop] = fingerprint
+  return fingerprint
+
+def same_parent (url1, url2):
+  """check if two asset urls refer to the same asset.
+  """
+  return urllib.parse.unquote (url1) == urllib.parse.unquote (url2)
+
+def check_fingerprint (fingerprint, vertex_count = None, parent = None,
+                       id_path = None, what = 'data'):
+  """check data for a geometry against the geometries fingerprint.
+     vertex_count and parent are the values given by the data (they
+     are not checked if None). id_path is the path of the geometry the
+     fingerprint belongs to (if known). raises mismatch_error.
+  """
+  (fp_vcount, fp_fcount, _) = parse_fingerprint (fingerprint)
+  if vertex_count is not None and vertex_count != fp_vcount:
+    raise mismatch_error ("%s is for %d vertices, mesh has %d"
+                          % (what, vertex_count, fp_vcount))
+  if parent is not None and id_path is not None\
+     and not same_parent (parent, id_path):
+    raise mismatch_error ("%s is for %s, mesh is %s"
+                          % (what, parent, id_path))
+
+def check_object (obj, what = 'data', **kwarg):
+  """check data against the fingerprint of obj. kwarg are
+     vertex_count and parent (see check_fingerprint).
+  """
+  check_fingerprint (get_object_fingerprint (obj), what = what,
+                     id_path = obj.get ('id_path'), **kwarg)
+
+def is_compatible (fingerprint, **kwarg):
+  """return True if data with the properties in kwarg fits the
+     fingerprint (see check_fingerprint).
+  """
+  try:
+    check_fingerprint (fingerprint, **kwarg)
+    return True
+  except mismatch_error:
+    return False
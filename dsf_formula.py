@@ -0,0 +1,381 @@
+# evaluate the formulas (erc) of modifier libraries.
+import logging, heapq, urllib.parse
+import numpy as np
+
+from . import dsf_io
+
+log = logging.getLogger ('dsf-formula')
+
+# format of a formula within a modifier_library entry:
+# {
+#   "output": "Genesis:#CTRLfoo?value",
+#   "stage": "sum" | "mult" (optional, default is sum),
+#   "operations": [
+#     { "op": "push", "url": "Genesis:/data/...dsf#bar?value" },
+#     { "op": "push", "val": 0.5 },
+#     { "op": "mult" }
+#   ]
+# }
+# splines push the input value, the knots (lists [x, y] or
+# [x, y, tension, continuity, bias]) and the knot count, then apply one
+# of the spline_* operations.
+
+def channel_key (url):
+  """convert a channel url into a key that identifies the channel
+     independent of the file it is referenced from:
+     "Genesis:/data/a.dsf#foo?value" and "#foo?value" both get "foo?value".
+     for node references without an id ("rFoot:?scale/z"), the node name
+     is used.
+  """
+  (ref, _, prop) = url.partition ('?')
+  (node_file, _, asset_id) = ref.partition ('#')
+  if not asset_id:
+    asset_id = node_file.partition (':')[0]
+  if not prop:
+    prop = 'value'
+  return "%s?%s" % (urllib.parse.unquote (asset_id), prop)
+
+class spline (object):
+  """a spline with constant knots, as used by the spline_* operations.
+     evaluates scalars as well as numpy arrays.
+  """
+  def __init__ (self, kind, knots):
+    """kind is one of 'linear', 'constant' or 'tcb'; knots is a list
+       of [x, y] or [x, y, tension, continuity, bias].
+    """
+    knots = sorted (knots, key = lambda k: k[0])
+    self.kind = kind
+    self.xs = np.array ([k[0] for k in knots], dtype = np.float64)
+    self.ys = np.array ([k[1] for k in knots], dtype = np.float64)
+    if kind == 'tcb':
+      (self.d_out, self.d_in) = self.tcb_tangents (knots)
+
+  @classmethod
+  def tcb_tangents (self, knots):
+    """calculate the outgoing and incoming tangents of each knot
+       (kochanek-bartels). the end points are duplicated.
+    """
+    ys = [k[1] for k in knots]
+    n = len (ys)
+    d_out = np.zeros (n)
+    d_in = np.zeros (n)
+    for i in range (n):
+      (t, c, b) = (list (knots[i][2:5]) + [0, 0, 0])[0:3]
+      prev_d = ys[i] - ys[max (i - 1, 0)]
+      next_d = ys[min (i + 1, n - 1)] - ys[i]
+      d_out[i] = ((1-t)*(1+b)*(1+c)/2) * prev_d\
+        + ((1-t)*(1-b)*(1-c)/2) * next_d
+      d_in[i] = ((1-t)*(1+b)*(1-c)/2) * prev_d\
+        + ((1-t)*(1-b)*(1+c)/2) * next_d
+    return (d_out, d_in)
+
+  def __call__ (self, x):
+    """evaluate the spline at x (a number or an array).
+    """
+    if len (self.xs) == 0:
+      return x * 0.0
+    if self.kind == 'linear':
+      return np.interp (x, self.xs, self.ys)
+    # index of the segment [xs[i], xs[i+1]] containing x.
+    last = len (self.xs) - 1
+    idx = np.clip (np.searchsorted (self.xs, x, side = 'right') - 1, 0, last)
+    if self.kind == 'constant':
+      return np.where (x < self.xs[0], self.ys[0], self.ys[idx])
+    nidx = np.minimum (idx + 1, last)
+    width = self.xs[nidx] - self.xs[idx]
+    s = np.clip (np.where (width > 0,
+                           (x - self.xs[idx]) / np.where (width > 0, width, 1),
+                           0), 0, 1)
+    s2 = s * s
+    s3 = s2 * s
+    return ((2*s3 - 3*s2 + 1) * self.ys[idx]
+            + (s3 - 2*s2 + s) * self.d_out[idx]
+            + (-2*s3 + 3*s2) * self.ys[nidx]
+            + (s3 - s2) * self.d_in[nidx])
+
+def op_div (a, b):
+  """division that returns 0 when dividing by zero.
+  """
+  return np.where (b != 0, a / np.where (b != 0, b, 1), 0.0)
+
+binary_ops = {
+  'add': lambda a, b: a + b,
+  'sub': lambda a, b: a - b,
+  'mult': lambda a, b: a * b,
+  'div': op_div,
+}
+
+class formula (object):
+  """a single formula compiled from its list of operations.
+     the compiled program is a list of (op, arg) pairs, where op is one of
+     'val' (push a constant), 'ref' (push a channel value), 'spline' (apply
+     a spline to the top of the stack) or a binary operation.
+  """
+  def __init__ (self, jdata):
+    """compile the formula from the json-object of the formula.
+    """
+    self.output = channel_key (jdata['output'])
+    self.stage = jdata.get ('stage', 'sum')
+    if self.stage not in ['sum', 'mult']:
+      raise ValueError ("unknown formula stage '%s'" % (self.stage))
+    self.program = []
+    self.inputs = []
+    stack = []
+    for op in jdata['operations']:
+      opname = op['op']
+      if opname == 'push' and 'url' in op:
+        key = channel_key (op['url'])
+        self.inputs.append (key)
+        self.program.append (('ref', key))
+        stack.append (None)
+      elif opname == 'push':
+        self.program.append (('val', op['val']))
+        stack.append (op['val'])
+      elif opname in binary_ops:
+        self.program.append ((opname, None))
+        stack[-2:] = [None]
+      elif opname.startswith ('spline_'):
+        # the knots and the count are constants, they get folded
+        # into the spline object.
+        count = int (stack.pop ())
+        knots = stack[len (stack) - count:]
+        del stack[len (stack) - count:]
+        del self.program[len (self.program) - count - 1:]
+        self.program.append (('spline', spline (opname[7:], knots)))
+      else:
+        raise ValueError ("unknown formula operation '%s'" % (opname))
+
+  def evaluate (self, values):
+    """run the program. values maps channel keys to their values,
+       which may be numbers or numpy arrays.
+    """
+    stack = []
+    for (op, arg) in self.program:
+      if op == 'ref':
+        stack.append (values[arg])
+      elif op == 'val':
+        stack.append (arg)
+      elif op == 'spline':
+        stack.append (arg (stack.pop ()))
+      else:
+        b = stack.pop ()
+        a = stack.pop ()
+        stack.append (binary_ops[op] (a, b))
+    return stack[-1]
+
+class channel (object):
+  """the static definition of a channel: its initial value and limits.
+  """
+  def __init__ (self, key, value = 0.0, min = None, max = None,
+                clamped = False):
+    self.key = key
+    self.value = value
+    self.min = min
+    self.max = max
+    self.clamped = clamped
+
+  @classmethod
+  def from_jdata (self, key, jdata):
+    """create a channel from the channel-object of a modifier.
+    """
+    return channel\
+      (key, value = float (jdata.get ('current_value', jdata.get ('value', 0))),
+       min = jdata.get ('min'), max = jdata.get ('max'),
+       clamped = jdata.get ('clamped', False))
+
+  def clamp (self, value):
+    """clamp the value to the channel limits, if required.
+    """
+    if self.clamped and self.min is not None and self.max is not None:
+      return np.clip (value, self.min, self.max)
+    else:
+      return value
+
+class formula_graph (object):
+  """dependency graph of the channels of a set of modifier libraries.
+     the final value of each channel is
+       clamp ((input + sum of sum-formulas) * product of mult-formulas)
+     where input is either the value set by the user or the initial value.
+  """
+  def __init__ (self):
+    self.channels = dict ()
+    self.formulas = []
+    # channel key -> list of formulas writing to it.
+    self.writers = dict ()
+    # channel key -> set of channel keys depending on it.
+    self.dependents = dict ()
+    self.order = None
+    self.position = None
+    self.inputs = dict ()
+    self.values = dict ()
+
+  def add_channel (self, chan):
+    """add a channel definition. an existing definition is replaced.
+    """
+    self.channels[chan.key] = chan
+    self.order = None
+
+  def add_formula (self, form):
+    """add a compiled formula to the graph.
+    """
+    self.formulas.append (form)
+    self.writers.setdefault (form.output, []).append (form)
+    for key in form.inputs:
+      self.dependents.setdefault (key, set ()).add (form.output)
+    self.order = None
+
+  def add_modifier_library (self, jdata):
+    """add the channels and formulas of a modifier_library (a list
+       of modifiers).
+    """
+    for modifier in jdata:
+      if 'channel' in modifier:
+        chan = modifier['channel']
+        key = "%s?%s" % (modifier['id'], chan.get ('id', 'value'))
+        self.add_channel (channel.from_jdata (key, chan))
+      for fdata in modifier.get ('formulas', []):
+        self.add_formula (formula (fdata))
+
+  def add_file (self, filename):
+    """load a dsf file and add its modifier_library.
+    """
+    jdata = dsf_io.load_json_data (filename)
+    self.add_modifier_library (jdata.get ('modifier_library', []))
+
+  @classmethod
+  def from_files (self, filenames):
+    """create a compiled graph from the modifier libraries of the files.
+    """
+    graph = formula_graph ()
+    for filename in filenames:
+      graph.add_file (filename)
+    graph.compile ()
+    return graph
+
+  def get_channel (self, key):
+    """return the channel definition for key, creating a default
+       channel for keys referenced only by formulas.
+    """
+    if key not in self.channels:
+      self.channels[key] = channel (key)
+    return self.channels[key]
+
+  def compile (self):
+    """sort the channels topologically. raises ValueError if the
+       formulas contain a cycle.
+    """
+    keys = set (self.channels.keys ()) | set (self.writers.keys ())\
+      | set (self.dependents.keys ())
+    for key in keys:
+      self.get_channel (key)
+    indegree = { key: 0 for key in keys }
+    for deps in self.dependents.values ():
+      for key in deps:
+        indegree[key] += 1
+    # use a heap so the order is deterministic.
+    ready = [key for (key, deg) in indegree.items () if deg == 0]
+    heapq.heapify (ready)
+    order = []
+    while ready:
+      key = heapq.heappop (ready)
+      order.append (key)
+      for dep in self.dependents.get (key, ()):
+        indegree[dep] -= 1
+        if indegree[dep] == 0:
+          heapq.heappush (ready, dep)
+    if len (order) != len (keys):
+      cyclic = sorted (key for (key, deg) in indegree.items () if deg > 0)
+      raise ValueError ("formula cycle between channels: %s"
+                        % (", ".join (cyclic[:10])))
+    self.order = order
+    self.position = { key: pos for (pos, key) in enumerate (order) }
+    self.values = dict ()
+    for key in order:
+      self.values[key] = self.evaluate_channel (key, self.values)
+    log.info ("compiled %d channels, %d formulas",
+              len (order), len (self.formulas))
+
+  def evaluate_channel (self, key, values, inputs = None):
+    """calculate the value of a single channel from the values
+       of its inputs.
+    """
+    chan = self.channels[key]
+    if inputs is None:
+      inputs = self.inputs
+    value = inputs.get (key, chan.value)
+    mult_forms = []
+    for form in self.writers.get (key, ()):
+      if form.stage == 'sum':
+        value = value + form.evaluate (values)
+      else:
+        mult_forms.append (form)
+    for form in mult_forms:
+      value = value * form.evaluate (values)
+    value = chan.clamp (value)
+    if np.ndim (value) == 0:
+      return float (value)
+    return value
+
+  def get_value (self, key):
+    """return the current value of the channel.
+    """
+    return self.values[key]
+
+  def downstream (self, keys):
+    """return the channels depending directly or indirectly on keys
+       (including keys) in evaluation order.
+    """
+    cone = set (keys)
+    stack = list (keys)
+    while stack:
+      for dep in self.dependents.get (stack.pop (), ()):
+        if dep not in cone:
+          cone.add (dep)
+          stack.append (dep)
+    return sorted (cone, key = self.position.__getitem__)
+
+  def set_values (self, settings):
+    """set the input values of some channels (a mapping key->value) and
+       re-evaluate only the channels affected by them.
+       returns the list of re-evaluated channels.
+    """
+    if self.order is None:
+      self.compile ()
+    for (key, value) in settings.items ():
+      self.get_channel (key)
+      if key not in self.position:
+        # a channel that is not part of the graph yet.
+        self.compile ()
+      self.inputs[key] = value
+    cone = self.downstream (settings.keys ())
+    for key in cone:
+      self.values[key] = self.evaluate_channel (key, self.values)
+    return cone
+
+  def set_value (self, key, value):
+    """set the input value of a single channel.
+    """
+    return self.set_values ({ key: value })
+
+  def evaluate_batch (self, settings, keys = None):
+    """evaluate many settings at once. settings maps channel keys to
+       sequences of input values (all of the same length n).
+       returns a mapping key->numpy array of length n for the requested
+       keys (default: all channels).
+    """
+    if self.order is None:
+      self.compile ()
+    arrays = { key: np.asarray (vals, dtype = np.float64)
+               for (key, vals) in settings.items () }
+    n = max ([len (a) for a in arrays.values ()], default = 0)
+    inputs = dict (self.inputs)
+    inputs.update (arrays)
+    # only the cone of the varying channels needs per-setting arrays;
+    # every other channel keeps its current (scalar) value.
+    values = dict (self.values)
+    for key in self.downstream ([k for k in arrays if k in self.position]):
+      values[key] = self.evaluate_channel (key, values, inputs)
+    if keys is None:
+      keys = self.order
+    return { key: np.broadcast_to (values[key], (n,)).astype (np.float64)
+             for key in keys }
@@ -2,6 +2,11 @@ import bpy, bmesh
 import logging
 from array import array
 
+from . import dsf_trace
+
+from . import dsf_fingerprint
+from . import dsf_modal
+
 class dsf_geom_define (object):
   """utility class for inserting mesh data into blender.
   """
@@ -27,31 +32,48 @@ class dsf_geom_define (object):
     return gnmap
 
   @classmethod
-  def define_geom (self, name, geom):
-    """load the vertices and faces into blender.
+  @dsf_trace.traced ()
+  def define_geom_steps (self, name, geom, undo):
+    """load the vertices and faces into blender. This is a generator
+       returning the created object, which is recorded in undo.
+       The mesh is built in a single step: blender data (and the bmesh)
+       must not be kept across steps (see dsf_modal.get_object).
     """
     bmesh_dat = bmesh.new ()
-    v = geom['v']
-    # insert vertices. qmod.v is a list of triples (x,y,z), so there are a
-    # third of them verts.
-    n_verts = len (v) // 3
-    for vert_idx in range (n_verts):
-      vert_coords = v[3*vert_idx : 3*vert_idx+3]
-      bmesh_dat.verts.new (vert_coords)
-    # each face has exactly 4 vertex indices.
-    f = geom['f']
-    for (face_idx, face_vis) in enumerate (f):
-      bmesh_dat.faces.new ([bmesh_dat.verts[vi] for vi in face_vis])
-    # convert the bmesh to a mesh
-    mesh_dat = bpy.data.meshes.new (name)
-    mesh_obj = bpy.data.objects.new (name, mesh_dat)
-    bmesh_dat.to_mesh (mesh_dat)
+    try:
+      v = geom['v']
+      # insert vertices. qmod.v is a list of triples (x,y,z), so there are a
+      # third of them verts.
+      n_verts = len (v) // 3
+      for vert_idx in range (n_verts):
+        vert_coords = v[3*vert_idx : 3*vert_idx+3]
+        bmesh_dat.verts.new (vert_coords)
+      # each face has exactly 4 vertex indices.
+      for face_vis in geom['f']:
+        bmesh_dat.faces.new ([bmesh_dat.verts[vi] for vi in face_vis])
+      # convert the bmesh to a mesh
+      mesh_dat = bpy.data.meshes.new (name)
+      mesh_obj = bpy.data.objects.new (name, mesh_dat)
+      undo.add (dsf_modal.remove_object, mesh_obj.name)
+      bmesh_dat.to_mesh (mesh_dat)
+    finally:
+      bmesh_dat.free ()
     bpy.context.scene.objects.link (mesh_obj)
     bpy.context.scene.update ()
     if 'id_path' in geom:
       mesh_obj['id_path'] = geom['id_path']
-    bmesh_dat.free ()
-    return mesh_obj
+    mesh_obj[dsf_fingerprint.fingerprint_prop] =\
+      dsf_fingerprint.geometry_fingerprint (geom)
+    obj_name = mesh_obj.name
+    yield 1.0
+    return dsf_modal.get_object (obj_name)
+
+  @classmethod
+  def define_geom (self, name, geom):
+    """load the vertices and faces into blender.
+    """
+    return dsf_modal.run_steps\
+      (self.define_geom_steps (name, geom, dsf_modal.undo_log ()))
 
   @classmethod
   def define_materials (self, mesh, geom, use = True, **kwarg):
@@ -60,36 +82,48 @@ class dsf_geom_define (object):
        - use: if set, an existing material of the same
          name is used, otherwise a new material is created.
     """
+    dsf_modal.run_steps (self.define_materials_steps\
+      (mesh.name, geom, dsf_modal.undo_log (), use = use, **kwarg))
+
+  @classmethod
+  @dsf_trace.traced ()
+  def define_materials_steps (self, obj_name, geom, undo, use = True,
+                              **kwarg):
+    """generator version of define_materials for the object obj_name,
+       yielding the progress after each material. Created materials are
+       recorded in undo.
+    """
     # material index is the index within the mesh, not the obj-file.
     # Two save material-indexes, assign materials only if there are
     # actual faces using them.
     m = geom['m']
-    bmesh_dat = bmesh.new ()
-    bmesh_dat.from_mesh (mesh.data)
-    material_index = 0
+    used = set (m)
+    # the material index in the mesh by material id.
+    material_indices = dict ()
     for (mat_id, mat_name) in enumerate (geom['mm']):
-      # get a list of all faces with the given material id.
-      fset = array ('i', filter (lambda idx: m[idx] == mat_id, range (len (m))))
       # only create a material if there are actually faces using it.
       # This is just by taste and should probably be user-selectable.
-      if len (fset) > 0:
+      if mat_id in used:
         if use and mat_name in bpy.data.materials:
           # re-use the existing material
           blender_mat = bpy.data.materials[mat_name]
         else:
           blender_mat = bpy.data.materials.new (mat_name)
+          undo.add (dsf_modal.remove_material, blender_mat.name)
         # if the material already exists, force the name by explicitly assigning
         # it. Otherwise the new material would get a new name with a suffix.
         # this should probably be configurable, but this default-behavior is
         # slightly more predictable (old materials get renamed).
         blender_mat.name = mat_name
+        mesh = dsf_modal.get_object (obj_name)
+        material_indices[mat_id] = len (material_indices)
         mesh.data.materials.append (blender_mat)
-        for fidx in fset:
-          bmesh_dat.faces[fidx].material_index = material_index
-        material_index += 1
+      yield (mat_id + 1) / len (geom['mm'])
+    mesh = dsf_modal.get_object (obj_name)
+    mesh.data.polygons.foreach_set\
+      ('material_index', array ('i', [material_indices.get (mat_id, 0)
+                                      for mat_id in m]))
     # todo: find out if these updates are necessary.
-    bmesh_dat.to_mesh (mesh.data)
-    bmesh_dat.free ()
     mesh.data.update ()
     bpy.context.scene.update ()
 
@@ -109,12 +143,22 @@ class dsf_geom_define (object):
   def define_groups (self, mesh, geom):
     """assign vertex groups based on the object face-groups.
     """
+    dsf_modal.run_steps (self.define_groups_steps (mesh.name, geom))
+
+  @classmethod
+  @dsf_trace.traced ()
+  def define_groups_steps (self, obj_name, geom):
+    """generator version of define_groups for the object obj_name,
+       yielding the progress after each group.
+    """
     # the model only contains a map containing group-sets and their ids.
     # So first split this into single groups.
     gnmap = self.create_vertex_groups (geom)
-    for (gname, vidxs) in gnmap.items ():
+    for (gidx, (gname, vidxs)) in enumerate (gnmap.items ()):
       if len (vidxs) > 0:
-        self.define_weight_by_name (mesh, gname, vidxs)
+        self.define_weight_by_name\
+          (dsf_modal.get_object (obj_name), gname, vidxs)
+      yield (gidx + 1) / len (gnmap)
 
   @classmethod
   def define_model (self,  geom, use_mat = True, define_groups = True):
@@ -122,14 +166,27 @@ class dsf_geom_define (object):
        kwarg use_mat: do not create material if already exists.
        returns the created object.
     """
+    return dsf_modal.run_steps (self.define_model_steps\
+      (geom, dsf_modal.undo_log (), use_mat, define_groups))
+
+  @classmethod
+  def define_model_steps (self, geom, undo, use_mat = True,
+                          define_groups = True):
+    """generator version of define_model, yielding the progress; the
+       created data is recorded in undo. returns the created object.
+    """
     # insert the vertices and basic faces into the model.
-    mesh_obj = self.define_geom ('Mesh', geom)
+    obj_name = (yield from dsf_modal.scale_steps\
+      (self.define_geom_steps ('Mesh', geom, undo), 0, 0.8)).name
     if define_groups and 'g' in geom:
       self.log.info ("define groups")
-      self.define_groups (mesh_obj, geom)
+      yield from dsf_modal.scale_steps\
+        (self.define_groups_steps (obj_name, geom), 0.8, 0.9)
     if 'm' in geom:
       self.log.info ("define materials")
-      self.define_materials (mesh_obj, geom, use = use_mat)
+      yield from dsf_modal.scale_steps (self.define_materials_steps\
+        (obj_name, geom, undo, use = use_mat), 0.9, 1.0)
+    mesh_obj = dsf_modal.get_object (obj_name)
     mesh_obj.data.update ()
     bpy.context.scene.update ()
     return mesh_obj
@@ -3,6 +3,8 @@ import logging, json
 import bpy
 from bpy.props import StringProperty
 
+from . import dsf_trace
+
 log = logging.getLogger ('dsf-geom-exp')
 
 # the rest defines the gui and the blender operator
@@ -28,7 +30,8 @@ class export_dsf_geom (bpy.types.Operator):
     # independent of this context-manager/operator logic.
     filename = self.properties.filepath
     log.info ("user selected %s", filename)
-    self.export_file (filename, context = context)
+    with dsf_trace.session ('export dsf-geom', file = filename):
+      self.export_file (filename, context = context)
     return { 'FINISHED' }
 
   def invoke (self, context, event):
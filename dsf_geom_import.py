@@ -3,8 +3,7 @@ import bpy
 from bpy_extras.io_utils import ImportHelper
 from bpy.props import BoolProperty, StringProperty
 
-from .dsf_geom_load import dsf_geom_load
-from .dsf_geom_define import dsf_geom_define
+from . import dsf_modal
 
 log = logging.getLogger ('dsf_mesh_import')
 
@@ -47,6 +46,8 @@ def import_dsf_file (filename, props):
      materials: assign material indexes.
      use_mat: use existing materials with same name.
   """
+  from .dsf_geom_load import dsf_geom_load
+  from .dsf_geom_define import dsf_geom_define
   parser_flags = get_parser_flags (props)
   # parse the dsf-file.
   geom = dsf_geom_load.load_file (filename)
@@ -57,8 +58,29 @@ def import_dsf_file (filename, props):
   obj['dsf-path'] = filename
   return obj
 
+class geom_import_job (dsf_modal.import_job):
+  """import a geometry as a job (see import_dsf_file).
+  """
+  def __init__ (self, filepath, props):
+    super (geom_import_job, self).__init__ (filepath)
+    self.props = props
+
+  def parse (self):
+    from .dsf_geom_load import dsf_geom_load
+    from . import dsf_prefetch
+    dsf_prefetch.prefetch_for_import ([self.filepath])
+    self.geom = dsf_geom_load.load_file (self.filepath)
+
+  def build (self, context):
+    from .dsf_geom_define import dsf_geom_define
+    obj = yield from dsf_geom_define.define_model_steps\
+      (self.geom, self.undo, use_mat = 'use_mat' in self.props,
+       define_groups = self.props['groups'])
+    obj['dsf-path'] = self.filepath
+    context.scene.objects.active = obj
+
 # the rest defines the gui and the blender operator
-class import_dsf (bpy.types.Operator):
+class import_dsf (dsf_modal.modal_import, bpy.types.Operator):
   # the doc text is displayed in the tooltip of the menu entry.
   """Load a daz studio 4 dsf file."""
   # the bl_label is displayed in the operator-menu (with space-KEY).
@@ -87,9 +109,9 @@ class import_dsf (bpy.types.Operator):
        description = 'assign vertex groups based on face groups',
        default = True)
 
-  def execute (self, context):
-    """display the gui and load a file. This function should be
-       called after the menu entry for the file is selected."""
+  def create_job (self, context):
+    """create the job loading the file. It is run by execute, which
+       is called after the menu entry for the file is selected."""
     import_props = {
       'materials': self.properties.prop_materials,
       'use_material': self.properties.prop_use_material,
@@ -98,11 +120,7 @@ class import_dsf (bpy.types.Operator):
     }
     log.info ("execute (path = {0}, kwargs = {1})".format\
                 (self.properties.filepath, str (import_props)))
-    # call the main import function. This function should work
-    # independent of this context-manager/operator logic.
-    obj = import_dsf_file (self.properties.filepath, import_props)
-    context.scene.objects.active = obj
-    return { 'FINISHED' }
+    return geom_import_job (self.properties.filepath, import_props)
   def invoke (self, context, event):
     """The invoke function should be called when the menu-entry for
        this operator is selected. It displays a file-selector and
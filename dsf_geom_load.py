@@ -1,34 +1,41 @@
-import json, mathutils
+import json
+import urllib.parse as urp
 from array import array
 
+from . import dsf_trace
+
 class dsf_geom_load (object):
   def __init__ (self):
     pass
 
   @classmethod
-  def intern_geometry (self, jdata):
+  def intern_geometry (self, jdata, path = None):
     """jdata is an entry within a geometry-library.
        returns an internal representation of the geometry.
       result contains:
         v=vertices, f=faces
         g=group-indices, m=material-indices,
         gm=group-names, m=material-names
+        id_path=url of the geometry (path#id), only if path
+          (the asset path of the file) is given.
     """
     id = jdata['id']
     v = array ('f')
     f = list ()
     m = array ('i')
     g = array ('i')
-    for vertex in jdata['vertices']['values']:
-      v.extend (vertex)
-    group_list = jdata['polygon_groups']['values']
-    mat_list = jdata['polygon_material_groups']['values']
-    for polygon in jdata['polylist']['values']:
-      (gidx, midx, verts) = (polygon[0], polygon[1], polygon[2:])
-      f.append (verts)
-      m.append (midx)
-      g.append (gidx)
-    return {
+    with dsf_trace.span ('intern_geometry', items = len\
+                         (jdata['polylist']['values'])):
+      for vertex in jdata['vertices']['values']:
+        v.extend (vertex)
+      group_list = jdata['polygon_groups']['values']
+      mat_list = jdata['polygon_material_groups']['values']
+      for polygon in jdata['polylist']['values']:
+        (gidx, midx, verts) = (polygon[0], polygon[1], polygon[2:])
+        f.append (verts)
+        m.append (midx)
+        g.append (gidx)
+    geom = {
       'v': v,
       'g': g,
       'm': m,
@@ -36,13 +43,17 @@ class dsf_geom_load (object):
       'gm': group_list,
       'mm': mat_list
     }
+    if path is not None:
+      geom['id_path'] = path + '#' + urp.quote (id)
+    return geom
 
   @classmethod
-  def intern_geometry_library (self, jdata):
+  def intern_geometry_library (self, jdata, path = None):
     """load all geometries from the geometry_library (must be a list).
+       path is the asset path of the file (see intern_geometry).
        returns a list of all geometries.
     """
-    return [self.intern_geometry (gitem) for gitem in jdata]
+    return [self.intern_geometry (gitem, path) for gitem in jdata]
 
   @classmethod
   def load_node_lib_entry (self, jdata):
@@ -57,8 +68,11 @@ class dsf_geom_load (object):
   def load_geometry (self, filename):
     """create a model from the json-data in jdata."""
     from . import dsf_io
-    jdata = dsf_io.read_json_data (filename, encoding = 'latin1')
-    geo_lib = self.intern_geometry_library (jdata['geometry_library'])
+    jdata = dsf_io.load_json_data (filename)
+    # morphs and other modifiers refer to the geometry by the asset id
+    # of the file (eg. /data/DAZ%203D/Genesis/Base/Genesis.dsf).
+    path = jdata.get ('asset_info', {}).get ('id', filename)
+    geo_lib = self.intern_geometry_library (jdata['geometry_library'], path)
     if len (geo_lib) > 0:
       return geo_lib[0]
     else:
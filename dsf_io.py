@@ -1,4 +1,7 @@
-import json, gzip, codecs, os, os.path
+import json, gzip, codecs, os, os.path, threading, collections, zlib, mmap
+import gc, contextlib
+
+from . import dsf_trace
 
 def open_text_file (filename, encoding = 'latin1'):
   """open a binary file and return a readable handle.
@@ -12,11 +15,241 @@ def open_text_file (filename, encoding = 'latin1'):
     ifh = open (filename, 'rb')
   return codecs.getreader (encoding) (ifh)
 
-def read_json_data (filename, **kwarg):
+class json_backend (object):
+  """a json parser. loads parses a str; if accepts_bytes is set,
+     it also parses utf-8 encoded bytes (and buffers like mmaps).
+  """
+  def __init__ (self, name, loads, accepts_bytes = False):
+    self.name = name
+    self.loads = loads
+    self.accepts_bytes = accepts_bytes
+
+# the available json backends by name and the one currently used.
+json_backends = {}
+active_backend = None
+
+def register_json_backend (backend):
+  """make a json_backend available (see set_json_backend).
+  """
+  json_backends[backend.name] = backend
+
+def set_json_backend (name):
+  """select the json backend used by read_json_data.
+  """
+  global active_backend
+  if name not in json_backends:
+    raise KeyError ("unknown json backend %s, have %s"
+                    % (name, sorted (json_backends)))
+  active_backend = json_backends[name]
+
+def get_json_backend ():
+  return active_backend
+
+register_json_backend (json_backend ('json', json.loads))
+try:
+  import orjson
+  register_json_backend\
+    (json_backend ('orjson', orjson.loads, accepts_bytes = True))
+except ImportError:
+  pass
+try:
+  import ujson
+  register_json_backend (json_backend ('ujson', ujson.loads))
+except ImportError:
+  pass
+# use the fastest installed backend unless DSF_JSON_BACKEND says otherwise.
+set_json_backend\
+  (os.environ.get ('DSF_JSON_BACKEND',
+                   'orjson' if 'orjson' in json_backends else 'json'))
+
+def decompress_gzip (data):
+  """decompress all members of the gzip data into a single bytes object.
+  """
+  chunks = []
+  while data:
+    dobj = zlib.decompressobj (16 + zlib.MAX_WBITS)
+    chunks.append (dobj.decompress (data))
+    chunks.append (dobj.flush ())
+    data = dobj.unused_data
+  return b''.join (chunks)
+
+@contextlib.contextmanager
+def gc_paused ():
+  """disable the garbage collector in the context. Parsing creates
+     millions of lists, which would trigger many useless collections.
+  """
+  enabled = gc.isenabled ()
+  gc.disable ()
+  try:
+    yield
+  finally:
+    if enabled:
+      gc.enable ()
+
+def is_utf8 (data):
+  """check if the bytes (or buffer) data are valid utf-8.
+  """
+  try:
+    codecs.utf_8_decode (data, 'strict', True)
+    return True
+  except UnicodeDecodeError:
+    return False
+
+def parse_json_bytes (data, encoding = None):
+  """parse json from bytes (or a buffer like a memoryview) with the
+     active backend. Without an encoding, the data is utf-8; if it is
+     not valid utf-8, it is read as latin1.
+  """
+  backend = active_backend
+  with gc_paused ():
+    if encoding is None:
+      if backend.accepts_bytes:
+        try:
+          return backend.loads (data)
+        except ValueError:
+          # only retry for a decoding error, invalid json is raised.
+          if is_utf8 (data):
+            raise
+        text = bytes (data).decode ('latin1')
+      else:
+        try:
+          text = bytes (data).decode ('utf-8')
+        except UnicodeDecodeError:
+          text = bytes (data).decode ('latin1')
+    else:
+      text = bytes (data).decode (encoding)
+    return backend.loads (text)
+
+def read_json_data (filename, encoding = None):
   """open the (possibly compressed) file and return its json data.
-     the only supported kw-arg at the moment is 'encoding'
+     Compressed files are decompressed into memory at once, plain files
+     are mapped if the backend can parse buffers.
+     encoding is the encoding of the file (see parse_json_bytes).
   """
-  return json.load (open_text_file (filename, **kwarg))
+  with dsf_trace.span ('read_json_data', file = filename),\
+       open (filename, 'rb') as ifh:
+    first_bytes = ifh.read (2)
+    ifh.seek (0)
+    if first_bytes == b'\x1f\x8b':
+      return parse_json_bytes (decompress_gzip (ifh.read ()), encoding)
+    if encoding is None and active_backend.accepts_bytes and first_bytes:
+      with mmap.mmap (ifh.fileno (), 0, access = mmap.ACCESS_READ) as mdata:
+        # the backends take a memoryview, not the mmap itself; it must
+        # be released before the mmap can be closed.
+        view = memoryview (mdata)
+        try:
+          return parse_json_bytes (view, encoding)
+        finally:
+          view.release ()
+    return parse_json_bytes (ifh.read (), encoding)
+
+def get_file_stamp (filename):
+  """return a tuple (mtime, size) that changes when the file changes.
+  """
+  st = os.stat (filename)
+  return (st.st_mtime, st.st_size)
+
+class asset_cache (object):
+  """parsed json data of files by their absolute path. An entry is only
+     returned while the mtime and size of its file are unchanged. The
+     data must not be modified by its users.
+     The cache is only used within a session (see session); it is
+     cleared when the last session ends, so nothing is kept in memory
+     after an import.
+  """
+  def __init__ (self, max_entries = 64, max_bytes = 256 * 2**20):
+    """max_entries is the number of files to keep, max_bytes the total
+       size of the files (on disk; the parsed data is several times
+       larger). The least recently used files are dropped first.
+    """
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.entries = collections.OrderedDict ()
+    self.total_bytes = 0
+    self.sessions = 0
+    self.lock = threading.Lock ()
+
+  def is_enabled (self):
+    return self.sessions > 0
+
+  @contextlib.contextmanager
+  def session (self):
+    """enable the cache in the context. Sessions may be nested.
+    """
+    with self.lock:
+      self.sessions += 1
+    try:
+      yield self
+    finally:
+      with self.lock:
+        self.sessions -= 1
+        if self.sessions == 0:
+          self.entries.clear ()
+          self.total_bytes = 0
+
+  def get (self, filename):
+    """return the cached data of filename or None.
+    """
+    key = os.path.abspath (filename)
+    with self.lock:
+      entry = self.entries.get (key)
+    if entry is None:
+      return None
+    (stamp, jdata) = entry
+    try:
+      if get_file_stamp (key) != stamp:
+        return None
+    except OSError:
+      return None
+    with self.lock:
+      if key in self.entries:
+        self.entries.move_to_end (key)
+    return jdata
+
+  def put (self, filename, jdata, stamp = None):
+    """store the data of filename. stamp is the file stamp from before
+       the file was read (taken now if None). Outside of a session,
+       nothing is stored.
+    """
+    key = os.path.abspath (filename)
+    if stamp is None:
+      stamp = get_file_stamp (key)
+    with self.lock:
+      if self.sessions == 0:
+        return
+      if key in self.entries:
+        self.total_bytes -= self.entries[key][0][1]
+      self.entries[key] = (stamp, jdata)
+      self.entries.move_to_end (key)
+      self.total_bytes += stamp[1]
+      while len (self.entries) > self.max_entries\
+         or (self.total_bytes > self.max_bytes and len (self.entries) > 1):
+        (_, (old_stamp, _)) = self.entries.popitem (last = False)
+        self.total_bytes -= old_stamp[1]
+
+  def __contains__ (self, filename):
+    return self.get (filename) is not None
+
+  def clear (self):
+    with self.lock:
+      self.entries.clear ()
+      self.total_bytes = 0
+
+# the cache shared by all loaders (see load_json_data).
+shared_cache = asset_cache ()
+
+def load_json_data (filename, **kwarg):
+  """same as read_json_data, but within a session of shared_cache the
+     data is shared with other users of the same file.
+  """
+  if not shared_cache.is_enabled ():
+    return read_json_data (filename, **kwarg)
+  jdata = shared_cache.get (filename)
+  if jdata is None:
+    stamp = get_file_stamp (filename)
+    jdata = read_json_data (filename, **kwarg)
+    shared_cache.put (filename, jdata, stamp)
+  return jdata
 
 def parent_dirs (path):
   """return the dirname of path, and its parents from bottom to up.
@@ -40,13 +273,38 @@ def mkdir_p (dir):
   else:
     os.makedirs (dir, exist_ok = True)
 
+def write_plain_json (jdata, filepath, compress = False, level = 6):
+  """write jdata with json.dump, gzip-compressed if compress is set.
+  """
+  if compress:
+    ofh = gzip.open (filepath, 'wt', compresslevel = level,
+                     encoding = 'utf-8')
+  else:
+    ofh = open (filepath, 'w', encoding = 'utf-8')
+  with ofh:
+    json.dump (jdata, ofh, indent = 2, allow_nan = False)
+
 def write_json_data (jdata, filepath, **kwarg):
+  """write jdata as json to filepath. supported kw-args:
+     mkdir: create the directory of filepath if it does not exist.
+     compress, level, precision: see dsf.json_writer.write_json.
+     Without the dsf package (modules/), the data is written with
+     json.dump; precision is ignored then.
+  """
   dirname, filename = os.path.split (filepath)
   if not os.path.isdir (dirname) and 'mkdir' in kwarg:
     mkdir_p (dirname)
-  ofh = open (filepath, 'w')
-  json.dump (jdata, ofh, indent = 2)
-  ofh.close ()
+  opts = {
+    key: kwarg[key] for key in ['compress', 'level', 'precision']
+    if key in kwarg
+  }
+  try:
+    import dsf.json_writer
+  except ImportError:
+    opts.pop ('precision', None)
+    write_plain_json (jdata, filepath, **opts)
+    return
+  dsf.json_writer.write_json (jdata, filepath, **opts)
                          
 def find_data_parent (path):
   """given a path of a file or directory, find in the directory
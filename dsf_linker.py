@@ -1,18 +1,50 @@
-import collections
+class link_rec (object):
+  """a reference or an id definition: the text for the obj/tag pair
+     target gets stored in dic under key. context is the index of the
+     context (see linker.intern_context).
+  """
+  __slots__ = ('dic', 'key', 'target', 'context')
+  def __init__ (self, dic, key, target, context):
+    self.dic = dic
+    self.key = key
+    self.target = target
+    self.context = context
 
-link_rec = collections.namedtuple\
-  ('link_rec', ['dic', 'key', 'obj', 'tag', 'context'])
-location_rec = collections.namedtuple\
-  ('location_rec', ['context', 'id'])
+class location_rec (object):
+  """the location of an id: the index of its context and the id.
+  """
+  __slots__ = ('context', 'id')
+  def __init__ (self, context, id):
+    self.context = context
+    self.id = id
 
 class linker (object):
-  def __init__ (self):
+  def __init__ (self, debug = None):
+    """debug is an optional function that is called with
+       (obj, tag, text) for every resolved reference.
+    """
     self.refs = []
     self.ids = []
+    # interned context paths; the stack holds indices into it.
+    self.contexts = []
+    self.context_index = {}
     self.context = []
+    # mapping (obj, tag) -> location_rec, filled by assign_ids.
+    self.locations = {}
+    self.debug = debug
+
+  def intern_context (self, path):
+    """return the index of the context path.
+    """
+    index = self.context_index.get (path)
+    if index is None:
+      index = len (self.contexts)
+      self.contexts.append (path)
+      self.context_index[path] = index
+    return index
 
   def push_context (self, path):
-    self.context.append (path)
+    self.context.append (self.intern_context (path))
   def pop_context (self):
     self.context.pop ()
 
@@ -20,44 +52,68 @@ class linker (object):
     """get a reference to an object/tag pair. The reference
        is stored in the dictionary dic under the given key.
     """
-    rec = link_rec (dic, key, obj, tag, self.context[-1])
-    self.refs.append (rec)
-    return (obj, tag)
+    target = (obj, tag)
+    self.refs.append (link_rec (dic, key, target, self.context[-1]))
+    return target
 
   def add_id (self, dic, key, obj, tag):
     """add an id definition to the linker.
        The id is stored in the given dictionary under the given
        key and references the obj/tag.
     """
-    rec = link_rec (dic, key, obj, tag, self.context[-1])
-    self.ids.append (rec)
-    return (obj, tag)
+    target = (obj, tag)
+    self.ids.append (link_rec (dic, key, target, self.context[-1]))
+    return target
 
   def assign_ids (self):
     """assign all ids. ids within each context will be different.
+       returns the mapping (obj, tag) -> location_rec.
     """
     context_counts = {}
-    locations = {}
+    # the prefix of the id of each obj/tag pair is formatted only once.
+    prefixes = {}
+    locations = self.locations
     for id in self.ids:
-      unique_name = (id.context, id.obj.name, id.tag)
+      target = id.target
+      prefix = prefixes.get (target)
+      if prefix is None:
+        prefix = "%s-%s-" % (target[0].name, target[1])
+        prefixes[target] = prefix
+      unique_name = (id.context, prefix)
       num_suffix = context_counts.get (unique_name, 0)
       context_counts[unique_name] = num_suffix + 1
-      id_name = "%s-%s-%d" % (id.obj.name, id.tag, num_suffix)
-      locations[(id.obj, id.tag)] = location_rec (id.context, id_name)
+      id_name = prefix + str (num_suffix)
+      locations[target] = location_rec (id.context, id_name)
       id.dic[id.key] = id_name
     return locations
+
   def resolve_refs (self, locs):
     """replace references with their locations.
        The locations are generated by the id assigning process.
     """
+    # the text of a reference only depends on the target and on
+    # whether the reference is in the context of the target.
+    local_names = {}
+    remote_names = {}
+    contexts = self.contexts
+    debug = self.debug
     for ref in self.refs:
-      print ("have ref: %s, %s" % (ref.obj, ref.tag))
-      loc = locs[(ref.obj, ref.tag)]
+      target = ref.target
+      loc = locs[target]
       if loc.context == ref.context:
-        loc_name = "#%s" % (loc.id)
+        loc_name = local_names.get (target)
+        if loc_name is None:
+          loc_name = "#" + loc.id
+          local_names[target] = loc_name
       else:
-        loc_name = "%s#%s" % (loc.context, loc.id)
+        loc_name = remote_names.get (target)
+        if loc_name is None:
+          loc_name = "%s#%s" % (contexts[loc.context], loc.id)
+          remote_names[target] = loc_name
       ref.dic[ref.key] = loc_name
+      if debug is not None:
+        debug (target[0], target[1], loc_name)
+
   def resolve (self):
     """resolve all links and replace them with text.
     """
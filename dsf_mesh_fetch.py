@@ -1,3 +1,5 @@
+# the dsf package (modules/) is imported where needed, so this module
+# can be imported without it (see dsf_trace).
 
 class dsf_mesh_fetch (object):
   """fetch the export data for a geometry from a mesh object.
@@ -15,17 +17,15 @@ class dsf_mesh_fetch (object):
     """build a mapping from polygon to material index for the given mesh.
        if the mesh has no materials a default material is assigned.
     """
-    mats = [p.material_index for p in msh.data.polygons]
-    return mats
+    import dsf.mesh_extract
+    return dsf.mesh_extract.mesh_buffers (msh.data).materials.tolist ()
 
   @classmethod
   def get_polygon_vidxs (self, msh):
     """return a list of lists containing vertex indices (one for each polygon).
     """
-    pvidxs = []
-    for polygon in msh.polygons:
-      pvidxs.append (list (polygon.vertices))
-    return pvidxs
+    import dsf.mesh_extract
+    return dsf.mesh_extract.mesh_buffers (msh).get_polygon_lists ()
 
   @classmethod
   def convert_polylist (self, msh, groups, mats):
@@ -39,9 +39,8 @@ class dsf_mesh_fetch (object):
     """get the list of vertex coordinates from the mesh.
        returns a vertices-object.
     """
-    values = []
-    for vertex in msh.vertices:
-      values.append ([vertex.co.x, vertex.co.y, vertex.co.z])
+    import dsf.mesh_extract
+    values = dsf.mesh_extract.mesh_buffers (msh).coords.tolist ()
     count = len (values)
     return {
       'count': count,
@@ -0,0 +1,357 @@
+# run imports in the background: the file is parsed in a thread, the
+# blender data is created in small steps on timer events, so the user
+# interface stays responsive. Imports can be cancelled with ESC; the
+# data created so far is removed again.
+import contextlib, logging, threading, time
+import bpy
+from bpy.props import BoolProperty
+
+from . import dsf_trace
+
+log = logging.getLogger ('dsf-modal')
+
+def run_steps (steps):
+  """run a generator of steps to its end and return its return value.
+  """
+  while True:
+    try:
+      next (steps)
+    except StopIteration as e:
+      return e.value
+
+def scale_steps (steps, start, end):
+  """map the progress fractions yielded by steps to the range
+     start..end. Returns the return value of steps.
+  """
+  while True:
+    try:
+      fraction = next (steps)
+    except StopIteration as e:
+      return e.value
+    yield start + (end - start) * fraction
+
+def iter_chunks (total, chunk):
+  """yield the ranges (start, end) of the chunks of total items.
+  """
+  for start in range (0, total, chunk):
+    yield (start, min (start + chunk, total))
+
+class undo_log (object):
+  """the actions for removing the data created by an import. The actions
+     are run in reverse order by rollback.
+  """
+  def __init__ (self):
+    self.actions = []
+
+  def add (self, func, *arg):
+    self.actions.append ((func, arg))
+
+  def clear (self):
+    self.actions = []
+
+  def rollback (self):
+    while self.actions:
+      (func, arg) = self.actions.pop ()
+      try:
+        func (*arg)
+      except Exception:
+        log.exception ("rollback: %s%s failed", func.__name__, arg)
+
+# blender data can be removed by the user (or by undo) between two steps
+# of a job, which leaves python references to it dangling. Steps look up
+# the data they work on by name instead of keeping references.
+
+def get_object (name):
+  """return the object name. Raises a mismatch_error if it no longer
+     exists.
+  """
+  from . import dsf_fingerprint
+  obj = bpy.data.objects.get (name)
+  if obj is None:
+    raise dsf_fingerprint.mismatch_error\
+      ("object %s was removed during the import" % (name))
+  return obj
+
+def get_mesh (name):
+  """return the mesh name (see get_object).
+  """
+  from . import dsf_fingerprint
+  msh = bpy.data.meshes.get (name)
+  if msh is None:
+    raise dsf_fingerprint.mismatch_error\
+      ("mesh %s was removed during the import" % (name))
+  return msh
+
+# undo actions. Blender data is looked up by name, references to removed
+# data must not be kept.
+
+def remove_object (name):
+  """remove an object and its data.
+  """
+  obj = bpy.data.objects.get (name)
+  if obj is None:
+    return
+  data = obj.data
+  for scene in bpy.data.scenes:
+    if obj.name in scene.objects:
+      scene.objects.unlink (obj)
+  bpy.data.objects.remove (obj)
+  if data is not None and data.users == 0:
+    if isinstance (data, bpy.types.Mesh):
+      bpy.data.meshes.remove (data)
+    elif isinstance (data, bpy.types.Armature):
+      bpy.data.armatures.remove (data)
+
+def remove_material (name):
+  mat = bpy.data.materials.get (name)
+  if mat is not None and mat.users == 0:
+    bpy.data.materials.remove (mat)
+
+def remove_shape_key (obj_name, key_name):
+  obj = bpy.data.objects.get (obj_name)
+  if obj is not None and obj.data.shape_keys is not None:
+    key = obj.data.shape_keys.key_blocks.get (key_name)
+    if key is not None:
+      obj.shape_key_remove (key)
+
+def remove_uv_layer (obj_name, layer_name):
+  obj = bpy.data.objects.get (obj_name)
+  if obj is not None:
+    uvt = obj.data.uv_textures.get (layer_name)
+    if uvt is not None:
+      obj.data.uv_textures.remove (uvt)
+
+def remove_vertex_group (obj_name, group_name):
+  obj = bpy.data.objects.get (obj_name)
+  if obj is not None:
+    group = obj.vertex_groups.get (group_name)
+    if group is not None:
+      obj.vertex_groups.remove (group)
+
+def get_vertex_group_weights (obj, group):
+  """return the list of (vertex index, weight) of a vertex group.
+  """
+  weights = []
+  for vert in obj.data.vertices:
+    for elem in vert.groups:
+      if elem.group == group.index:
+        weights.append ((vert.index, elem.weight))
+  return weights
+
+def restore_vertex_group (obj_name, group_name, weights):
+  """replace a vertex group by one with the given weights (as returned
+     by get_vertex_group_weights).
+  """
+  obj = bpy.data.objects.get (obj_name)
+  if obj is None:
+    return
+  remove_vertex_group (obj_name, group_name)
+  group = obj.vertex_groups.new (name = group_name)
+  for (index, weight) in weights:
+    group.add ([index], weight, 'REPLACE')
+
+def record_vertex_group (undo, obj, group_name):
+  """record the undo action for (re-)defining the vertex group
+     group_name of obj: an existing group gets restored, a new one gets
+     removed.
+  """
+  group = obj.vertex_groups.get (group_name)
+  if group is None:
+    undo.add (remove_vertex_group, obj.name, group_name)
+  else:
+    undo.add (restore_vertex_group, obj.name, group_name,
+              get_vertex_group_weights (obj, group))
+
+class import_job (object):
+  """an import split into two parts: parse reads the files without
+     touching blender data (so it can run in a thread), build creates
+     the blender data. build is a generator yielding the progress
+     (0..1) after each small step; everything it creates gets recorded
+     in the undo log, so an aborted import can be rolled back.
+     Jobs changing an existing object get its name as obj_name (the
+     active object when the job is built if None).
+  """
+  def __init__ (self, filepath, obj_name = None):
+    self.filepath = filepath
+    self.obj_name = obj_name
+    self.undo = undo_log ()
+
+  def get_target (self, context):
+    """return the object changed by the job, looked up by name (see
+       get_object); call it in every step instead of keeping the object.
+    """
+    if self.obj_name is None:
+      from . import dsf_fingerprint
+      if context.active_object is None:
+        raise dsf_fingerprint.mismatch_error ("no active object")
+      self.obj_name = context.active_object.name
+    return get_object (self.obj_name)
+
+  def parse (self):
+    pass
+
+  def build (self, context):
+    yield 1.0
+
+  def rollback (self):
+    self.undo.rollback ()
+
+  def run (self, context):
+    """run the job at once. Rolls back if building fails.
+    """
+    self.parse ()
+    try:
+      run_steps (self.build (context))
+    except:
+      self.rollback ()
+      raise
+    self.undo.clear ()
+
+class job_runner (object):
+  """run a job in the background: parse in a thread, then build in
+     steps with a time budget.
+  """
+  def __init__ (self, job):
+    self.job = job
+    self.thread = None
+    self.parsed = threading.Event ()
+    self.error = None
+    self.steps = None
+    self.progress = 0.0
+
+  def start (self):
+    self.thread = threading.Thread (target = self.parse, daemon = True)
+    self.thread.start ()
+
+  def parse (self):
+    try:
+      with dsf_trace.span ('parse'):
+        self.job.parse ()
+    except Exception as e:
+      self.error = e
+    finally:
+      self.parsed.set ()
+
+  def step (self, context, budget):
+    """build until the time budget (in seconds) is spent. Returns True
+       when the job is done. Errors of parse or build are raised.
+    """
+    if not self.parsed.is_set ():
+      return False
+    if self.error is not None:
+      raise self.error
+    if self.steps is None:
+      self.steps = self.job.build (context)
+    deadline = time.perf_counter () + budget
+    for self.progress in self.steps:
+      if time.perf_counter () >= deadline:
+        return False
+    self.job.undo.clear ()
+    return True
+
+class modal_import (object):
+  """mixin for import operators running their job (see import_job) in
+     the background. Subclasses must overwrite create_job and may
+     overwrite get_errors. Without a window (background mode, scripts)
+     or if prop_modal is off, the job is run at once.
+  """
+  prop_modal = BoolProperty\
+      (name = 'in background',
+       description = 'keep blender responsive while importing; '
+       'ESC cancels the import',
+       default = True)
+
+  # seconds of work per timer event and the timer interval.
+  time_budget = 0.05
+  timer_step = 0.02
+
+  def create_job (self, context):
+    """return the import_job to run for the file selected by the user.
+       subclasses need to overwrite this method.
+    """
+    raise NotImplementedError ("create_job undefined.")
+
+  def get_target_name (self, context):
+    """return the name of the active object (the target of jobs
+       changing an object), None if there is none.
+    """
+    obj = context.active_object
+    return None if obj is None else obj.name
+
+  def get_errors (self):
+    """return the exception types reported to the user instead of being
+       raised.
+    """
+    return ()
+
+  def get_trace_name (self):
+    return self.bl_label
+
+  def open_sessions (self, job):
+    """return the context (an ExitStack) of the trace session and the
+       session of the file cache for running job. Closing it clears
+       the file cache.
+    """
+    from . import dsf_io
+    sessions = contextlib.ExitStack ()
+    sessions.enter_context\
+      (dsf_trace.session (self.get_trace_name (), file = job.filepath))
+    sessions.enter_context (dsf_io.shared_cache.session ())
+    return sessions
+
+  def execute (self, context):
+    job = self.create_job (context)
+    if not self.properties.prop_modal or bpy.app.background\
+       or context.window is None:
+      try:
+        with self.open_sessions (job):
+          job.run (context)
+      except self.get_errors () as e:
+        self.report ({'ERROR'}, str (e))
+        return {'CANCELLED'}
+      return {'FINISHED'}
+    self.sessions = self.open_sessions (job)
+    self.runner = job_runner (job)
+    self.runner.start ()
+    wm = context.window_manager
+    self.timer = wm.event_timer_add (self.timer_step, context.window)
+    wm.modal_handler_add (self)
+    wm.progress_begin (0, 100)
+    return {'RUNNING_MODAL'}
+
+  def stop (self, context):
+    wm = context.window_manager
+    wm.event_timer_remove (self.timer)
+    wm.progress_end ()
+    self.sessions.close ()
+
+  def modal (self, context, event):
+    if event.type == 'ESC':
+      self.cancel (context)
+      self.report ({'WARNING'}, "import cancelled")
+      return {'CANCELLED'}
+    if event.type != 'TIMER':
+      return {'PASS_THROUGH'}
+    try:
+      done = self.runner.step (context, self.time_budget)
+    except self.get_errors () as e:
+      self.runner.job.rollback ()
+      self.stop (context)
+      self.report ({'ERROR'}, str (e))
+      return {'CANCELLED'}
+    except:
+      self.runner.job.rollback ()
+      self.stop (context)
+      raise
+    context.window_manager.progress_update (int (100 * self.runner.progress))
+    if done:
+      self.stop (context)
+      return {'FINISHED'}
+    return {'PASS_THROUGH'}
+
+  def cancel (self, context):
+    """remove the data created so far. A running parse thread is left
+       to finish, its result is dropped.
+    """
+    self.runner.job.rollback ()
+    self.stop (context)
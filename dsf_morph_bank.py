@@ -0,0 +1,108 @@
+# blend many morphs of a figure without creating a shape key for each.
+import logging
+import numpy as np
+
+log = logging.getLogger ('dsf-morph-bank')
+
+class morph_bank (object):
+  """collect the deltas of many morphs into a single sparse matrix
+     of shape (3*vertex_count, morph_count). The matrix is stored in
+     coordinate form (row, morph, value), so blending a weight vector is
+     a single sparse matrix-vector product.
+  """
+  def __init__ (self, vertex_count):
+    """initialize an empty bank for a mesh with vertex_count vertices.
+    """
+    self.vertex_count = vertex_count
+    self.names = []
+    self.index = dict ()
+    # chunks that still need to get merged into the matrix.
+    self.pending = []
+    self.rows = np.zeros (0, dtype = np.int32)
+    self.cols = np.zeros (0, dtype = np.int32)
+    self.vals = np.zeros (0, dtype = np.float32)
+
+  def add_morph (self, name, indices, offsets):
+    """add a morph given by its vertex indices and (n,3) offsets.
+       returns the column of the morph in the bank.
+    """
+    if name in self.index:
+      raise ValueError ("morph '%s' already in bank" % (name))
+    indices = np.asarray (indices, dtype = np.int32)
+    offsets = np.asarray (offsets, dtype = np.float32).reshape (-1, 3)
+    if len (indices) != len (offsets):
+      raise ValueError ("morph '%s': %d indices, %d offsets"
+                        % (name, len (indices), len (offsets)))
+    if len (indices) > 0 and\
+       (indices.min () < 0 or indices.max () >= self.vertex_count):
+      raise IndexError ("morph '%s' does not fit %d vertices"
+                        % (name, self.vertex_count))
+    col = len (self.names)
+    self.names.append (name)
+    self.index[name] = col
+    # each vertex index expands to three rows (x, y, z).
+    rows = (indices.astype (np.int32)[:,None] * 3
+            + np.arange (3, dtype = np.int32)).ravel ()
+    self.pending.append\
+      ((rows, np.full (len (rows), col, dtype = np.int32), offsets.ravel ()))
+    return col
+
+  def add_modifier (self, modifier):
+    """add a morph modifier (a dsf_morph_load.modifier).
+    """
+    (indices, offsets) = modifier.delta_arrays ()
+    return self.add_morph (modifier.name (), indices, offsets)
+
+  def add_modifier_lib (self, mod_lib):
+    """add every modifier of a modifier library that has morph deltas.
+    """
+    for modifier in mod_lib.filter_modifiers ('morph'):
+      self.add_modifier (modifier)
+
+  def compact (self):
+    """merge the pending morphs into the matrix.
+    """
+    if self.pending:
+      (rows, cols, vals) = zip (*self.pending)
+      self.rows = np.concatenate ((self.rows,) + rows)
+      self.cols = np.concatenate ((self.cols,) + cols)
+      self.vals = np.concatenate ((self.vals,) + vals)
+      self.pending = []
+      log.info ("morph bank: %d morphs, %d non-zeros",
+                len (self.names), len (self.vals))
+
+  def get_morph_count (self):
+    return len (self.names)
+
+  def weight_vector (self, weights):
+    """convert a mapping name->weight into a weight vector.
+       unknown names are ignored.
+    """
+    wvec = np.zeros (len (self.names), dtype = np.float32)
+    for (name, weight) in weights.items ():
+      if name in self.index:
+        wvec[self.index[name]] = weight
+    return wvec
+
+  def blend (self, weights):
+    """calculate the combined deltas for the weights (a mapping
+       name->weight or a vector with one weight per morph).
+       returns a float32 array of shape (vertex_count, 3).
+    """
+    self.compact ()
+    if isinstance (weights, dict):
+      weights = self.weight_vector (weights)
+    weights = np.asarray (weights, dtype = np.float32)
+    if len (weights) != len (self.names):
+      raise ValueError ("need %d weights, got %d"
+                        % (len (self.names), len (weights)))
+    summed = np.bincount (self.rows, weights = self.vals * weights[self.cols],
+                          minlength = 3 * self.vertex_count)
+    return summed.astype (np.float32).reshape (-1, 3)
+
+  def blend_positions (self, base, weights):
+    """return the base coordinates (vertex_count x 3) with the blended
+       deltas added.
+    """
+    base = np.asarray (base, dtype = np.float32).reshape (-1, 3)
+    return base + self.blend (weights)
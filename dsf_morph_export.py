@@ -1,10 +1,9 @@
-import logging, json
+import logging
 
 import bpy
-from bpy.props import StringProperty
+from bpy.props import BoolProperty, StringProperty
 
-from .dsf_skey_fetch import dsf_skey_fetch
-from .dsf_morph_create import dsf_morph_create
+from . import dsf_trace
 
 log = logging.getLogger ('export-morph-dsf')
 
@@ -19,18 +18,21 @@ bl_info = {
   'wiki_url': 'http://nonexistent',
 }
 
-def export_dsf_morph_file (filename, context = None):
+def export_dsf_morph_file (filename, context = None, compress = False):
   """main function for importing something. Called after the user
-     has selected some filename.
+     has selected some filename. if compress is set, the file is gzipped.
   """
   # if the to be loaded file affects the currently selected object,
   # use this to get it:
+  from .dsf_skey_fetch import dsf_skey_fetch
+  from .dsf_morph_create import dsf_morph_create
+  from . import dsf_io
   active_obj = context.active_object
-  morph_data = dsf_skey_fetch.convert (active_obj)
+  with dsf_trace.span ('fetch_shape_key'):
+    morph_data = dsf_skey_fetch.convert (active_obj)
   morph_file_data = dsf_morph_create.make_morph_file (shape_key = morph_data)
-  ofh = open (filename, 'w', encoding = 'latin1')
-  json.dump (morph_file_data, ofh, indent = 2)
-  ofh.close ()
+  with dsf_trace.span ('write_json_data', file = filename):
+    dsf_io.write_json_data (morph_file_data, filename, compress = compress)
 
 # the rest defines the gui and the blender operator
 class export_dsf_morph (bpy.types.Operator):
@@ -47,6 +49,9 @@ class export_dsf_morph (bpy.types.Operator):
       (name = 'file path', description = 'file path for exporting dsf-file.',
        maxlen = 1000, default = '')
   filter_glob = StringProperty (default = '*.*')
+  prop_compress = BoolProperty\
+      (name = 'compress', description = 'gzip the exported file.',
+       default = False)
 
   def execute (self, context):
     """display the gui and load a file. This function should be
@@ -55,7 +60,9 @@ class export_dsf_morph (bpy.types.Operator):
     # independent of this context-manager/operator logic.
     filename = self.properties.filepath
     log.info ("user selected %s", filename)
-    export_dsf_morph_file (filename, context = context);
+    with dsf_trace.session ('export dsf-morph', file = filename):
+      export_dsf_morph_file (filename, context = context,
+                             compress = self.properties.prop_compress)
     return { 'FINISHED' }
 
   def invoke (self, context, event):
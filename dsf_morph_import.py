@@ -1,9 +1,8 @@
 import sys, os.path, logging
 import bpy
-from bpy.props import BoolProperty, StringProperty
+from bpy.props import BoolProperty, StringProperty, CollectionProperty
 
-from . import dsf_morph_load
-from . import dsf_skey_define
+from . import dsf_modal
 
 log = logging.getLogger ('import_morph')
 
@@ -18,17 +17,70 @@ bl_info = {
   'wiki_url': 'http://nonexistent',
 }
 
-def import_dsf_morph_file (filename, context):
+def import_dsf_morph_file (filename, context, remap = False):
   """load the dsf-file and create a shapekey.
+     if remap is set, the vertices of the geometry the object was imported
+     from are matched by position with the vertices of the object.
   """
-  # parse the dsf-file.
-  mod_lib = dsf_morph_load.read_dsf_data (filename)
-  # apply the shapekeys from the modifier lib to the current object.
-  obj = context.active_object
-  dsf_skey_define.define_shapekeys (obj, mod_lib)
+  morph_import_job ([filename], remap).run (context)
+
+class morph_import_job (dsf_modal.import_job):
+  """create a shapekey of the active object for the morph in each of a
+     list of files, one after the other.
+  """
+  def __init__ (self, filepaths, remap = False, obj_name = None):
+    super (morph_import_job, self).__init__ (filepaths[0], obj_name)
+    self.filepaths = filepaths
+    self.remap = remap
+
+  def parse (self):
+    from . import dsf_morph_load
+    from . import dsf_prefetch
+    # parse the files in parallel; the referenced files (the figure) are
+    # only needed for remapping.
+    dsf_prefetch.prefetch_for_import\
+      (self.filepaths, max_depth = None if self.remap else 0)
+    self.morphs = []
+    for filename in self.filepaths:
+      mod_lib = dsf_morph_load.read_dsf_data (filename)
+      morph = mod_lib.find_modifier (None)
+      # decode the deltas here, not while building.
+      morph.delta_arrays ()
+      self.morphs.append ((filename, morph))
+
+  def check_morph (self, obj, vmap, filename, morph):
+    """check that the morph fits the mesh of obj.
+    """
+    from . import dsf_fingerprint
+    check_args = {
+      'vertex_count': morph.get_vertex_count (),
+      'parent': morph.node.get ('parent'),
+      'what': filename
+    }
+    if vmap is not None:
+      dsf_fingerprint.check_fingerprint\
+        (vmap.fingerprint, id_path = vmap.geom.get ('id_path'), **check_args)
+    else:
+      dsf_fingerprint.check_object (obj, **check_args)
+
+  def build (self, context):
+    from . import dsf_skey_define
+    from . import dsf_remap
+    # apply the shapekeys to the target object.
+    obj = self.get_target (context)
+    vmap = dsf_remap.load_vertex_map (obj) if self.remap else None
+    # check that the morphs fit the mesh before touching any vertex.
+    for (filename, morph) in self.morphs:
+      self.check_morph (obj, vmap, filename, morph)
+    dsf_skey_define.get_base_shape_key (obj, self.undo)
+    count = len (self.morphs)
+    for (idx, (filename, morph)) in enumerate (self.morphs):
+      yield from dsf_modal.scale_steps (dsf_skey_define.define_morph_steps\
+        (self.obj_name, morph, self.undo, vmap = vmap),
+        idx / count, (idx + 1) / count)
 
 # the rest defines the gui and the blender operator
-class import_dsf_morph (bpy.types.Operator):
+class import_dsf_morph (dsf_modal.modal_import, bpy.types.Operator):
   # the doc text is displayed in the tooltip of the menu entry.
   """Load a daz studio 4 dsf file."""
   # the bl_label is displayed in the operator-menu (with space-KEY).
@@ -41,15 +93,34 @@ class import_dsf_morph (bpy.types.Operator):
   filepath = StringProperty\
       (name = 'file path', description = 'file path for importing dsf-file.',
        maxlen = 1000, default = '')
+  # several files can be selected; their names are put into files.
+  files = CollectionProperty (type = bpy.types.OperatorFileListElement)
+  directory = StringProperty (subtype = 'DIR_PATH')
   filter_glob = StringProperty (default = '*.dsf')
+  prop_remap = BoolProperty\
+      (name = 'remap vertices',
+       description = 'match vertices by position with the imported geometry',
+       default = False)
+
+  def get_filepaths (self):
+    """return the selected files.
+    """
+    names = [elem.name for elem in self.properties.files if elem.name]
+    if names:
+      return [os.path.join (self.properties.directory, name)
+              for name in names]
+    return [self.properties.filepath]
+
+  def get_errors (self):
+    from . import dsf_fingerprint
+    return (dsf_fingerprint.mismatch_error,)
 
-  def execute (self, context):
-    """display the gui and load a file. This function should be
-       called after the menu entry for the file is selected."""
-    # call the main import function. This function should work
-    # independent of this context-manager/operator logic.
-    import_dsf_morph_file (self.properties.filepath, context)
-    return { 'FINISHED' }
+  def create_job (self, context):
+    """create the job loading the files. It is run by execute, which
+       is called after the menu entry for the file is selected."""
+    return morph_import_job (self.get_filepaths (),
+                             remap = self.properties.prop_remap,
+                             obj_name = self.get_target_name (context))
   def invoke (self, context, event):
     """The invoke function should be called when the menu-entry for
        this operator is selected. It displays a file-selector and
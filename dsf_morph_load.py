@@ -1,5 +1,6 @@
 # read morphs from a dsf data file.
 import json
+import numpy as np
 from . import dsf_io
 
 class modifier_lib (object):
@@ -9,21 +10,56 @@ class modifier_lib (object):
     """node is to be the modifier_library node.
     """
     self.node = node
+    # map modifier id -> position within node.
+    self.index = {
+      modifier_node['id']: pos for (pos, modifier_node) in enumerate (node)
+    }
+    # modifier objects get created on first access.
+    self.modifiers = [None] * len (node)
+  def get_modifier (self, pos):
+    """get the modifier at the given position of the library.
+    """
+    if self.modifiers[pos] is None:
+      self.modifiers[pos] = modifier (self.node[pos])
+    return self.modifiers[pos]
   def get_modifiers (self):
     """get list of the modifiers of this lib.
     """
-    return list (map (modifier, self.node))
+    return [self.get_modifier (pos) for pos in range (len (self.node))]
+  def get_names (self):
+    """get the ids of all modifiers of this lib.
+    """
+    return list (self.index.keys ())
 
   def find_modifier (self, name):
     """get a modifier by name. If name is None, the first modifier is returned.
     """
     if name is None:
-      return modifier (self.node[0])
+      return self.get_modifier (0)
+    elif name in self.index:
+      return self.get_modifier (self.index[name])
     else:
-      for modifier_node in self.node:
-        if mname == modifier_node['id']:
-          return modifier (modifier_node)
-      raise ValueError ("not found: %s" % (mname))
+      raise ValueError ("not found: %s" % (name))
+
+  def filter_modifiers (self, type):
+    """iterate over the modifiers of the given type ('morph', 'skin'
+       or 'channel'). Deltas of the modifiers are not decoded.
+    """
+    for pos in range (len (self.node)):
+      if get_modifier_type (self.node[pos]) == type:
+        yield self.get_modifier (pos)
+
+def get_modifier_type (node):
+  """return the type of a modifier library entry: 'morph' or 'skin'
+     for modifiers containing deltas or a skin binding, 'channel' for
+     modifiers that only define a channel (and maybe formulas).
+  """
+  if 'morph' in node:
+    return 'morph'
+  elif 'skin' in node:
+    return 'skin'
+  else:
+    return 'channel'
 
 class modifier (object):
   """class to represent a single morph modifier.
@@ -32,6 +68,7 @@ class modifier (object):
     """node must be a single modifier library entry.
     """
     self.node = node
+    self.arrays = None
 
   def name (self):
     """returns the name (id) of the modifier.
@@ -46,6 +83,29 @@ class modifier (object):
     for id_pair in values:
       yield (id_pair[0], id_pair[1:])
     return
+  def get_type (self):
+    """returns the type of the modifier (see get_modifier_type).
+    """
+    return get_modifier_type (self.node)
+  def get_vertex_count (self):
+    """returns the vertex count of the geometry the morph was made for,
+       or None if the morph does not specify it.
+    """
+    return self.node['morph'].get ('vertex_count')
+  def delta_arrays (self):
+    """return the deltas as a pair of arrays: the vertex indices (int32)
+       and the offsets (float32, shape (n,3)). The arrays are decoded
+       on the first call only.
+    """
+    if self.arrays is None:
+      values = self.node['morph']['deltas']['values']
+      if len (values) == 0:
+        table = np.zeros ((0, 4))
+      else:
+        table = np.array (values, dtype = np.float64)
+      self.arrays = (table[:,0].astype (np.int32),
+                     table[:,1:4].astype (np.float32))
+    return self.arrays
 
 def get_modifier_lib (root):
   """get the modifer-library from a dsf data object.
@@ -55,5 +115,5 @@ def get_modifier_lib (root):
 def read_dsf_data (filename):
   """return a dsf file and (for now return the modifier lib.
   """
-  jdata = dsf_io.read_json_data (filename, encoding = 'latin1')
+  jdata = dsf_io.load_json_data (filename)
   return modifier_lib (jdata['modifier_library'])
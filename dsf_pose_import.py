@@ -2,7 +2,7 @@ import sys, os.path, logging
 import bpy
 from bpy.props import BoolProperty, StringProperty
 
-from . import dsf_pose_load
+from . import dsf_trace
 
 log = logging.getLogger ('import_pose')
 
@@ -20,8 +20,13 @@ bl_info = {
 def import_dsf_pose_file (filename, context):
   """load the dsf-file and apply it to the current object.
   """
-  # parse the dsf-file.
-  pose_data = dsf_pose_load.load_pose_file (filename)
+  from . import dsf_pose_load
+  from . import dsf_io
+  from . import dsf_prefetch
+  with dsf_io.shared_cache.session ():
+    # parse the file and the files of the figures it references.
+    dsf_prefetch.prefetch_for_import ([filename])
+    pose_data = dsf_pose_load.load_pose_file (filename)
   obj = context.active_object
   return pose_data
 
@@ -46,7 +51,9 @@ class import_dsf_pose (bpy.types.Operator):
        called after the menu entry for the file is selected."""
     # call the main import function. This function should work
     # independent of this context-manager/operator logic.
-    import_dsf_pose_file (self.properties.filepath, context)
+    with dsf_trace.session ('import dsf-pose',
+                            file = self.properties.filepath):
+      import_dsf_pose_file (self.properties.filepath, context)
     return { 'FINISHED' }
   def invoke (self, context, event):
     """The invoke function should be called when the menu-entry for
@@ -98,7 +98,7 @@ def load_pose_file (filepath):
   """read the data from a pose file and return a pose object
      which can be applied to objects in blender.
   """
-  jdata = dsf_io.read_json_data (filepath)
+  jdata = dsf_io.load_json_data (filepath)
   try:
     anim_datas = jdata['scene']['animations']
   except KeyError as e:
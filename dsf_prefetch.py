@@ -0,0 +1,168 @@
+# parse a file and all files it depends on in parallel, so the loaders
+# find them in the shared cache of dsf_io. The prefetch and the loading
+# must happen within a session of the cache, eg.:
+#   with dsf_io.shared_cache.session ():
+#     dsf_prefetch.prefetch_file (filename)
+#     ... load ...
+import os, logging, time, contextlib
+import concurrent.futures
+
+from . import dsf_io
+from . import dsf_catalog
+from . import dsf_resolve
+
+log = logging.getLogger ('dsf-prefetch')
+
+def get_ref_paths (jdata):
+  """return the set of unquoted library paths of the files referenced
+     by jdata (scene nodes, parents, geometry urls, ...). References
+     within the file itself are left out.
+  """
+  return set ([dsf_catalog.split_url (url)[0]
+               for (key, url) in dsf_catalog.iter_urls (jdata)]) - set ([''])
+
+def parse_file (filename):
+  """parse a file in a worker. Returns (filename, stamp, jdata, refs).
+  """
+  stamp = dsf_io.get_file_stamp (filename)
+  jdata = dsf_io.read_json_data (filename)
+  return (filename, stamp, jdata, get_ref_paths (jdata))
+
+class prefetcher (object):
+  """load the transitive closure of the files referenced by a file.
+     Files get parsed in a pool of workers and are put into the shared
+     cache of dsf_io as soon as they are done, while the references of
+     finished files are followed.
+  """
+  def __init__ (self, resolver = None, workers = None, progress = None,
+                use_processes = True, max_depth = None):
+    """resolver is the url_resolver for finding referenced files (the
+       library of the first prefetched file if None). workers is the
+       size of the pool (default: number of cpus). progress is called
+       with (done, total, filename) whenever a file is finished, where
+       total is the number of files known so far.
+       The files are parsed in a process pool, so they are parsed in
+       parallel. Within blender, use_processes must be off: a process
+       pool would start new blender instances (or fork a threaded
+       process), so a thread pool is used, which only overlaps reading
+       and decompressing the files (see prefetch_for_import).
+       max_depth limits how far references are followed (0: only the
+       given files, None: no limit).
+    """
+    self.resolver = resolver
+    self.workers = workers or os.cpu_count () or 1
+    self.progress = progress
+    self.use_processes = use_processes
+    self.max_depth = max_depth
+    self.cache = dsf_io.shared_cache
+
+  def create_executor (self):
+    if self.use_processes:
+      return concurrent.futures.ProcessPoolExecutor (self.workers)
+    else:
+      return concurrent.futures.ThreadPoolExecutor (self.workers)
+
+  @contextlib.contextmanager
+  def running (self):
+    """return the executor in a context. With processes, the results
+       are unpickled in this process, which (like parsing) creates
+       millions of objects, so the garbage collector is paused.
+    """
+    with contextlib.ExitStack () as stack:
+      if self.use_processes:
+        stack.enter_context (dsf_io.gc_paused ())
+      yield stack.enter_context (self.create_executor ())
+
+  def resolve_refs (self, refs):
+    """return the absolute paths of the library paths refs. Paths that
+       do not exist are skipped.
+    """
+    found = []
+    for libpath in refs:
+      abspath = self.resolver.find_file (libpath)
+      if abspath is None:
+        log.debug ("missing reference %s", libpath)
+      else:
+        found.append (abspath)
+    return found
+
+  def prefetch (self, filename):
+    """parse filename and all files it references, directly or
+       indirectly. Returns the list of files in the order they were
+       finished.
+    """
+    return self.prefetch_files ([filename])
+
+  def prefetch_files (self, filenames):
+    """parse the files filenames and the files they reference (see
+       prefetch).
+    """
+    filenames = [os.path.abspath (filename) for filename in filenames]
+    if not filenames:
+      return []
+    if not self.cache.is_enabled ():
+      log.warning ("prefetch outside of a cache session, results are lost")
+    if self.resolver is None:
+      self.resolver = dsf_resolve.make_resolver (filenames[0])
+    start = time.perf_counter ()
+    seen = set (filenames)
+    done = []
+    # the (path, depth) of the files being parsed by their future.
+    pending = {}
+    queue = [(filename, 0) for filename in reversed (filenames)]
+    with self.running () as executor:
+      while queue or pending:
+        while queue:
+          (path, depth) = queue.pop ()
+          # files in the cache only need their references followed.
+          jdata = self.cache.get (path)
+          if jdata is None:
+            pending[executor.submit (parse_file, path)] = (path, depth)
+          else:
+            self.finish (path, depth, get_ref_paths (jdata),
+                         seen, done, queue)
+        if pending:
+          (finished, _) = concurrent.futures.wait\
+            (pending, return_when = concurrent.futures.FIRST_COMPLETED)
+          for future in finished:
+            (path, depth) = pending.pop (future)
+            try:
+              (path, stamp, jdata, refs) = future.result ()
+            except Exception as e:
+              # the loaders report the error if they need the file.
+              log.warning ("prefetch of %s failed: %s", path, e)
+              continue
+            self.cache.put (path, jdata, stamp)
+            self.finish (path, depth, refs, seen, done, queue)
+    log.info ("prefetched %d files in %.2fs", len (done),
+              time.perf_counter () - start)
+    return done
+
+  def finish (self, path, depth, refs, seen, done, queue):
+    """record a finished file and queue its unseen references.
+    """
+    done.append (path)
+    if self.max_depth is None or depth < self.max_depth:
+      for ref in self.resolve_refs (refs):
+        if ref not in seen:
+          seen.add (ref)
+          queue.append ((ref, depth + 1))
+    if self.progress is not None:
+      self.progress (len (done), len (seen), path)
+
+def prefetch_file (filename, **kwarg):
+  """prefetch filename and its dependencies (see prefetcher).
+  """
+  return prefetcher (**kwarg).prefetch (filename)
+
+def prefetch_for_import (filenames, **kwarg):
+  """prefetch the files an import within blender is about to load in
+     a thread pool (see prefetcher, kwarg are passed to it). Errors are
+     only logged; the loaders report them if they need the files.
+  """
+  try:
+    return prefetcher (use_processes = False, **kwarg)\
+      .prefetch_files (filenames)
+  except Exception as e:
+    log.warning ("prefetch of %s failed: %s", filenames, e)
+    return []
@@ -5,6 +5,8 @@ from . import dsf_geom_create
 from . import dsf_scene_create
 from . import dsf_io
 
+from . import dsf_trace
+
 log = logging.getLogger ('prop-create')
 
 class prop_exporter (object):
@@ -43,6 +45,7 @@ class prop_exporter (object):
       id_dic[obj] = (geom_id, node_id)
     return id_dic
 
+  @dsf_trace.traced ()
   def create_geometry_libs (self, obj_map):
     """create the node-library and geometry-library for the objects.
        The objects are given as the keys of the obj_map.
@@ -66,6 +69,7 @@ class prop_exporter (object):
     jdata['asset_info'] = asset_info
     return jdata
 
+  @dsf_trace.traced ()
   def create_instances (self, obj_map):
     """create the scene-entries for objects.
        obj map contains a mapping obj->url.
@@ -94,6 +98,7 @@ class prop_exporter (object):
       url_dic[obj] = (geom_url, node_url)
     return url_dic
 
+  @dsf_trace.traced ()
   def write_assets (self, assets, base_dir = None):
     """write the assets to a common base directory.
     """
@@ -5,10 +5,7 @@ from bpy.props import StringProperty
 from bpy.props import BoolProperty
 from bpy.props import FloatProperty
 
-from . import dsf_prop_create
-from . import dsf_geom_create
-from . import dsf_prop_write
-from . import dsf_io
+from . import dsf_trace
 
 log = logging.getLogger ('export-prop-dsf')
 
@@ -65,11 +62,13 @@ class export_props (bpy.types.Operator):
       self.report ({'ERROR'}, "base dir unset")
       return {'CANCELLED'}
       
+    from . import dsf_prop_create
     objs = get_selected_objects (context)
     exporter = dsf_prop_create.prop_exporter\
       (scene_path = scene_path, data_path = data_path, scale = scale,
        base_dir = base_dir, scene = context.scene)
-    exporter.export_props (objs)
+    with dsf_trace.session ('export dsf-props', objects = len (objs)):
+      exporter.export_props (objs)
     log.info ("export: %d objects to %s/%s, scale=%f",
               len (objs), scene_path, data_path, scale)
     return {'FINISHED'}
@@ -94,6 +93,7 @@ class export_dsf_prop (bpy.types.Operator):
   filter_glob = StringProperty (default = '*.*')
   def split_scene_filepath (self, filepath):
     """split a filename into a library name and a local name."""
+    from . import dsf_io
     libdir = dsf_io.find_data_parent (filepath)
     if libdir is None:
       self.report ({'ERROR'}, "path not in library.")
@@ -122,8 +122,9 @@ class export_dsf_prop (bpy.types.Operator):
     log.info ("scene_rpath: %s", scene_rpath)
     log.info ("data_rpath: %s", data_rpath)
     scale = context.scene.dsf_scale
-    bpy.ops.dsf.export_props (scene_path = scene_rpath,\
-      data_path = data_rpath, base_dir = libdir, scale = scale)
+    with dsf_trace.session ('export dsf-prop', file = filepath):
+      bpy.ops.dsf.export_props (scene_path = scene_rpath,\
+        data_path = data_rpath, base_dir = libdir, scale = scale)
     return { 'FINISHED' }
 
   def invoke (self, context, event):
@@ -0,0 +1,234 @@
+# match the vertices of a dsf geometry with the vertices of a mesh
+# whose vertex order has changed.
+import logging, itertools
+import numpy as np
+
+from . import dsf_fingerprint
+
+log = logging.getLogger ('dsf-remap')
+
+# the offsets selecting a cell and its 7 neighbors in the
+# direction of a point (see match_vertices).
+corner_offsets = np.array ([(x, y, z) for x in (0, 1)
+                            for y in (0, 1) for z in (0, 1)],
+                           dtype = np.int64)
+
+def face_rows (face_sizes, face_verts):
+  """return the faces (given by their sizes and their concatenated
+     vertex indices) as rows of an (n, width) array, with the vertex
+     indices sorted and padded with -1 at the front, so faces with the
+     same set of vertices have equal rows.
+  """
+  face_sizes = np.asarray (face_sizes, dtype = np.int64)
+  width = int (face_sizes.max ()) if len (face_sizes) > 0 else 0
+  offsets = np.zeros (len (face_sizes) + 1, dtype = np.int64)
+  np.cumsum (face_sizes, out = offsets[1:])
+  rows = np.full ((len (face_sizes), width), -1, dtype = np.int64)
+  cols = np.arange (offsets[-1]) - np.repeat (offsets[:-1], face_sizes)
+  rows[np.repeat (np.arange (len (face_sizes)), face_sizes), cols] =\
+    face_verts
+  rows.sort (axis = 1)
+  return rows
+
+def has_negative (face_sizes, face_verts):
+  """return for each face (see face_rows) if one of its vertex indices
+     is negative.
+  """
+  face_ids = np.repeat (np.arange (len (face_sizes)), face_sizes)
+  return np.bincount (face_ids[np.asarray (face_verts) < 0],
+                      minlength = len (face_sizes)) > 0
+
+def cell_keys (cells, dims):
+  """pack integer cell coordinates (n,3) into a single int64 key.
+  """
+  return (cells[:,0] * dims[1] + cells[:,1]) * dims[2] + cells[:,2]
+
+def match_vertices (src, dst, tolerance = 1e-3):
+  """find for every point in dst the nearest point in src that is not
+     farther away than tolerance. src and dst are flat sequences or
+     (n,3)-arrays of coordinates.
+     returns an int32 array with an index into src for every point in
+     dst (-1 if no point is near enough).
+     points are sorted into a grid with cells of (at least) twice the
+     tolerance, so only the 8 cells nearest to a point need to be searched.
+  """
+  src = np.asarray (src, dtype = np.float64).reshape (-1, 3)
+  dst = np.asarray (dst, dtype = np.float64).reshape (-1, 3)
+  result = np.full (len (dst), -1, dtype = np.int32)
+  if len (src) == 0 or len (dst) == 0:
+    return result
+  low = np.minimum (src.min (axis = 0), dst.min (axis = 0))
+  extent = (np.maximum (src.max (axis = 0), dst.max (axis = 0)) - low).max ()
+  # limit the number of cells per axis, so the packed keys fit in 64 bits.
+  cell = max (2 * tolerance, extent / 2**20)
+  src_cells = np.floor ((src - low) / cell).astype (np.int64) + 1
+  dst_pos = (dst - low) / cell
+  dst_cells = np.floor (dst_pos).astype (np.int64) + 1
+  dims = np.maximum (src_cells.max (axis = 0), dst_cells.max (axis = 0)) + 2
+  # step towards the neighbor cell on the side of the point.
+  dst_step = np.where (dst_pos - np.floor (dst_pos) < 0.5, -1, 1)
+  src_keys = cell_keys (src_cells, dims)
+  order = np.argsort (src_keys, kind = 'stable')
+  sorted_keys = src_keys[order]
+  # process the points of dst in cell order, which makes the searches
+  # much more cache friendly.
+  dst_order = np.argsort (cell_keys (dst_cells, dims))
+  dst = dst[dst_order]
+  dst_cells = dst_cells[dst_order]
+  dst_step = dst_step[dst_order]
+  best_dist = np.full (len (dst), tolerance * tolerance)
+  found = np.full (len (dst), -1, dtype = np.int32)
+  for offset in corner_offsets:
+    keys = cell_keys (dst_cells + offset * dst_step, dims)
+    first = np.searchsorted (sorted_keys, keys, side = 'left')
+    count = np.searchsorted (sorted_keys, keys, side = 'right') - first
+    # a cell usually holds a single point, so this loop is short.
+    for k in range (count.max ()):
+      (sel,) = np.nonzero (count > k)
+      cand = order[first[sel] + k]
+      dist = ((src[cand] - dst[sel]) ** 2).sum (axis = 1)
+      better = dist <= best_dist[sel]
+      best_dist[sel[better]] = dist[better]
+      found[sel[better]] = cand[better]
+  result[dst_order] = found
+  return result
+
+class vertex_map (object):
+  """mapping between the vertices and faces of a dsf geometry and
+     the vertices and faces of a blender mesh.
+  """
+  def __init__ (self, geom, msh, tolerance = 1e-3):
+    """match the interned geometry geom (see dsf_geom_load) with
+       the mesh data msh.
+    """
+    coords = np.zeros (3 * len (msh.vertices), dtype = np.float32)
+    msh.vertices.foreach_get ('co', coords)
+    self.geom = geom
+    self.msh = msh
+    self.fingerprint = dsf_fingerprint.geometry_fingerprint (geom)
+    # for each mesh vertex the dsf vertex, and the other way round.
+    self.to_dsf = match_vertices (geom['v'], coords, tolerance)
+    self.to_mesh = np.full (len (geom['v']) // 3, -1, dtype = np.int32)
+    (matched,) = np.nonzero (self.to_dsf >= 0)
+    self.to_mesh[self.to_dsf[matched]] = matched
+    self.face_map = None
+    log.info ("matched %d of %d vertices", len (matched), len (self.to_mesh))
+
+  def get_unmatched_count (self):
+    """return the number of dsf vertices without a mesh vertex.
+    """
+    return int ((self.to_mesh < 0).sum ())
+
+  def get_face_map (self):
+    """return an array giving the dsf face index for every polygon
+       of the mesh (-1 if there is no such face). Faces are matched by
+       their set of vertices; faces with unmatched vertices are left
+       out.
+    """
+    if self.face_map is None:
+      self.face_map = self.match_faces ()
+    return self.face_map
+
+  def match_faces (self):
+    """return the face map (see get_face_map). The faces of both sides
+       are converted to rows of sorted mesh vertex indices (see
+       face_rows), equal rows are found with np.unique.
+    """
+    faces = self.geom['f']
+    dsf_sizes = np.fromiter (map (len, faces), dtype = np.int64,
+                             count = len (faces))
+    dsf_verts = self.to_mesh[np.fromiter\
+      (itertools.chain.from_iterable (faces), dtype = np.int64,
+       count = int (dsf_sizes.sum ()))]
+    polys = self.msh.polygons
+    loop_starts = np.zeros (len (polys), dtype = np.int64)
+    polys.foreach_get ('loop_start', loop_starts)
+    mesh_sizes = np.zeros (len (polys), dtype = np.int64)
+    polys.foreach_get ('loop_total', mesh_sizes)
+    loop_verts = np.zeros (len (self.msh.loops), dtype = np.int64)
+    self.msh.loops.foreach_get ('vertex_index', loop_verts)
+    mesh_offsets = np.zeros (len (polys) + 1, dtype = np.int64)
+    np.cumsum (mesh_sizes, out = mesh_offsets[1:])
+    mesh_verts = loop_verts[np.repeat (loop_starts, mesh_sizes)
+                            + np.arange (mesh_offsets[-1])
+                            - np.repeat (mesh_offsets[:-1], mesh_sizes)]
+    mesh_verts[self.to_dsf[mesh_verts] < 0] = -1
+    # faces with unmatched vertices (-1) could share their row with
+    # other faces, so they are left out.
+    dsf_valid = ~has_negative (dsf_sizes, dsf_verts)
+    mesh_valid = ~has_negative (mesh_sizes, mesh_verts)
+    dsf_rows = face_rows (dsf_sizes, dsf_verts)[dsf_valid]
+    mesh_rows = face_rows (mesh_sizes, mesh_verts)[mesh_valid]
+    face_map = np.full (len (polys), -1, dtype = np.int32)
+    if len (dsf_rows) == 0 or len (mesh_rows) == 0:
+      return face_map
+    width = max (dsf_rows.shape[1], mesh_rows.shape[1])
+    rows = np.full ((len (dsf_rows) + len (mesh_rows), width), -1,
+                    dtype = np.int64)
+    rows[:len (dsf_rows), width - dsf_rows.shape[1]:] = dsf_rows
+    rows[len (dsf_rows):, width - mesh_rows.shape[1]:] = mesh_rows
+    # compare the rows as single byte strings, much faster than axis = 0.
+    keys = rows.view (np.dtype ((np.void, rows.itemsize * width))).ravel ()
+    (_, row_ids) = np.unique (keys, return_inverse = True)
+    row_ids = row_ids.ravel ()
+    face_index = np.full (row_ids.max () + 1, -1, dtype = np.int32)
+    face_index[row_ids[:len (dsf_rows)]] = np.nonzero (dsf_valid)[0]
+    face_map[mesh_valid] = face_index[row_ids[len (dsf_rows):]]
+    return face_map
+
+  def remap_deltas (self, indices, offsets):
+    """convert morph deltas (dsf vertex indices and offsets) to mesh
+       vertex indices. Deltas of unmatched vertices are dropped.
+    """
+    mesh_indices = self.to_mesh[np.asarray (indices)]
+    keep = mesh_indices >= 0
+    return (mesh_indices[keep], np.asarray (offsets)[keep])
+
+class remapped_uvset (object):
+  """wraps a uvset loaded for the dsf geometry, so it can be used with
+     the face and vertex indices of the mesh.
+  """
+  def __init__ (self, uvset, vmap):
+    self.uvset = uvset
+    self.vmap = vmap
+    self.face_map = vmap.get_face_map ()
+  def get_name (self):
+    return self.uvset.get_name ()
+  def get_vertex_count (self):
+    return self.uvset.get_vertex_count ()
+  def get_uvs (self, face, verts):
+    """return the uvs of the mesh face with the mesh vertices verts,
+       None if the face has no match in the dsf geometry.
+    """
+    dsf_face = int (self.face_map[face])
+    dsf_verts = [int (self.vmap.to_dsf[v]) for v in verts]
+    if dsf_face < 0 or min (dsf_verts) < 0:
+      return None
+    return self.uvset.get_uvs (dsf_face, dsf_verts)
+  def get_loop_uvs (self, face_offsets, face_indices):
+    """return the uvs of all loops of the mesh (see
+       dsf_uvset.get_loop_uvs). Loops whose face or vertex has no
+       match in the dsf geometry get NaN uvs.
+    """
+    face_offsets = np.asarray (face_offsets, dtype = np.int64)
+    faces = self.face_map[np.repeat (np.arange (len (face_offsets) - 1),
+                                     np.diff (face_offsets))]
+    verts = self.vmap.to_dsf[np.asarray (face_indices)]
+    matched = (faces >= 0) & (verts >= 0)
+    uvset = self.uvset
+    uvs = np.full ((len (verts), 2), np.nan, dtype = np.float32)
+    uvs[matched] = uvset.get_uv_array ()\
+      [uvset.get_uv_indices (faces[matched], verts[matched])]
+    return uvs
+
+def load_vertex_map (obj, tolerance = 1e-3):
+  """match the mesh of obj with the dsf geometry it was imported from
+     (stored in the property 'dsf-path' of obj).
+  """
+  from .dsf_geom_load import dsf_geom_load
+  if 'dsf-path' not in obj:
+    raise dsf_fingerprint.mismatch_error\
+      ("%s was not imported from a dsf file (it has no property "
+       "'dsf-path'), its vertices cannot be remapped" % (obj.name))
+  geom = dsf_geom_load.load_file (obj['dsf-path'])
+  return vertex_map (geom, obj.data, tolerance)
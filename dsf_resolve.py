@@ -0,0 +1,137 @@
+# resolve dsf urls to files in one or more content libraries.
+import os, os.path, logging
+import urllib.parse
+
+from . import dsf_io
+
+log = logging.getLogger ('dsf-resolve')
+
+class dir_listing (object):
+  """the cached contents of a single directory: the names with a flag
+     telling if they are a directory, and a map from the case-folded
+     names to the actual names.
+  """
+  __slots__ = ('entries', 'folded')
+  def __init__ (self, path):
+    self.entries = {}
+    self.folded = {}
+    try:
+      with os.scandir (path) as it:
+        for entry in it:
+          self.entries[entry.name] = entry.is_dir ()
+    except OSError:
+      # missing directories simply have no entries.
+      pass
+    for name in sorted (self.entries):
+      self.folded.setdefault (name.casefold (), name)
+
+  def lookup (self, name):
+    """return the actual name for name (matching exactly or else
+       ignoring case) and if it is a directory. returns (None, False) if
+       there is no such entry.
+    """
+    if name in self.entries:
+      return (name, self.entries[name])
+    actual = self.folded.get (name.casefold ())
+    if actual is None:
+      return (None, False)
+    return (actual, self.entries[actual])
+
+class url_resolver (object):
+  """find the files for dsf urls (eg. /data/DAZ%203D/Genesis/Base/
+     Genesis.dsf#Genesis) in an ordered list of content libraries.
+     Directory contents are read once and cached; names are matched
+     ignoring case if there is no exact match. Call invalidate when
+     files are added or removed.
+  """
+  def __init__ (self, roots = ()):
+    """roots are the content library directories, in search order.
+    """
+    self.roots = []
+    self.listings = {}
+    self.found = {}
+    for root in roots:
+      self.add_root (root)
+
+  def add_root (self, path):
+    """append a content library to the search list. path is the library
+       directory or a file or directory within it.
+    """
+    root = os.path.abspath (dsf_io.find_data_parent (path) or path)
+    if root not in self.roots:
+      self.roots.append (root)
+      self.found.clear ()
+    return root
+
+  def get_listing (self, path):
+    """return the (cached) dir_listing of the directory path.
+    """
+    listing = self.listings.get (path)
+    if listing is None:
+      listing = dir_listing (path)
+      self.listings[path] = listing
+    return listing
+
+  def invalidate (self, path = None):
+    """forget the cached listing of the directory path and of the
+       directories below it (everything if path is None).
+    """
+    self.found.clear ()
+    if path is None:
+      self.listings.clear ()
+    else:
+      path = os.path.abspath (path)
+      prefix = os.path.join (path, '')
+      for cached in list (self.listings):
+        if cached == path or cached.startswith (prefix):
+          del self.listings[cached]
+
+  def find_in_root (self, root, parts):
+    """find the file with the path components parts in root.
+       returns the absolute path or None.
+    """
+    path = root
+    for (i, part) in enumerate (parts):
+      (name, is_dir) = self.get_listing (path).lookup (part)
+      if name is None or is_dir != (i < len (parts) - 1):
+        return None
+      path = os.path.join (path, name)
+    return path
+
+  def find_file (self, libpath):
+    """return the absolute path of the (unquoted) library path libpath
+       in the first root that contains it, None if it does not exist.
+    """
+    if libpath in self.found:
+      return self.found[libpath]
+    parts = [part for part in libpath.split ('/') if part not in ('', '.')]
+    result = None
+    if parts:
+      for root in self.roots:
+        result = self.find_in_root (root, parts)
+        if result is not None:
+          break
+    self.found[libpath] = result
+    return result
+
+  def resolve (self, url, base = None):
+    """resolve a dsf url to a pair (absolute path, fragment id); the
+       fragment is None if the url has none. A url consisting of only
+       a fragment refers to the file base.
+       raises KeyError if the file can not be found.
+    """
+    (path, _, fragment) = url.partition ('#')
+    fragment = urllib.parse.unquote (fragment) if fragment else None
+    if not path:
+      if base is None:
+        raise KeyError ("no file for url %s" % (url))
+      return (base, fragment)
+    abspath = self.find_file (urllib.parse.unquote (path))
+    if abspath is None:
+      raise KeyError ("cannot resolve %s in %s" % (url, self.roots))
+    return (abspath, fragment)
+
+def make_resolver (filepath):
+  """create a resolver for the content library containing filepath.
+  """
+  return url_resolver ([filepath])
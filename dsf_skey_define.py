@@ -1,41 +1,139 @@
 from mathutils import Vector
+import numpy as np
+
+from . import dsf_trace
+
+from . import dsf_modal
+
+# number of deltas applied per step.
+chunk_size = 20000
 
 def define_shape_key (obj, base, name, deltas):
   """define a new shapekey for mesh.
      obj is the object of a mesh.
      base is the base shapekey from which the new shapekey is derived.
      name is the name for the new shapekey.
-     deltas is an iterable returning pairs of (vertex index, delta).
+     deltas is an iterable of pairs (vertex index, delta).
   """
-  shape_key = obj.shape_key_add (name)
-  shape_key_data = shape_key.data
-  shape_key_values = shape_key_data.values ()
-  for (delta_idx, delta_val) in deltas:
-    # add the deltas to their respective shape-key coordinates.
-    shape_key_values[delta_idx].co += Vector (delta_val)
+  key_name = dsf_modal.run_steps (define_shape_key_steps\
+    (obj.name, name, deltas, dsf_modal.undo_log ()))
+  return obj.data.shape_keys.key_blocks[key_name]
+
+def get_shape_key (obj_name, key_name):
+  """return the shapekey key_name of the object obj_name. Raises a
+     mismatch_error if either no longer exists.
+  """
+  from . import dsf_fingerprint
+  keys = dsf_modal.get_object (obj_name).data.shape_keys
+  shape_key = None if keys is None else keys.key_blocks.get (key_name)
+  if shape_key is None:
+    raise dsf_fingerprint.mismatch_error\
+      ("shapekey %s was removed during the import" % (key_name))
   return shape_key
 
-def define_morph (obj, base, morph):
+def define_shape_key_steps (obj_name, name, deltas, undo):
+  """generator version of define_shape_key for the object obj_name,
+     yielding the progress after each chunk of deltas. The shapekey is
+     recorded in undo; its name is returned. The object and shapekey
+     are looked up by name in each step. deltas is an iterable of
+     pairs (vertex index, delta).
+  """
+  # the deltas are applied in chunks, so they need a length.
+  deltas = list (deltas)
+  key_name = dsf_modal.get_object (obj_name).shape_key_add (name).name
+  undo.add (dsf_modal.remove_shape_key, obj_name, key_name)
+  for (start, end) in dsf_modal.iter_chunks (len (deltas), chunk_size):
+    points = get_shape_key (obj_name, key_name).data
+    for (delta_idx, delta_val) in deltas[start:end]:
+      # add the deltas to their respective shape-key coordinates.
+      points[delta_idx].co += Vector (delta_val)
+    yield end / len (deltas)
+  return key_name
+
+def get_morph_deltas (morph, vmap = None):
+  """return the list of (vertex index, delta) of morph. if vmap (a
+     dsf_remap.vertex_map) is given, the vertex indices of the morph
+     are converted to the mesh indices.
+  """
+  (indices, offsets) = morph.delta_arrays ()
+  if vmap is not None:
+    (indices, offsets) = vmap.remap_deltas (indices, offsets)
+  return list (zip (indices.tolist (), offsets.tolist ()))
+
+def define_morph (obj, base, morph, vmap = None):
   """create a new shapekey for obj, based on the modifier morph
-     relative to base.
+     relative to base. if vmap (a dsf_remap.vertex_map) is given, the
+     vertex indices of the morph are converted to the mesh indices.
   """
   shape_key_name = morph.name ()
-  shape_key = define_shape_key (obj, base, shape_key_name, morph.deltas ())
+  deltas = get_morph_deltas (morph, vmap)
+  shape_key = define_shape_key (obj, base, shape_key_name, deltas)
   return shape_key
 
-def get_base_shape_key (obj):
-  """get or create the base shapekey for object.
+def define_morph_steps (obj_name, morph, undo, vmap = None):
+  """generator version of define_morph for the object obj_name, see
+     define_shape_key_steps. The base shapekey must exist (see
+     get_base_shape_key).
+  """
+  deltas = get_morph_deltas (morph, vmap)
+  return (yield from define_shape_key_steps\
+          (obj_name, morph.name (), deltas, undo))
+
+def get_base_shape_key (obj, undo = None):
+  """get or create the base shapekey for object. A created shapekey is
+     recorded in undo. Jobs must not keep the result across steps.
   """
   if obj.data.shape_keys is None:
     base_shape_key = obj.shape_key_add ('base')
+    if undo is not None:
+      undo.add (dsf_modal.remove_shape_key, obj.name, base_shape_key.name)
   else:
     base_shape_key = obj.data.shape_keys.reference_key
   return base_shape_key
 
-def define_shapekeys (obj, morphlib):
+@dsf_trace.traced ()
+def define_shapekeys (obj, morphlib, vmap = None):
   """define all morphs of morphlib as shapekeys. A new base shapekey is
      automatically created of none exists yet.
   """
   modifier = morphlib.find_modifier (None)
   base_shape_key = get_base_shape_key (obj)
-  define_morph (obj, base_shape_key, modifier)
+  define_morph (obj, base_shape_key, modifier, vmap = vmap)
+
+def get_mesh_coords (obj):
+  """return the vertex coordinates of the objects mesh as a
+     float32 array of shape (n,3).
+  """
+  verts = obj.data.vertices
+  coords = np.zeros (3 * len (verts), dtype = np.float32)
+  verts.foreach_get ('co', coords)
+  return coords.reshape (-1, 3)
+
+def check_bank (obj, bank):
+  """raise an exception if the morph bank does not fit the mesh of obj.
+  """
+  if len (obj.data.vertices) != bank.vertex_count:
+    raise ValueError ("morph bank has %d vertices, mesh has %d"
+                      % (bank.vertex_count, len (obj.data.vertices)))
+
+def define_blended_shape_key (obj, bank, weights, name = 'blended'):
+  """bake the blend of the morphs in bank (a dsf_morph_bank.morph_bank)
+     with the given weights into a single new shapekey of obj.
+  """
+  check_bank (obj, bank)
+  base_shape_key = get_base_shape_key (obj)
+  coords = np.zeros (3 * bank.vertex_count, dtype = np.float32)
+  base_shape_key.data.foreach_get ('co', coords)
+  shape_key = obj.shape_key_add (name)
+  shape_key.data.foreach_set\
+    ('co', bank.blend_positions (coords, weights).ravel ())
+  return shape_key
+
+def bake_morph_bank (obj, bank, weights):
+  """apply the blend of the morphs in bank directly to the mesh of obj.
+  """
+  check_bank (obj, bank)
+  coords = get_mesh_coords (obj)
+  obj.data.vertices.foreach_set\
+    ('co', bank.blend_positions (coords, weights).ravel ())
+  obj.data.update ()
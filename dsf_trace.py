@@ -0,0 +1,36 @@
+# tracing for the modules of the add-on. The tracer is part of the dsf
+# package (modules/dsf/trace.py), so spans of the add-on and of the
+# exporters end up in the same report. Without the dsf package (eg.
+# when the loaders are used outside of blender), spans do nothing.
+import contextlib
+
+try:
+  from dsf.trace import span, traced, session
+except ImportError:
+
+  class null_span (object):
+    """the span used without the dsf package; does nothing.
+    """
+    __slots__ = ()
+    def __enter__ (self):
+      return self
+    def __exit__ (self, *exc):
+      return False
+    def add_items (self, count):
+      pass
+    def set_arg (self, key, value):
+      pass
+
+  null = null_span ()
+
+  def span (name, items = None, **args):
+    return null
+
+  def traced (name = None):
+    def decorate (func):
+      return func
+    return decorate
+
+  @contextlib.contextmanager
+  def session (name, **args):
+    yield null
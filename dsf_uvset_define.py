@@ -1,4 +1,12 @@
 import itertools
+import numpy as np
+
+from . import dsf_trace
+
+from . import dsf_modal
+
+# number of polygons filled per step.
+chunk_size = 10000
 
 def create_uv_layer (msh, name):
   """create a new uv layer and return its name.
@@ -8,23 +16,81 @@ def create_uv_layer (msh, name):
   return uvl
 
 def fill_uv_coords (uvlib, msh, uvl):
-  """uvlib is an object that returns uv-coordinates.
+  """uvlib is an object that returns uv-coordinates (None for faces
+     that are left alone).
      msh is a mesh data object.
      uvl is a uv-layer data object.
      uvl must have the same length as mesh.faces.
   """
-  uv_data = uvl.data
+  dsf_modal.run_steps (fill_uv_coords_steps (uvlib, msh.name, uvl.name))
+
+def get_uv_layer (mesh_name, layer_name):
+  """return the mesh mesh_name and its uv layer layer_name. Raises a
+     mismatch_error if either no longer exists.
+  """
+  from . import dsf_fingerprint
+  msh = dsf_modal.get_mesh (mesh_name)
+  uvl = msh.uv_layers.get (layer_name)
+  if uvl is None:
+    raise dsf_fingerprint.mismatch_error\
+      ("uv layer %s was removed during the import" % (layer_name))
+  return (msh, uvl)
+
+def fill_uv_coords_steps (uvlib, mesh_name, layer_name):
+  """generator version of fill_uv_coords for the uv layer layer_name
+     of the mesh mesh_name, yielding the progress after each chunk of
+     polygons. The mesh and layer are looked up by name in each step.
+  """
+  if hasattr (uvlib, 'get_loop_uvs'):
+    yield from fill_loop_uvs_steps (uvlib, mesh_name, layer_name)
+    return
   uvoff = 0
-  for mshpoly in msh.polygons:
-    # mshpoly.vertices contains the list of vertices, like [0, 1, 2, 3, 4]
-    # get the vertices from the uvlib
-    uvcoords = uvlib.get_uvs (mshpoly.index, mshpoly.vertices)
-    for uv_rel_idx in range (len (mshpoly.vertices)):
-      uv_pair = uvcoords[2*uv_rel_idx:2*uv_rel_idx+2]
-      uv_abs_idx = uvoff + uv_rel_idx
-      uv_data[uv_abs_idx].uv = uv_pair
-    uvoff += len (mshpoly.vertices)
+  n_polys = len (dsf_modal.get_mesh (mesh_name).polygons)
+  for (start, end) in dsf_modal.iter_chunks (n_polys, chunk_size):
+    (msh, uvl) = get_uv_layer (mesh_name, layer_name)
+    uv_data = uvl.data
+    polygons = msh.polygons
+    for poly_idx in range (start, end):
+      mshpoly = polygons[poly_idx]
+      # mshpoly.vertices contains the list of vertices, like [0, 1, 2, 3, 4]
+      # get the vertices from the uvlib
+      uvcoords = uvlib.get_uvs (mshpoly.index, mshpoly.vertices)
+      if uvcoords is None:
+        uvoff += len (mshpoly.vertices)
+        continue
+      for uv_rel_idx in range (len (mshpoly.vertices)):
+        uv_pair = uvcoords[2*uv_rel_idx:2*uv_rel_idx+2]
+        uv_abs_idx = uvoff + uv_rel_idx
+        uv_data[uv_abs_idx].uv = uv_pair
+      uvoff += len (mshpoly.vertices)
+    yield end / n_polys
+  dsf_modal.get_mesh (mesh_name).update ()
+
+def fill_loop_uvs_steps (uvlib, mesh_name, layer_name):
+  """fill the uv layer with the uvs of all loops at once. uvlib must
+     implement get_loop_uvs (face_offsets, face_indices); loops with
+     NaN uvs are left alone.
+  """
+  msh = dsf_modal.get_mesh (mesh_name)
+  n_polys = len (msh.polygons)
+  loop_totals = np.zeros (n_polys, dtype = np.int32)
+  msh.polygons.foreach_get ('loop_total', loop_totals)
+  face_offsets = np.zeros (n_polys + 1, dtype = np.int64)
+  np.cumsum (loop_totals, out = face_offsets[1:])
+  face_indices = np.zeros (len (msh.loops), dtype = np.int32)
+  msh.loops.foreach_get ('vertex_index', face_indices)
+  uvs = uvlib.get_loop_uvs (face_offsets, face_indices)
+  yield 0.5
+  (msh, uvl) = get_uv_layer (mesh_name, layer_name)
+  uvs = np.array (uvs, dtype = np.float32).ravel ()
+  unmatched = np.isnan (uvs)
+  if unmatched.any ():
+    current = np.zeros (len (uvs), dtype = np.float32)
+    uvl.data.foreach_get ('uv', current)
+    uvs[unmatched] = current[unmatched]
+  uvl.data.foreach_set ('uv', uvs)
   msh.update ()
+  yield 1.0
 
 class dsf_uvset_define (object):
   """class to define uvsets; mainly the define_uvset function is exported.
@@ -34,6 +100,16 @@ class dsf_uvset_define (object):
     """uvlib is the object returned by the loader.
        uvlib must implement get_name() and get_uvs (face, verts).
     """
-    msh = obj.data
+    dsf_modal.run_steps\
+      (self.define_uvset_steps (obj.name, uvlib, dsf_modal.undo_log ()))
+
+  @classmethod
+  @dsf_trace.traced ()
+  def define_uvset_steps (self, obj_name, uvlib, undo):
+    """generator version of define_uvset for the object obj_name,
+       yielding the progress. The created uv layer is recorded in undo.
+    """
+    msh = dsf_modal.get_object (obj_name).data
     uvl = create_uv_layer (msh, uvlib.get_name ())
-    fill_uv_coords (uvlib, msh, uvl)
+    undo.add (dsf_modal.remove_uv_layer, obj_name, uvl.name)
+    yield from fill_uv_coords_steps (uvlib, msh.name, uvl.name)
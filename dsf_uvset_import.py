@@ -1,9 +1,8 @@
 import sys, os.path, logging
 import bpy
-from bpy.props import StringProperty
+from bpy.props import BoolProperty, StringProperty
 
-from .dsf_uvset_load import dsf_uvset_load
-from .dsf_uvset_define import dsf_uvset_define
+from . import dsf_modal
 
 log = logging.getLogger ('import_uvset')
 
@@ -18,16 +17,46 @@ bl_info = {
   'wiki_url': 'http://nonexistent',
 }
 
-def import_dsf_uvset_file (filename, context):
+def import_dsf_uvset_file (filename, context, remap = False):
   """load the dsf-file and insert it as a blender uvset.
+     if remap is set, the vertices and faces of the geometry the object
+     was imported from are matched with the vertices and faces of the object.
   """
-  # parse the dsf-file.
-  uvlib = dsf_uvset_load.read_dsf_data (filename)
-  obj = context.active_object
-  dsf_uvset_define.define_uvset (obj, uvlib)
+  uvset_import_job (filename, remap).run (context)
+
+class uvset_import_job (dsf_modal.import_job):
+  """create a uv layer of the active object (see import_dsf_uvset_file).
+  """
+  def __init__ (self, filepath, remap = False, obj_name = None):
+    super (uvset_import_job, self).__init__ (filepath, obj_name)
+    self.remap = remap
+
+  def parse (self):
+    from .dsf_uvset_load import dsf_uvset_load
+    self.uvlib = dsf_uvset_load.read_dsf_data (self.filepath)
+    # decode the tables here, not while building.
+    self.uvlib.decode ()
+
+  def build (self, context):
+    from .dsf_uvset_define import dsf_uvset_define
+    from . import dsf_fingerprint
+    from . import dsf_remap
+    uvlib = self.uvlib
+    obj = self.get_target (context)
+    if self.remap:
+      vmap = dsf_remap.load_vertex_map (obj)
+      dsf_fingerprint.check_fingerprint\
+        (vmap.fingerprint, vertex_count = uvlib.get_vertex_count (),
+         what = self.filepath)
+      uvlib = dsf_remap.remapped_uvset (uvlib, vmap)
+    else:
+      dsf_fingerprint.check_object\
+        (obj, vertex_count = uvlib.get_vertex_count (), what = self.filepath)
+    yield from dsf_uvset_define.define_uvset_steps\
+      (self.obj_name, uvlib, self.undo)
 
 # the rest defines the gui and the blender operator
-class import_dsf_uvset (bpy.types.Operator):
+class import_dsf_uvset (dsf_modal.modal_import, bpy.types.Operator):
   # the doc text is displayed in the tooltip of the menu entry.
   """Load a daz studio 4 dsf file."""
   # the bl_label is displayed in the operator-menu (with space-KEY).
@@ -41,14 +70,21 @@ class import_dsf_uvset (bpy.types.Operator):
       (name = 'file path', description = 'file path for importing dsf-file.',
        maxlen = 1000, default = '')
   filter_glob = StringProperty (default = '*.dsf')
+  prop_remap = BoolProperty\
+      (name = 'remap vertices',
+       description = 'match vertices by position with the imported geometry',
+       default = False)
+
+  def get_errors (self):
+    from . import dsf_fingerprint
+    return (dsf_fingerprint.mismatch_error,)
 
-  def execute (self, context):
-    """display the gui and load a file. This function should be
-       called after the menu entry for the file is selected."""
-    # call the main import function. This function should work
-    # independent of this context-manager/operator logic.
-    import_dsf_uvset_file (self.properties.filepath, context)
-    return { 'FINISHED' }
+  def create_job (self, context):
+    """create the job loading the file. It is run by execute, which
+       is called after the menu entry for the file is selected."""
+    return uvset_import_job (self.properties.filepath,
+                             remap = self.properties.prop_remap,
+                             obj_name = self.get_target_name (context))
   def invoke (self, context, event):
     """The invoke function should be called when the menu-entry for
        this operator is selected. It displays a file-selector and
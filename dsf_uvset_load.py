@@ -1,5 +1,5 @@
-import json, logging, random, itertools
-from array import array
+import json, logging, itertools, bisect
+import numpy as np
 
 log = logging.getLogger ('import_uvset')
 
@@ -11,60 +11,165 @@ log = logging.getLogger ('import_uvset')
 # assumption: vertex_indices contains indices into uvs-array for each vertex.
 # @todo: check, if this is true.
 
+def make_key (faces, verts):
+  """combine face and vertex indices into one sortable int64 key.
+  """
+  return (np.asarray (faces, dtype = np.int64) << 32)\
+    | (np.asarray (verts, dtype = np.int64) & 0xffffffff)
+
 class dsf_uvset (object):
   """class to get uv-coordinates from the dsf-data.
+     The tables are decoded on first use: the uvs into a float32 array
+     of shape (n,2), the seam overrides (polygon_vertex_indices) into
+     int32 arrays of faces, vertices and uv indices sorted by
+     (face, vertex), so they can be looked up by binary search.
+     The json data is dropped once both tables are decoded.
   """
   def __init__ (self, uvlib):
     """initialize with a given uv-library (a single item
        from the uv-set-library in the dsf.
     """
     self.name = uvlib['id']
-    if 'polygon_vertex_indices' in uvlib:
-      # stuff all border uvs into a map[face,vert->uv]
-      self.separate = {
-        (t[0], t[1]): t[2] for t in uvlib['polygon_vertex_indices']
-      }
-    else:
-      self.separate = { }
-    self.uvs = array\
-        ('f', itertools.chain.from_iterable (uvlib['uvs']['values']))
+    self.vertex_count = uvlib.get ('vertex_count')
+    self.uvlib = uvlib
+    self.uvs = None
+    self.separate = None
   def get_name (self):
     """returns the name of the uvset.
     """
     return self.name
+  def get_vertex_count (self):
+    """returns the number of vertices of the geometry the uvset is for
+       (None if not given in the file).
+    """
+    return self.vertex_count
+  def decode (self):
+    """decode both tables now (eg. in a thread instead of on first
+       use).
+    """
+    self.get_uv_array ()
+    self.get_separate ()
+  def release_uvlib (self):
+    """drop the json data when it is no longer needed.
+    """
+    if self.uvs is not None and self.separate is not None:
+      self.uvlib = None
+  def get_uv_array (self):
+    """return the uvs as float32 array of shape (n,2).
+    """
+    if self.uvs is None:
+      # decode without building a temporary array for the nested lists.
+      values = self.uvlib['uvs']['values']
+      flat = np.fromiter (itertools.chain.from_iterable (values),
+                          dtype = np.float32, count = 2 * len (values))
+      self.uvs = flat.reshape ((len (values), 2))
+      self.release_uvlib ()
+    return self.uvs
+  def get_separate (self):
+    """return the seam overrides as triple (faces, verts, uv indices) of
+       int32 arrays sorted by face and vertex.
+    """
+    if self.separate is None:
+      triples = self.uvlib.get ('polygon_vertex_indices', [])
+      table = np.fromiter (itertools.chain.from_iterable (triples),
+                           dtype = np.int32, count = 3 * len (triples))\
+        .reshape ((len (triples), 3))
+      table = table[np.lexsort ((table[:,1], table[:,0]))]
+      self.separate = (np.ascontiguousarray (table[:,0]),
+                       np.ascontiguousarray (table[:,1]),
+                       np.ascontiguousarray (table[:,2]))
+      self.release_uvlib ()
+    return self.separate
+  def get_uv_indices (self, faces, verts):
+    """return the uv index of each pair (faces[i], verts[i]).
+    """
+    verts = np.asarray (verts, dtype = np.int64)
+    uv_indices = verts.copy ()
+    (sep_faces, sep_verts, sep_uvs) = self.get_separate ()
+    if len (sep_faces) > 0 and len (verts) > 0:
+      keys = make_key (sep_faces, sep_verts)
+      query = make_key (faces, verts)
+      pos = np.searchsorted (keys, query)
+      pos[pos == len (keys)] = 0
+      found = keys[pos] == query
+      uv_indices[found] = sep_uvs[pos[found]]
+    return uv_indices
   def get_uvs (self, face, verts):
     """return a list of 2*len(verts) numbers representing
        the uv-coordinates of the given face.
     """
-    uvlist = []
-    for v in verts:
-      if (face, v) in self.separate:
-        uvidx = self.separate[(face, v)]
-      else:
-        uvidx = v
-      uvlist.append (self.uvs[2*uvidx])
-      uvlist.append (self.uvs[2*uvidx+1])
-    return uvlist
+    (sep_faces, sep_verts, sep_uvs) = self.get_separate ()
+    indices = list (verts)
+    # bisect on a memoryview is cheaper than searchsorted for scalars.
+    faces = memoryview (sep_faces)
+    start = bisect.bisect_left (faces, face)
+    end = bisect.bisect_left (faces, face + 1, start)
+    if start < end:
+      row = dict (zip (sep_verts[start:end].tolist (),
+                       sep_uvs[start:end].tolist ()))
+      indices = [row.get (v, v) for v in indices]
+    return self.get_uv_array ().take (indices, axis = 0).ravel ().tolist ()
+  def get_loop_uvs (self, face_offsets, face_indices):
+    """return the uvs of all loops at once as float32 array of shape
+       (n,2). face_indices are the vertices of all faces one after the
+       other, face i being face_indices[face_offsets[i]:face_offsets[i+1]].
+    """
+    face_offsets = np.asarray (face_offsets, dtype = np.int64)
+    faces = np.repeat (np.arange (len (face_offsets) - 1),
+                       np.diff (face_offsets))
+    return self.get_uv_array ()\
+      [self.get_uv_indices (faces, face_indices)]
+
+class dsf_uvset_lib (object):
+  """all uv sets of a file. The uv sets are created when first
+     requested; the json data of a uv set is then left to the uv set.
+  """
+  def __init__ (self, uvlibs):
+    self.uvlibs = list (uvlibs)
+    self.names = [uvlib['id'] for uvlib in uvlibs]
+    self.uvsets = [None] * len (uvlibs)
+  def __len__ (self):
+    return len (self.names)
+  def get_names (self):
+    """return the names of the uv sets.
+    """
+    return list (self.names)
+  def get_uvset (self, key = 0):
+    """return the uv set with the given index or name.
+    """
+    if isinstance (key, str):
+      names = self.get_names ()
+      if key not in names:
+        raise KeyError ("no uv set %s." % (key))
+      key = names.index (key)
+    if self.uvsets[key] is None:
+      self.uvsets[key] = dsf_uvset (self.uvlibs[key])
+      self.uvlibs[key] = None
+    return self.uvsets[key]
+  def __iter__ (self):
+    for idx in range (len (self)):
+      yield self.get_uvset (idx)
 
 class dsf_uvset_load (object):
   """class to load data for definition of uvsets.
   """
   @classmethod
-  def read_dsf_data (self, filename):
-    """load the given filename, check it for a uvset and return
-       the contents in some form usable for the definition function.
+  def read_uvset_lib (self, filename):
+    """load the given filename, check it for uvsets and return all of
+       them as dsf_uvset_lib.
     """
-<<<<<<< HEAD
     from . import dsf_io
-    jdata = dsf_io.read_json_data (filename)
-=======
-    import dsf.dsf_io
-    jdata = dsf.dsf_io.read_json_data (filename)
->>>>>>> 64d1a8da577389e9f24c88afd6ababff31e37f34
+    jdata = dsf_io.load_json_data (filename)
     if 'uv_set_library' not in jdata:
       raise TypeError ('file does not contain a uv set library.')
     uvlibs = jdata['uv_set_library']
     if len (uvlibs) == 0:
       raise TypeError ('file does contain at least one uv set.')
     log.info ("found %d uv sets in %s", len (uvlibs), filename)
-    return dsf_uvset (uvlibs[0])
+    return dsf_uvset_lib (uvlibs)
+  @classmethod
+  def read_dsf_data (self, filename):
+    """load the given filename, check it for a uvset and return
+       the contents in some form usable for the definition function.
+    """
+    return self.read_uvset_lib (filename).get_uvset (0)
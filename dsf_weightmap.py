@@ -114,6 +114,7 @@ class skin (object):
        retrievable by id.
     """
     self.joint_dic = dict ()
+    self.vertex_count = jdata.get ('vertex_count')
     joints = jdata['joints']
     for joint in joints:
       jid = joint['id']
@@ -181,7 +182,7 @@ class skin (object):
 def load_mod_lib (filepath):
   """load the dsf file and return the modifier-library.
   """
-  jdata = dsf_io.read_json_data (filepath)
+  jdata = dsf_io.load_json_data (filepath)
   if 'modifier_library' in jdata:
     # return the first modifier library.
     return jdata['modifier_library'][0]
@@ -1,5 +1,4 @@
 import sys, os.path, logging, json
-from .rig import weight_paint
 
 log = logging.getLogger ("dsf-wm-imp")
 
@@ -7,7 +6,9 @@ import bpy
 from bpy.props import StringProperty, BoolProperty
 from bpy_extras.io_utils import ImportHelper
 
-from . import dsf_weightmap
+from . import dsf_trace
+
+from . import dsf_modal
 
 # weight paint a mesh based on some loading options.
 # options that should be possible:
@@ -16,7 +17,50 @@ from . import dsf_weightmap
 # when used with the armature import, it should also be possible to
 # merge the two main axes into one, leaving the twist axis alone.
 
-class import_dsf_wm (bpy.types.Operator):
+class wm_import_job (dsf_modal.import_job):
+  """weight paint the active object with the maps of a skin binding,
+     one vertex group per step.
+  """
+  def __init__ (self, filepath, remap = False, obj_name = None, **kwarg):
+    """kwarg are the import options passed to the skin-object.
+    """
+    super (wm_import_job, self).__init__ (filepath, obj_name)
+    self.remap = remap
+    self.kwarg = kwarg
+
+  def parse (self):
+    from . import dsf_weightmap
+    with dsf_trace.span ('load_skin'):
+      self.skin = dsf_weightmap.load_skin (self.filepath)
+    log.info ("define: %s", self.kwarg)
+    with dsf_trace.span ('collect_all_paint_maps'):
+      self.paint_groups = self.skin.collect_all_paint_maps (**self.kwarg)
+
+  def build (self, context):
+    from .rig import weight_paint, weight_map
+    from . import dsf_fingerprint
+    from . import dsf_remap
+    mshobj = self.get_target (context)
+    if self.remap:
+      vmap = dsf_remap.load_vertex_map (mshobj)
+      dsf_fingerprint.check_fingerprint\
+        (vmap.fingerprint, vertex_count = self.skin.vertex_count,
+         what = self.filepath)
+    else:
+      vmap = None
+      dsf_fingerprint.check_object\
+        (mshobj, vertex_count = self.skin.vertex_count, what = self.filepath)
+    count = len (self.paint_groups)
+    for (idx, (group_name, paint_map)) in\
+        enumerate (sorted (self.paint_groups.items ())):
+      if vmap is not None:
+        paint_map = weight_map.index_map (paint_map, vmap.to_dsf)
+      mshobj = self.get_target (context)
+      dsf_modal.record_vertex_group (self.undo, mshobj, group_name)
+      weight_paint.paint_group (paint_map, mshobj, group_name)
+      yield (idx + 1) / count
+
+class import_dsf_wm (dsf_modal.modal_import, bpy.types.Operator):
   """operator to import a dsf armature.
   """
   bl_label = 'import dsf-wm'
@@ -34,21 +78,19 @@ class import_dsf_wm (bpy.types.Operator):
   scale = BoolProperty\
       (name = 'scale', description = 'import scaling weights.',
        default = False)
+  remap = BoolProperty\
+      (name = 'remap vertices',
+       description = 'match vertices by position with the imported geometry',
+       default = False)
   filter_glob = StringProperty (default = '*.dsf')
-  def define_wm (self, ctx, skin, **kwarg):
-    """weight paint a mesh based on the loaded data in the skin-object.
-       kwarg contains the import-options passed to the skin-object.
-    """
-    mshobj = ctx.scene.objects.active
-    log.info ("define: %s", kwarg)
-    paint_groups = skin.collect_all_paint_maps (**kwarg)
-    for (group_name, paint_map) in paint_groups.items ():
-      weight_paint.paint_group (paint_map, mshobj, group_name)
-  def execute (self, ctx):
-    """load the modifier-library and put in onto the mesh.
+  def get_errors (self):
+    from . import dsf_fingerprint
+    return (dsf_fingerprint.mismatch_error,)
+  def create_job (self, ctx):
+    """create the job loading the modifier-library and putting it
+       onto the mesh.
     """
     log.info ("loading: %s", self.properties.filepath)
-    skin = dsf_weightmap.load_skin (self.properties.filepath)
     kwarg = {
       'scale': self.properties.scale,
       'local': None
@@ -57,8 +99,9 @@ class import_dsf_wm (bpy.types.Operator):
       kwarg['local'] = 'merged'
     elif self.properties.generic:
       kwarg['local'] = 'generic'
-    self.define_wm (ctx, skin, **kwarg)
-    return {'FINISHED'}
+    return wm_import_job (self.properties.filepath,
+                          remap = self.properties.remap,
+                          obj_name = self.get_target_name (ctx), **kwarg)
   def invoke (self, ctx, event):
     """called by the menu entry or the operator menu.
     """
@@ -0,0 +1,90 @@
+import os, os.path, json, logging
+
+import dsf.export_pipeline
+
+log = logging.getLogger ('export-manifest')
+
+# name of the manifest file in the library directory.
+manifest_name = '.dsf_export_manifest.json'
+
+class export_manifest (object):
+  """records which assets an export has written: for each asset id the
+     content hash and the library path of its file. The manifest is a
+     json file in the library directory that holds the records of every
+     export (owner, eg. the scene file) into that library.
+  """
+  def __init__ (self, libdir, owner, options = None):
+    """load the manifest of libdir. owner identifies the export,
+       options are the output options (eg. compression) of the export;
+       if they differ from the last export, no asset is current.
+    """
+    self.libdir = libdir
+    self.owner = owner
+    self.options = options or {}
+    self.filepath = os.path.join (libdir, manifest_name)
+    self.exports = self.load ()
+    self.previous = self.exports.get (owner, {'options': {}, 'assets': {}})
+    self.assets = {}
+
+  def load (self):
+    """read the manifest file. Returns a dictionary owner->record.
+       A missing or damaged manifest is treated as empty.
+    """
+    if not os.path.exists (self.filepath):
+      return {}
+    try:
+      with open (self.filepath, 'r', encoding = 'utf-8') as ifh:
+        return json.load (ifh)['exports']
+    except (ValueError, KeyError, OSError) as e:
+      log.warning ("ignoring manifest %s: %s", self.filepath, e)
+      return {}
+
+  def get_abspath (self, libpath):
+    """get the absolute filesystem path for a file within the library.
+    """
+    return os.path.abspath (os.path.join (self.libdir, '.' + os.sep + libpath))
+
+  def is_current (self, asset_id, content_hash, libpath):
+    """check if the asset was written by the last export with the same
+       content and is still there.
+    """
+    if self.previous['options'] != self.options:
+      return False
+    entry = self.previous['assets'].get (asset_id)
+    return entry is not None and entry['hash'] == content_hash\
+      and entry['path'] == libpath\
+      and os.path.exists (self.get_abspath (libpath))
+
+  def add (self, asset_id, content_hash, libpath):
+    """record an asset of the current export.
+    """
+    self.assets[asset_id] = {'hash': content_hash, 'path': libpath}
+
+  def get_orphans (self):
+    """return the library paths of the files written by the last export
+       that are not part of the current one (and not of another export).
+    """
+    used = set ([entry['path'] for entry in self.assets.values ()])
+    for (owner, record) in self.exports.items ():
+      if owner != self.owner:
+        used.update ([entry['path'] for entry in record['assets'].values ()])
+    return sorted (set ([entry['path'] for entry
+                         in self.previous['assets'].values ()]) - used)
+
+  def prune (self):
+    """delete the orphaned files of the last export.
+    """
+    for libpath in self.get_orphans ():
+      abspath = self.get_abspath (libpath)
+      if os.path.exists (abspath):
+        log.info ("removing orphan %s", abspath)
+        os.remove (abspath)
+
+  def save (self):
+    """replace the record of this export in the manifest file.
+    """
+    self.exports[self.owner] = {
+      'options': self.options, 'assets': self.assets
+    }
+    dsf.export_pipeline.write_file\
+      ({'exports': self.exports}, self.filepath, sort_keys = True)
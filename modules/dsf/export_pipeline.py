@@ -0,0 +1,108 @@
+import os, os.path, tempfile, threading, time, logging
+import concurrent.futures
+
+import dsf.json_writer
+import dsf.trace
+
+log = logging.getLogger ('export-pipeline')
+
+@dsf.trace.traced ()
+def write_file (data, filepath, **kwarg):
+  """write data as json to filepath. The file is written to a temporary
+     file in the same directory first and renamed when complete, so
+     filepath is either the old or the new file, never a partial one.
+     kwarg are passed to dsf.json_writer.write_json (compress, level,
+     precision, indent, sort_keys).
+     returns a tuple (filepath, size, seconds).
+  """
+  start = time.perf_counter ()
+  dirname = os.path.dirname (filepath)
+  os.makedirs (dirname, exist_ok = True)
+  (fd, tmppath) = tempfile.mkstemp\
+    (dir = dirname, prefix = '.' + os.path.basename (filepath) + '.',
+     suffix = '.tmp')
+  os.close (fd)
+  try:
+    dsf.json_writer.write_json (data, tmppath, **kwarg)
+    os.replace (tmppath, filepath)
+  except:
+    os.remove (tmppath)
+    raise
+  size = os.path.getsize (filepath)
+  return (filepath, size, time.perf_counter () - start)
+
+class export_pipeline (object):
+  """write files in the background. The data to write must be complete
+     when submitted (eg. extracted from blender on the main thread) and
+     must not be changed afterwards; serialization, compression and
+     writing happen in a pool of threads (or processes).
+     Use it as a context manager, leaving the context waits for all
+     files and raises the first error of a write.
+  """
+  def __init__ (self, workers = None, max_pending = None,
+                use_processes = False):
+    """workers is the size of the pool (default: number of cpus).
+       max_pending limits the number of submitted files not yet written,
+       which limits the memory held by the queue (default: 2 * workers).
+       use_processes selects a process pool, which allows formatting
+       in parallel but needs to pickle the data.
+    """
+    if workers is None:
+      workers = os.cpu_count () or 1
+    if max_pending is None:
+      max_pending = 2 * workers
+    if use_processes:
+      self.executor = concurrent.futures.ProcessPoolExecutor (workers)
+    else:
+      self.executor = concurrent.futures.ThreadPoolExecutor (workers)
+    self.slots = threading.BoundedSemaphore (max_pending)
+    self.futures = []
+    self.timings = []
+    self.start = time.perf_counter ()
+
+  def __enter__ (self):
+    return self
+
+  def __exit__ (self, exc_type, exc_value, traceback):
+    if exc_type is None:
+      self.wait ()
+    else:
+      self.executor.shutdown (wait = True)
+    return False
+
+  def done (self, future):
+    """called when a file is written.
+    """
+    self.slots.release ()
+    if future.exception () is None:
+      (filepath, size, seconds) = future.result ()
+      self.timings.append ((filepath, size, seconds))
+      log.info ("wrote %s (%d bytes) in %.3fs", filepath, size, seconds)
+
+  def submit (self, data, filepath, **kwarg):
+    """queue data for writing to filepath (see write_file). Blocks if
+       too many files are pending.
+    """
+    self.slots.acquire ()
+    try:
+      future = self.executor.submit (write_file, data, filepath, **kwarg)
+    except:
+      self.slots.release ()
+      raise
+    future.add_done_callback (self.done)
+    self.futures.append (future)
+    return future
+
+  def wait (self):
+    """wait until every submitted file is written and shut down the pool.
+       returns the list of (filepath, size, seconds) of the written files.
+    """
+    try:
+      for future in concurrent.futures.as_completed (self.futures):
+        future.result ()
+    finally:
+      self.executor.shutdown (wait = True)
+    log.info ("wrote %d files (%d bytes) in %.3fs", len (self.timings),
+              sum ([size for (_, size, _) in self.timings]),
+              time.perf_counter () - self.start)
+    return self.timings
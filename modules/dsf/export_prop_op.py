@@ -1,6 +1,7 @@
 import bpy
 
 import dsf.prop_writer
+import dsf.trace
 
 class ExportDsfProp (bpy.types.Operator):
   """export a dsf prop file.
@@ -17,6 +18,17 @@ class ExportDsfProp (bpy.types.Operator):
   export_scale = bpy.props.FloatProperty\
     ('scale', description = 'scale factor for exporting',
      min = 1, max = 1000, soft_min = 1, soft_max = 100, default = 100)
+  compress = bpy.props.BoolProperty\
+    ('compress', description = 'gzip the written files', default = False)
+  compress_level = bpy.props.IntProperty\
+    ('compression level', description = 'gzip compression level',
+     min = 1, max = 9, default = 6)
+  precision = bpy.props.IntProperty\
+    ('precision', description = 'significant digits of written numbers',
+     min = 3, max = 17, default = 7)
+  incremental = bpy.props.BoolProperty\
+    ('incremental', description = 'only write files that have changed',
+     default = False)
 
   def execute (self, ctx):
     """export selected objects as dsf."""
@@ -24,7 +36,11 @@ class ExportDsfProp (bpy.types.Operator):
     output_group = self.output_group
     scale = self.export_scale
     rotate = self.rotate_yup
-    dsf.prop_writer.export_prop (ctx, filepath, output_group, scale, rotate)
+    with dsf.trace.session ('export dsf-prop', file = filepath):
+      dsf.prop_writer.export_prop\
+        (ctx, filepath, output_group, scale, rotate, compress = self.compress,
+         level = self.compress_level, precision = self.precision,
+         incremental = self.incremental)
     return {'FINISHED'}
 
   def invoke (self, ctx, evt):
@@ -42,7 +58,15 @@ def unregister ():
 def reload ():
   import imp
   import dsf.path_util, dsf.prop_writer, dsf.geom_create, dsf.scene_writer
-  import dsf.geom_writer
+  import dsf.geom_writer, dsf.json_writer, dsf.mesh_extract
+  import dsf.export_pipeline, dsf.export_manifest, dsf.mesh_provider
+  import dsf.trace
+  imp.reload (dsf.trace)
+  imp.reload (dsf.json_writer)
+  imp.reload (dsf.export_pipeline)
+  imp.reload (dsf.export_manifest)
+  imp.reload (dsf.mesh_extract)
+  imp.reload (dsf.mesh_provider)
   imp.reload (dsf.path_util)
   imp.reload (dsf.geom_create)
   imp.reload (dsf.prop_writer)
@@ -1,67 +1,144 @@
-import itertools, copy, logging
+import copy, logging, hashlib
 from collections import namedtuple
 import math, mathutils
+import numpy as np
+
+import dsf.mesh_extract
+import dsf.json_writer
+import dsf.trace
 
 geometry_data = namedtuple ('geometry_data', ['geometry', 'uvs'])
 
 log = logging.getLogger ('geom-create')
 
+def get_group_masks (msh):
+  """read the vertex group memberships of all vertices into a bitmask
+     table: bit g of word w in row v is set if vertex v is a member
+     of group 64*w+g. returns a uint64 array (vertices x words).
+  """
+  # collect the memberships once as (vertex, group) pairs.
+  member_verts = []
+  member_groups = []
+  for vertex in msh.vertices:
+    for vg in vertex.groups:
+      member_verts.append (vertex.index)
+      member_groups.append (vg.group)
+  member_groups = np.array (member_groups, dtype = np.int64)
+  n_words = int (member_groups.max ()) // 64 + 1 if len (member_groups) else 1
+  masks = np.zeros ((len (msh.vertices), n_words), dtype = np.uint64)
+  np.bitwise_or.at\
+    (masks, (np.array (member_verts, dtype = np.int64), member_groups // 64),
+     np.left_shift (np.uint64 (1), (member_groups % 64).astype (np.uint64)))
+  return masks
+
+def get_common_groups (msh, buffers):
+  """for each polygon, get the smallest group index that is a common
+     group of all its vertices (0 if there is none).
+     buffers are the mesh_buffers of msh. returns an int32 array.
+  """
+  n_polys = buffers.get_polygon_count ()
+  if n_polys == 0:
+    return np.zeros (0, dtype = np.int32)
+  masks = get_group_masks (msh)
+  # and-reduce the masks of the vertices of each polygon.
+  common = np.bitwise_and.reduceat\
+    (masks[buffers.poly_verts], buffers.poly_offsets[:-1], axis = 0)
+  # extract the lowest set bit of the first non-zero word.
+  groups = np.zeros (n_polys, dtype = np.int32)
+  found = np.zeros (n_polys, dtype = bool)
+  for word in range (common.shape[1]):
+    bits = common[:,word]
+    sel = ~found & (bits != 0)
+    lowest = bits[sel] & (~bits[sel] + np.uint64 (1))
+    groups[sel] = 64 * word + np.log2 (lowest.astype (np.float64)).astype\
+      (np.int32)
+    found |= sel
+  return groups
+
+def quantize (values, precision = 7):
+  """round values to about precision significant digits (relative to
+     the largest absolute value). returns the step and the int64 values.
+  """
+  values = np.asarray (values, dtype = np.float64)
+  largest = np.abs (values).max () if values.size else 0.0
+  if largest == 0:
+    return (1.0, np.zeros (values.shape, dtype = np.int64))
+  step = 10.0 ** (math.floor (math.log10 (largest)) + 1 - precision)
+  return (step, np.round (values / step).astype (np.int64))
+
 class uv_creator (object):
   """create uv library entries.
   """
   def __init__ (self):
     pass
-  def create_uvlayer (self, msh, uv_layer):
+  def create_uvlayer (self, msh, uv_layer, buffers = None):
     """create a single uv-library entry for the given uv-layer.
        The id, name and label are the name of the uv-layer.
+       each vertex gets the uv-coordinate used by most of its loops,
+       the other uv-coordinates of the vertex are appended and referenced
+       from polygon_vertex_indices.
+       buffers are the mesh_buffers of msh (extracted if not given).
     """
-    uv_data = uv_layer.data
-    # list of all polygon/vertex pairs, should be the same size as the
-    # upv_pairs := list of all (uv_idx, (poly_idx, vert_idx))
-    pvs = [[(poly.index, vi) for vi in poly.vertices] for poly in msh.polygons]
-    upv_pairs = list (enumerate (itertools.chain (*pvs)))
-    assert (len (upv_pairs) == len (uv_data))
-    # sort by vertex number
-    upv_pairs.sort (key = lambda x: x[1][1])
-    uvs = []
-    tail = []
-    d = {}
-    for (v, upvs) in itertools.groupby (upv_pairs, lambda x: x[1][1]):
-      # generate a list for the vertex v, containing each adjacent face
-      # along with the corresponding uv coordinate:
-      v_uvs = [(uv_data[u].uv, p) for (u, (p, v)) in upvs]
-      # sort the list by uv-coordinates
-      v_uvs.sort (key = lambda x: x[0])
-      # create a mapping giving the list of polygons for a uv-coordinate
-      # uv_p contains a list of tuples: (uv-coord, list of polygons)
-      uv_p = [(uv, [p for (uv, p) in ups])
-              for (uv, ups) in itertools.groupby (v_uvs, lambda x: x[0])]
-      # sort this list by the number of polygons
-      uv_p.sort (key = lambda x: len (x[1]))
-      (last_uv, last_ps) = uv_p.pop ()
-      uvs.append (tuple (last_uv))
-      tail.extend (itertools.chain
-                   (*[[(uv, (v, p)) for p in ps] for (uv, ps) in uv_p]))
-    assert (len (uvs) == len (msh.vertices))
-    polygon_vertex_indices = []
-    uv_index = len (uvs)
-    for (uv, uvps) in itertools.groupby (tail, lambda x: x[0]):
-      uvs.append (tuple (uv))
-      for (uv, (v, p)) in uvps:
-        polygon_vertex_indices.append ((p, v, uv_index))
-      uv_index += 1
+    if buffers is None:
+      buffers = dsf.mesh_extract.mesh_buffers (msh)
+    n_verts = buffers.get_vertex_count ()
+    n_loops = len (buffers.loop_verts)
+    loop_verts = buffers.loop_verts
+    loop_polys = buffers.loop_polys
+    loop_uvs = np.zeros (2 * n_loops, dtype = np.float32)
+    uv_layer.data.foreach_get ('uv', loop_uvs)
+    (us, vs) = (loop_uvs[0::2], loop_uvs[1::2])
+    # sort the loops by vertex and uv; loops of the same vertex with the
+    # same uv form a group.
+    order = np.lexsort ((vs, us, loop_verts))
+    (s_verts, s_us, s_vs) = (loop_verts[order], us[order], vs[order])
+    s_polys = loop_polys[order]
+    group_first = np.ones (n_loops, dtype = bool)
+    group_first[1:] = (s_verts[1:] != s_verts[:-1])\
+      | (s_us[1:] != s_us[:-1]) | (s_vs[1:] != s_vs[:-1])
+    group_id = np.cumsum (group_first) - 1
+    group_start = np.flatnonzero (group_first)
+    group_size = np.diff (np.append (group_start, n_loops))
+    group_vert = s_verts[group_start]
+    n_groups = len (group_start)
+    # the primary group of a vertex is its largest group (the last one
+    # in uv-order if there are several).
+    gorder = np.lexsort ((np.arange (n_groups), group_size, group_vert))
+    g_verts = group_vert[gorder]
+    last = np.ones (n_groups, dtype = bool)
+    last[:-1] = g_verts[1:] != g_verts[:-1]
+    primary = gorder[last]
+    is_primary = np.zeros (n_groups, dtype = bool)
+    is_primary[primary] = True
+    vertex_uvs = np.zeros ((n_verts, 2), dtype = np.float32)
+    vertex_uvs[group_vert[primary], 0] = s_us[group_start[primary]]
+    vertex_uvs[group_vert[primary], 1] = s_vs[group_start[primary]]
+    # every other group gets a new uv-index after the vertex uvs, in the
+    # order of (vertex, u, v); polygon_vertex_indices follow the same
+    # order. Before, the extra uvs of a vertex were ordered by the
+    # number of their loops, so the entries describe the same mapping
+    # but are not in the same order as in files of older versions.
+    tail = np.flatnonzero (~is_primary)
+    group_uv_index = np.full (n_groups, -1, dtype = np.int64)
+    group_uv_index[tail] = n_verts + np.arange (len (tail))
+    tail_uvs = np.stack ((s_us[group_start[tail]], s_vs[group_start[tail]]),
+                         axis = 1)
+    tail_loops = ~is_primary[group_id]
+    pvi = np.stack ((s_polys[tail_loops], s_verts[tail_loops],
+                     group_uv_index[group_id[tail_loops]]), axis = 1)
+    uvs = np.concatenate ((vertex_uvs, tail_uvs))
     uv_lib = {
       'id': uv_layer.name,
       'label': uv_layer.name,
-      'vertex_count': len (msh.vertices),
+      'vertex_count': n_verts,
       'uvs': {
         'count': len (uvs),
-        'values': uvs,
+        'values': dsf.json_writer.array_rows (uvs),
       },
-      'polygon_vertex_indices': polygon_vertex_indices,
+      'polygon_vertex_indices': dsf.json_writer.array_rows (pvi),
     }
     return uv_lib
-  def create_uvs (self, obj, msh):
+  def create_uvs (self, obj, msh, buffers = None):
     # get all layers
     layers = list (msh.uv_layers)
     # make the active layer the first one.
@@ -69,7 +146,7 @@ class uv_creator (object):
     # create uv lib entries for the uv layers.
     jdata = []
     for uvl in layers:
-      uvlib = self.create_uvlayer (msh, uvl)
+      uvlib = self.create_uvlayer (msh, uvl, buffers)
       jdata.append (uvlib)
     return jdata
 
@@ -80,10 +157,49 @@ class geom_data_creator (object):
     self.obj = obj
     self.msh = msh
     self.transform = transform
+    self.buffers = dsf.mesh_extract.mesh_buffers (msh, transform)
+    self.polygon_groups = None
+  def get_polygon_groups (self):
+    """return the group index of each polygon (see get_common_groups).
+    """
+    if self.polygon_groups is None:
+      self.polygon_groups = get_common_groups (self.msh, self.buffers)
+    return self.polygon_groups
+  @dsf.trace.traced ()
+  def get_content_hash (self, precision = 7):
+    """hash everything that goes into the geometry and uv-set entries:
+       positions (rounded to precision digits), polygons, uvs, groups
+       and materials. Meshes with the same hash can share a geometry.
+       The names of the groups, materials and uv-layers are part of
+       the hash, the name of the mesh is not.
+    """
+    digest = hashlib.blake2b (digest_size = 16)
+    def update_array (values):
+      (step, quantized) = quantize (values, precision)
+      digest.update (np.float64 (step).tobytes ())
+      digest.update (quantized.tobytes ())
+    def update_names (names):
+      digest.update (repr (list (names)).encode ('utf-8'))
+    buffers = self.buffers
+    update_array (buffers.coords)
+    digest.update (buffers.poly_offsets.tobytes ())
+    digest.update (buffers.poly_verts.astype (np.int32).tobytes ())
+    digest.update (buffers.materials.tobytes ())
+    digest.update (self.get_polygon_groups ().tobytes ())
+    update_names ([group.name for group in self.obj.vertex_groups])
+    update_names ([getattr (mat, 'name', None) for mat in self.msh.materials])
+    layers = list (self.msh.uv_layers)
+    layers.sort (key = lambda x: x != self.msh.uv_layers.active)
+    update_names ([uvl.name for uvl in layers])
+    for uvl in layers:
+      loop_uvs = np.zeros (2 * len (buffers.loop_verts), dtype = np.float32)
+      uvl.data.foreach_get ('uv', loop_uvs)
+      update_array (loop_uvs)
+    return digest.hexdigest ()
   def get_vertices (self):
     """get the vertices object from the mesh.
     """
-    vs = [tuple (self.transform * v.co) for v in self.msh.vertices]
+    vs = dsf.json_writer.array_rows (self.buffers.coords)
     data = {
       'count': len (vs),
       'values': vs
@@ -95,26 +211,8 @@ class geom_data_creator (object):
        obj is the mesh object (which holds the groups).
     """
     obj = self.obj
-    msh = self.msh
-    def get_common_group (vidxs):
-      """get the smallest group index that is a common group index of
-         all vertexes whose indices are given in vidxs.
-         If there is no common index, return 0.
-      """
-      # list of group-objects, one for each vertex
-      groups = [msh.vertices[vidx].groups for vidx in vidxs]
-      # create a list of lists of group-indices
-      group_idxs = [[vg.group for vg in vgroups] for vgroups in groups]
-      # build the intersection of all groups
-      intersection = set (group_idxs.pop ())
-      for group in group_idxs:
-        intersection.intersection_update (group)
-      if len (intersection) == 0:
-        return 0
-      else:
-        return min (intersection)
     # pgroups is the list of group indices to use, one for each face.
-    pgroups = [get_common_group (poly.vertices) for poly in msh.polygons]
+    pgroups = self.get_polygon_groups ().tolist ()
     if len (obj.vertex_groups) == 0:
       group_names = ['default']
     else:
@@ -137,7 +235,7 @@ class geom_data_creator (object):
         return 'default'
       else:
         return material.name
-    mgroups = [poly.material_index for poly in msh.polygons]
+    mgroups = self.buffers.materials.tolist ()
     if len (msh.materials) == 0:
       material_names = ['default']
     else:
@@ -151,10 +249,8 @@ class geom_data_creator (object):
     """create the polygon vertex list. Returns a list of lists
        where each element is a polygon (a list of vertex indices).
     """
-    msh = self.msh
     # todo: the winding of the vertices with respect to the normal must be ccw.
-    poly_vidx_list = [list (poly.vertices) for poly in msh.polygons]
-    return poly_vidx_list
+    return self.buffers.get_polygon_lists ()
   def create_face_data (self):
     """create the polygon data of the object.
        this returns a dictionary with the keys:
@@ -165,14 +261,9 @@ class geom_data_creator (object):
     (pg_jdata, pg_idxs) = self.get_face_groups ()
     (pm_jdata, pm_idxs) = self.get_face_materials ()
     assert len (pg_idxs) == len (pm_idxs) == len (msh.polygons)
-    def create_poly_tuple (g, m, vs):
-      return [g, m] + vs
-    # poly_vidx_list contains the actual polygon data.
-    # Each element of poly_vidx_list is a list of vertex-indices.
-    poly_vidx_list = self.create_polygon_data ()
-    # enhance each polygon with an index to the group and material.
-    gm_poly_vidx_list = list (map (create_poly_tuple,
-                                   pg_idxs, pm_idxs, poly_vidx_list))
+    # each polygon is a list of the group index, the material index
+    # and the vertex indices.
+    gm_poly_vidx_list = self.buffers.get_polygon_rows (pg_idxs, pm_idxs)
     polylist_jdata ={
       'count': len (gm_poly_vidx_list),
       'values': gm_poly_vidx_list
@@ -191,7 +282,7 @@ class geom_data_creator (object):
        the active uv-layer always comes first.
     """
     uvcreator = uv_creator ()
-    return uvcreator.create_uvs (self.obj, self.msh)
+    return uvcreator.create_uvs (self.obj, self.msh, self.buffers)
   def create_geometry (self):
     """create a geometry_library entry from a blender object.
        The mesh name is used for the id of the geometry.
@@ -212,11 +303,18 @@ class geom_creator (object):
     """using transform to transform vertices.
     """
     self.transform = transform or mathutils.Matrix.Identity (3)
-  def create_geometry_and_uvs (self, obj, msh):
+  def create_data_creator (self, obj, msh):
+    """extract the data of the mesh msh of obj. Returns a
+       geom_data_creator.
+    """
+    return geom_data_creator (obj, msh, self.transform)
+  def create_geometry_and_uvs (self, obj, msh, gdcreator = None):
     """create the geometry library entry and a list of uv-set-library entries.
+       gdcreator is the data creator of obj and msh (created if None).
        Returns a geometry_data object.
     """
-    gdcreator = geom_data_creator (obj, msh, self.transform)
+    if gdcreator is None:
+      gdcreator = self.create_data_creator (obj, msh)
     geometry_entry = gdcreator.create_geometry ()
     uvset_entries = gdcreator.create_uvs ()
     return geometry_data (geometry_entry, uvset_entries)
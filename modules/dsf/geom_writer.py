@@ -1,26 +1,39 @@
-import bpy
+import bpy, logging
 import dsf.geom_create
+import dsf.mesh_provider
+import dsf.trace
 import urllib.parse as urp
 
+log = logging.getLogger ('geom-writer')
+
 class geom_writer (object):
   """class to write geometry definitions.
      also writes uvs.
   """
-  def __init__ (self, lib, scene, transform):
+  def __init__ (self, lib, scene, transform, manifest = None,
+                provider = None):
     """lib: used for creating actual files.
        scene: used for applying modifiers.
        transform: applied to vertices.
+       manifest: if given, an export_manifest; unchanged geometries
+         are not written again.
+       provider: the mesh_provider creating the meshes with modifiers
+         applied (one for scene if None).
     """
     self.lib = lib
     self.scene = scene
     self.transform = transform
+    self.manifest = manifest
+    self.provider = provider or dsf.mesh_provider.mesh_provider (scene)
 
-  def create_geom_file_content (self, obj, msh):
+  @dsf.trace.traced ()
+  def create_geom_file_content (self, obj, msh, gdcreator = None):
     """write an objects data as a mesh and return the json content.
        obj is required for the vertex groups and materials.
+       gdcreator is the data creator of obj and msh (created if None).
     """
     gcreator = dsf.geom_create.geom_creator (self.transform)
-    geo_data = gcreator.create_geometry_and_uvs (obj, msh)
+    geo_data = gcreator.create_geometry_and_uvs (obj, msh, gdcreator)
     geo = geo_data.geometry
     uvs = geo_data.uvs
     if uvs:
@@ -32,12 +45,18 @@ class geom_writer (object):
     }
     return data
 
+  @dsf.trace.traced ()
   def write_mesh_content (self, data):
     """write the geometry data to a file and return a
        url that references the geometry within.
     """
     geo_id = data['geometry_library'][0]['id']
     filepath = self.lib.write_geometry_data (geo_id, data)
+    return self.get_mesh_url (geo_id, filepath)
+
+  def get_mesh_url (self, geo_id, filepath):
+    """return the url of the geometry geo_id in the file filepath.
+    """
     quoted_id = urp.quote (geo_id)
     quoted_filepath = urp.quote (filepath)
     url = "%s#%s" % (quoted_filepath, quoted_id)
@@ -45,13 +64,41 @@ class geom_writer (object):
 
   def write_meshes_for_objects (self, objs):
     """write mesh definitions for the given objects.
+       if the library has a pipeline, the files are written in the
+       background while the next mesh gets extracted.
+       meshes with the same content (see get_content_hash) are written
+       once, their data all map to the same url.
+       each evaluated mesh is removed right after its data is extracted.
     """
     url_dic = {}
+    hash_urls = {}
+    gcreator = dsf.geom_create.geom_creator (self.transform)
+    precision = self.lib.precision
     groups = dsf.geom_create.group_objects_by_data (objs)
     for group in groups:
       obj = group[0]
-      key = obj.data
-      msh = obj.to_mesh (self.scene, True, 'PREVIEW')
-      file_content = self.create_geom_file_content (obj, msh)
-      url_dic[obj.data] = self.write_mesh_content (file_content)
+      geo_id = obj.data.name
+      libpath = self.lib.get_data_libpath (geo_id)
+      file_content = None
+      with dsf.trace.span ('evaluate_mesh', mesh = geo_id),\
+           self.provider.evaluated (obj) as msh:
+        gdcreator = gcreator.create_data_creator (obj, msh)
+        content_hash = gdcreator.get_content_hash (precision)
+        is_current = self.manifest is not None and\
+          self.manifest.is_current (geo_id, content_hash, libpath)
+        if content_hash not in hash_urls and not is_current:
+          file_content = self.create_geom_file_content (obj, msh, gdcreator)
+      if content_hash in hash_urls:
+        log.info ("%s: same geometry as %s", obj.data.name,
+                  hash_urls[content_hash])
+      elif is_current:
+        log.info ("%s: unchanged", obj.data.name)
+        hash_urls[content_hash] = self.get_mesh_url (geo_id, libpath)
+        self.manifest.add (geo_id, content_hash, libpath)
+      else:
+        hash_urls[content_hash] = self.write_mesh_content (file_content)
+        if self.manifest is not None:
+          self.manifest.add (geo_id, content_hash, libpath)
+      url_dic[obj.data] = hash_urls[content_hash]
+    self.provider.log_stats ()
     return url_dic
@@ -0,0 +1,233 @@
+import json, gzip, math, numbers
+import numpy as np
+
+# number of rows that get formatted at once.
+chunk_rows = 8192
+
+class array_rows (object):
+  """a list of rows of equal length (eg. vertex coordinates) that is
+     written directly from an array.
+  """
+  def __init__ (self, values, width = None):
+    """values is an array of shape (n, width) or a flat array.
+    """
+    values = np.asarray (values)
+    if width is not None:
+      values = values.reshape (-1, width)
+    self.values = values
+  def __len__ (self):
+    return len (self.values)
+  def tolist (self):
+    return self.values.tolist ()
+
+class ragged_rows (object):
+  """a list of rows of different length (eg. polygons) that is written
+     directly from a flat array: row i is values[offsets[i]:offsets[i+1]].
+  """
+  def __init__ (self, values, offsets):
+    self.values = np.asarray (values)
+    self.offsets = np.asarray (offsets)
+  def __len__ (self):
+    return len (self.offsets) - 1
+  def get_lengths (self):
+    return np.diff (self.offsets)
+  def tolist (self):
+    flat = self.values.tolist ()
+    bounds = self.offsets.tolist ()
+    return [flat[bounds[i]:bounds[i+1]] for i in range (len (self))]
+
+def is_number (value):
+  return isinstance (value, numbers.Number) and not isinstance (value, bool)
+
+def is_number_list (value):
+  return isinstance (value, (list, tuple)) and all (map (is_number, value))
+
+class json_stream_writer (object):
+  """write json data to a stream. dictionaries and lists of objects are
+     indented like json.dump does, but lists of numbers are written on a
+     single line and lists of number-lists (and array_rows/ragged_rows)
+     get one line per row.
+  """
+  def __init__ (self, ofh, indent = 2, precision = 7, sort_keys = False):
+    """precision is the number of significant digits of floats; if
+       None, floats are written with repr, so they read back exactly.
+       nan and inf cannot be written and raise a ValueError.
+    """
+    self.ofh = ofh
+    self.indent = indent
+    self.sort_keys = sort_keys
+    if precision is None:
+      self.float_fmt = '%r'
+    else:
+      self.float_fmt = '%%.%dg' % (precision)
+
+  def write (self, data):
+    """write the json representation of data.
+    """
+    self.write_value (data, 0)
+    self.ofh.write ('\n')
+
+  def format_number (self, value):
+    if isinstance (value, numbers.Integral):
+      return '%d' % (value)
+    value = float (value)
+    if not math.isfinite (value):
+      raise ValueError ("cannot write %r as json" % (value))
+    return self.float_fmt % (value)
+
+  def check_finite (self, values):
+    """raise a ValueError if the array values contains nan or inf.
+    """
+    if np.issubdtype (values.dtype, np.inexact)\
+       and not np.isfinite (values).all ():
+      raise ValueError ("cannot write nan or inf as json")
+
+  def get_format (self, dtype):
+    if np.issubdtype (dtype, np.integer):
+      return '%d'
+    else:
+      return self.float_fmt
+
+  def write_value (self, value, level):
+    if isinstance (value, dict):
+      self.write_dict (value, level)
+    elif isinstance (value, array_rows):
+      self.write_array_rows (value.values, level)
+    elif isinstance (value, ragged_rows):
+      self.write_ragged_rows (value, level)
+    elif isinstance (value, np.ndarray) and value.dtype == np.bool_:
+      self.write_list (value.tolist (), level)
+    elif isinstance (value, np.ndarray):
+      if value.ndim == 1:
+        self.write_array_rows (value.reshape (1, -1), level, inline = True)
+      else:
+        self.write_array_rows (value.reshape (len (value), -1), level)
+    elif isinstance (value, (list, tuple)):
+      self.write_list (value, level)
+    elif isinstance (value, np.generic):
+      # numpy scalars (eg. np.bool_) as their python value.
+      self.write_value (value.item (), level)
+    elif is_number (value):
+      self.ofh.write (self.format_number (value))
+    else:
+      self.ofh.write (json.dumps (value, allow_nan = False))
+
+  def write_dict (self, value, level):
+    if len (value) == 0:
+      self.ofh.write ('{}')
+      return
+    keys = sorted (value.keys ()) if self.sort_keys else list (value.keys ())
+    prefix = ' ' * (self.indent * (level + 1))
+    self.ofh.write ('{\n')
+    for (i, key) in enumerate (keys):
+      if i > 0:
+        self.ofh.write (',\n')
+      self.ofh.write ('%s%s: ' % (prefix, json.dumps (str (key))))
+      self.write_value (value[key], level + 1)
+    self.ofh.write ('\n%s}' % (' ' * (self.indent * level)))
+
+  def write_list (self, value, level):
+    if len (value) == 0:
+      self.ofh.write ('[]')
+    elif is_number_list (value):
+      self.ofh.write\
+        ('[%s]' % (', '.join ([self.format_number (v) for v in value])))
+    elif all (map (is_number_list, value)):
+      self.write_rows\
+        ([[self.format_number (v) for v in row] for row in value], level)
+    else:
+      prefix = ' ' * (self.indent * (level + 1))
+      self.ofh.write ('[\n')
+      for (i, item) in enumerate (value):
+        if i > 0:
+          self.ofh.write (',\n')
+        self.ofh.write (prefix)
+        self.write_value (item, level + 1)
+      self.ofh.write ('\n%s]' % (' ' * (self.indent * level)))
+
+  def write_rows (self, rows, level):
+    """write rows given as lists of formatted numbers.
+    """
+    prefix = ' ' * (self.indent * (level + 1))
+    lines = ['%s[%s]' % (prefix, ', '.join (row)) for row in rows]
+    self.ofh.write ('[\n')
+    self.ofh.write (',\n'.join (lines))
+    self.ofh.write ('\n%s]' % (' ' * (self.indent * level)))
+
+  def write_array_rows (self, values, level, inline = False):
+    """write a 2d-array, one row per line (or a single row inline).
+    """
+    (n_rows, width) = values.shape
+    self.check_finite (values)
+    if inline:
+      fmt = self.get_format (values.dtype)
+      self.ofh.write ('[%s]' % (', '.join ([fmt] * width)
+                                % tuple (values[0].tolist ())))
+      return
+    if n_rows == 0:
+      self.ofh.write ('[]')
+      return
+    prefix = ' ' * (self.indent * (level + 1))
+    row_fmt = '%s[%s]' % (prefix, ', '.join ([self.get_format (values.dtype)]
+                                             * width))
+    self.ofh.write ('[\n')
+    for start in range (0, n_rows, chunk_rows):
+      chunk = values[start:start + chunk_rows]
+      if start > 0:
+        self.ofh.write (',\n')
+      self.ofh.write (',\n'.join ([row_fmt] * len (chunk))
+                      % tuple (chunk.ravel ().tolist ()))
+    self.ofh.write ('\n%s]' % (' ' * (self.indent * level)))
+
+  def write_ragged_rows (self, rows, level):
+    """write rows of different length. rows of equal length are
+       formatted together, then put back into their order.
+    """
+    n_rows = len (rows)
+    if n_rows == 0:
+      self.ofh.write ('[]')
+      return
+    prefix = ' ' * (self.indent * (level + 1))
+    self.check_finite (rows.values)
+    fmt = self.get_format (rows.values.dtype)
+    lengths = rows.get_lengths ()
+    lines = np.empty (n_rows, dtype = object)
+    for length in np.unique (lengths):
+      (sel,) = np.nonzero (lengths == length)
+      # gather the values of all rows with this length.
+      idx = (rows.offsets[sel][:,None] + np.arange (length)).ravel ()
+      row_fmt = '%s[%s]' % (prefix, ', '.join ([fmt] * int (length)))
+      formatted = ('\0'.join ([row_fmt] * len (sel))
+                   % tuple (rows.values[idx].tolist ()))
+      lines[sel] = formatted.split ('\0')
+    self.ofh.write ('[\n')
+    for start in range (0, n_rows, chunk_rows):
+      if start > 0:
+        self.ofh.write (',\n')
+      self.ofh.write (',\n'.join (lines[start:start + chunk_rows].tolist ()))
+    self.ofh.write ('\n%s]' % (' ' * (self.indent * level)))
+
+def open_output (filepath, compress = False, level = 6):
+  """open a file for writing text, gzip-compressed if compress is set.
+  """
+  if compress:
+    return gzip.open (filepath, 'wt', compresslevel = level,
+                      encoding = 'utf-8')
+  else:
+    return open (filepath, 'w', encoding = 'utf-8')
+
+def write_json (data, filepath, compress = False, level = 6, precision = 7,
+                indent = 2, sort_keys = False):
+  """write data to filepath (see json_stream_writer).
+     if compress is set, the file is gzip-compressed with the given level.
+  """
+  with open_output (filepath, compress, level) as ofh:
+    write_stream (data, ofh, precision = precision, indent = indent,
+                  sort_keys = sort_keys)
+
+def write_stream (data, ofh, precision = 7, indent = 2, sort_keys = False):
+  """write data to the open text stream ofh.
+  """
+  writer = json_stream_writer\
+    (ofh, indent = indent, precision = precision, sort_keys = sort_keys)
+  writer.write (data)
@@ -0,0 +1,87 @@
+import numpy as np
+
+import dsf.json_writer
+
+def matrix_to_array (matrix):
+  """convert a 3x3 or 4x4 matrix (eg. a mathutils.Matrix) to a 4x4 array.
+  """
+  rows = np.array ([list (row) for row in matrix], dtype = np.float64)
+  result = np.identity (4)
+  result[:len (rows),:len (rows)] = rows
+  return result
+
+def transform_coords (coords, matrix):
+  """transform an (n,3) array of coordinates with a single matrix
+     multiplication. matrix may be None, 3x3 or 4x4.
+  """
+  if matrix is None:
+    return coords
+  mat = matrix_to_array (matrix)
+  return coords @ mat[:3,:3].T + mat[:3,3]
+
+class mesh_buffers (object):
+  """the data of a mesh extracted into flat arrays:
+     coords: (vertices x 3) float64 coordinates (transformed)
+     loop_starts, loop_totals: first loop and number of loops per polygon
+     materials: material index per polygon
+     poly_verts: the vertex indices of all polygons, one polygon after
+       the other (polygon i is poly_verts[poly_offsets[i]:poly_offsets[i+1]])
+     loop_verts, loop_polys: vertex and polygon index of each loop (in
+       the order of the loops of the mesh).
+  """
+  def __init__ (self, msh, transform = None):
+    """read the data of mesh msh. coordinates are transformed
+       by the matrix transform (if not None).
+    """
+    n_verts = len (msh.vertices)
+    n_polys = len (msh.polygons)
+    n_loops = len (msh.loops)
+    coords = np.zeros (3 * n_verts, dtype = np.float32)
+    msh.vertices.foreach_get ('co', coords)
+    self.coords = transform_coords\
+      (coords.reshape (-1, 3).astype (np.float64), transform)
+    self.loop_starts = np.zeros (n_polys, dtype = np.int32)
+    self.loop_totals = np.zeros (n_polys, dtype = np.int32)
+    self.materials = np.zeros (n_polys, dtype = np.int32)
+    msh.polygons.foreach_get ('loop_start', self.loop_starts)
+    msh.polygons.foreach_get ('loop_total', self.loop_totals)
+    msh.polygons.foreach_get ('material_index', self.materials)
+    self.loop_verts = np.zeros (n_loops, dtype = np.int32)
+    msh.loops.foreach_get ('vertex_index', self.loop_verts)
+    self.poly_offsets = np.zeros (n_polys + 1, dtype = np.int64)
+    np.cumsum (self.loop_totals, out = self.poly_offsets[1:])
+    # index of the loops of all polygons, one polygon after the other.
+    self.poly_loops = np.repeat (self.loop_starts, self.loop_totals)\
+      + np.arange (self.poly_offsets[-1])\
+      - np.repeat (self.poly_offsets[:-1], self.loop_totals)
+    self.poly_verts = self.loop_verts[self.poly_loops]
+    self.loop_polys = np.zeros (n_loops, dtype = np.int32)
+    self.loop_polys[self.poly_loops] =\
+      np.repeat (np.arange (n_polys, dtype = np.int32), self.loop_totals)
+
+  def get_vertex_count (self):
+    return len (self.coords)
+
+  def get_polygon_count (self):
+    return len (self.loop_starts)
+
+  def get_polygon_rows (self, *columns):
+    """return the polygons as dsf.json_writer.ragged_rows: one row for
+       each polygon, containing the values of columns (arrays with one
+       value per polygon) followed by the vertex indices of the polygon.
+    """
+    n_polys = self.get_polygon_count ()
+    n_cols = len (columns)
+    row_offsets = self.poly_offsets + n_cols * np.arange (n_polys + 1)
+    flat = np.empty (row_offsets[-1], dtype = np.int64)
+    is_vert = np.ones (len (flat), dtype = bool)
+    for (col, values) in enumerate (columns):
+      flat[row_offsets[:-1] + col] = values
+      is_vert[row_offsets[:-1] + col] = False
+    flat[is_vert] = self.poly_verts
+    return dsf.json_writer.ragged_rows (flat, row_offsets)
+
+  def get_polygon_lists (self, *columns):
+    """same as get_polygon_rows, but returns a list of lists.
+    """
+    return self.get_polygon_rows (*columns).tolist ()
@@ -0,0 +1,84 @@
+import contextlib, logging, sys
+import bpy
+
+try:
+  import resource
+except ImportError:
+  # not available on windows.
+  resource = None
+
+log = logging.getLogger ('mesh-provider')
+
+def estimate_mesh_size (msh):
+  """rough estimate of the memory used by a mesh in bytes.
+  """
+  return 64 * len (msh.vertices) + 32 * len (msh.polygons)\
+    + (16 + 8 * len (msh.uv_layers)) * len (msh.loops)
+
+def get_peak_rss ():
+  """return the peak resident size of the process in bytes
+     (None if unknown).
+  """
+  if resource is None:
+    return None
+  peak = resource.getrusage (resource.RUSAGE_SELF).ru_maxrss
+  # linux reports kilobytes, macos bytes.
+  if sys.platform == 'darwin':
+    return peak
+  return peak * 1024
+
+class mesh_provider (object):
+  """create the evaluated meshes (modifiers applied) of objects and
+     remove them as soon as they are not needed any more, so no orphan
+     meshes are left in the blend data.
+  """
+  def __init__ (self, scene, max_live = 1):
+    """scene is used for evaluating the modifiers. max_live is the
+       number of temporary meshes that may exist at the same time.
+    """
+    self.scene = scene
+    self.max_live = max_live
+    self.live = {}
+    self.created = 0
+    self.peak_live = 0
+    self.peak_size = 0
+
+  def get_live_size (self):
+    return sum (self.live.values ())
+
+  @contextlib.contextmanager
+  def evaluated (self, obj):
+    """context manager providing the evaluated mesh of obj. The mesh
+       is removed when the context is left, so the data needed from it
+       must be extracted within the context.
+    """
+    if len (self.live) >= self.max_live:
+      raise RuntimeError ("more than %d temporary meshes" % (self.max_live))
+    msh = obj.to_mesh (self.scene, True, 'PREVIEW')
+    self.live[msh] = estimate_mesh_size (msh)
+    self.created += 1
+    self.peak_live = max (self.peak_live, len (self.live))
+    self.peak_size = max (self.peak_size, self.get_live_size ())
+    try:
+      yield msh
+    finally:
+      del self.live[msh]
+      bpy.data.meshes.remove (msh)
+
+  def get_stats (self):
+    """return a dictionary with the number of created meshes, the peak
+       number and estimated size of live meshes and the peak resident
+       size of the process.
+    """
+    return {
+      'created': self.created,
+      'peak_live': self.peak_live,
+      'peak_size': self.peak_size,
+      'peak_rss': get_peak_rss (),
+    }
+
+  def log_stats (self):
+    stats = self.get_stats ()
+    log.info ("%d meshes, at most %d live (%d bytes), peak rss %s",
+              stats['created'], stats['peak_live'], stats['peak_size'],
+              stats['peak_rss'])
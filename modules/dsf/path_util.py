@@ -1,4 +1,7 @@
-import os.path, os, json
+import os.path, os
+
+import dsf.json_writer
+import dsf.export_pipeline
 
 def find_libdir_head (filepath):
   """get the root of the library directory (directory that contains data).
@@ -18,12 +21,27 @@ def find_libdir_head (filepath):
 class daz_library (object):
   """class to manage some files within a daz library.
   """
-  def __init__ (self, filepath = None, group = ''):
+  def __init__ (self, filepath = None, group = '', compress = False,
+                level = 6, precision = 7):
     """initialize with a file within the library.
+       if compress is set, files are gzipped with the given level.
+       precision is the number of significant digits of floats.
     """
     self.indent = 2
     self.libdir = find_libdir_head (filepath)
     self.group = group
+    self.compress = compress
+    self.level = level
+    self.precision = precision
+    # if set, an export_pipeline that writes the files in the background.
+    self.pipeline = None
+  def get_options (self):
+    """return the options that change the written files.
+    """
+    return {
+      'compress': self.compress, 'level': self.level,
+      'precision': self.precision
+    }
   def get_abspath (self, libpath):
     """get the absolute filesystem path for a file within the library.
     """
@@ -43,14 +61,21 @@ class daz_library (object):
        if necessary.
     """
     abspath = self.get_abspath (libpath)
-    ofh = open (abspath, 'w')
-    return ofh
+    os.makedirs (os.path.dirname (abspath), exist_ok = True)
+    return dsf.json_writer.open_output (abspath, self.compress, self.level)
   def write_local_file (self, data, libpath):
-    """write an object to the local libpath.
+    """write an object to the local libpath. The file gets written
+       by the pipeline, if there is one.
     """
-    ofh = self.create_output_stream (libpath)
-    json.dump (data, ofh, indent = self.indent, sort_keys = True)
-    ofh.close ()
+    abspath = self.get_abspath (libpath)
+    opts = {
+      'compress': self.compress, 'level': self.level,
+      'precision': self.precision, 'indent': self.indent, 'sort_keys': True
+    }
+    if self.pipeline is not None:
+      self.pipeline.submit (data, abspath, **opts)
+    else:
+      dsf.export_pipeline.write_file (data, abspath, **opts)
     return libpath
   def write_geometry_data (self, id, data):
     """create a file in the library containing geometry definitions for
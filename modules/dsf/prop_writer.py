@@ -4,19 +4,28 @@ import dsf.path_util
 import dsf.geom_create
 import dsf.geom_writer
 import dsf.scene_writer
-import json, math
+import dsf.export_pipeline
+import dsf.export_manifest
+import dsf.trace
+import math
 import urllib.parse as urp
 
 class prop_writer (object):
   """write props for a single export-operation.
   """
-  def __init__ (self, filepath, transform, scene):
+  def __init__ (self, filepath, transform, scene, incremental = False,
+                **kwarg):
     """initialize state for writing to the given scene-file.
+       if incremental is set, only files whose content has changed since
+       the last export are written (see export_manifest).
+       kwarg are passed to the daz_library (compress, level, precision).
     """
-    self.lib = dsf.path_util.daz_library (filepath = filepath)
+    self.lib = dsf.path_util.daz_library (filepath = filepath, **kwarg)
     self.scene = scene
     self.duf_libpath = self.lib.get_libpath (filepath)
     self.transform = transform
+    self.incremental = incremental
+    self.manifest = None
   @classmethod
   def get_selected_objects (self, scene):
     """return the selected objects of the scene.
@@ -50,15 +59,14 @@ class prop_writer (object):
     return data
 
   def write_json (self, libpath, data):
-    ofh = self.lib.create_output_stream (libpath)
-    json.dump (data, ofh, indent = 2, sort_keys = True)
+    self.lib.write_local_file (data, libpath)
 
   def write_geometries (self, objs):
     """write the geometry definitions for the given objects.
        returns a mapping from obj-data to url.
     """
     geom_writer = dsf.geom_writer.geom_writer\
-      (self.lib, self.scene, self.transform)
+      (self.lib, self.scene, self.transform, self.manifest)
     data_dic = geom_writer.write_meshes_for_objects (objs)
     return data_dic
 
@@ -67,16 +75,39 @@ class prop_writer (object):
        data-dic contains a mapping from object data to url.
     """
     scene_writer = dsf.scene_writer.scene_writer (self.transform, data_dic)
+    if self.manifest is not None:
+      # hash the source data, so an unchanged scene file is not created.
+      content_hash = scene_writer.get_content_hash (objs)
+      current = self.manifest.is_current\
+        (self.duf_libpath, content_hash, self.duf_libpath)
+      self.manifest.add (self.duf_libpath, content_hash, self.duf_libpath)
+      if current:
+        return
     data = scene_writer.create_scene_file (objs)
     self.lib.write_local_file (data, self.duf_libpath)
 
   def write_scene (self, ctx):
-    """write the scene file and all geometry files.
+    """write the scene file and all geometry files. The data is
+       extracted here, the files are written in the background.
     """
     scene = ctx.scene
     objs = self.get_selected_objects (self.scene)
-    data_dic = self.write_geometries (objs)
-    self.write_objects (objs, data_dic)
+    if self.incremental:
+      self.manifest = dsf.export_manifest.export_manifest\
+        (self.lib.libdir, self.duf_libpath, self.lib.get_options ())
+    with dsf.export_pipeline.export_pipeline () as pipeline:
+      self.lib.pipeline = pipeline
+      try:
+        with dsf.trace.span ('write_geometries', items = len (objs)):
+          data_dic = self.write_geometries (objs)
+        with dsf.trace.span ('write_objects', items = len (objs)):
+          self.write_objects (objs, data_dic)
+      finally:
+        self.lib.pipeline = None
+    if self.manifest is not None:
+      with dsf.trace.span ('save_manifest'):
+        self.manifest.prune ()
+        self.manifest.save ()
 
 def make_transform (scale, rotate):
   if rotate:
@@ -85,13 +116,14 @@ def make_transform (scale, rotate):
     trans = scale * mathutils.Matrix.Identity (3)
   return trans.to_4x4 ()
 
-def export_prop (ctx, filepath, group, scale, rotate):
+def export_prop (ctx, filepath, group, scale, rotate, **kwarg):
   """export the active object to the filepath.
      group is a hint for the subdirectory.
      scale is a scale factor that is applied to exported objects.
      if rotate is true, rotate geometry by 90degrees around x.
+     kwarg are the output options compress, level and precision.
   """
   scene = ctx.scene
   transform = make_transform (scale, rotate)
-  writer = prop_writer (filepath, transform, scene)
+  writer = prop_writer (filepath, transform, scene, **kwarg)
   writer.write_scene (ctx)
@@ -1,9 +1,12 @@
 import bpy
 import mathutils
 import math
+import hashlib
 import urllib.parse as urp
 from collections import namedtuple
 
+import dsf.trace
+
 vtree_entry = namedtuple ('vtree_entry', ['ancestor', 'matrix'])
 
 def get_parent_in (obj, parents):
@@ -28,23 +31,86 @@ def make_url (file, id):
     url = file_url
   return url
 
+class hierarchy_resolver (object):
+  """find for exported objects their nearest exported ancestor and the
+     transformation relative to it. The accumulated transformation of
+     every object that is not exported is calculated only once, so
+     objects sharing ancestors do not repeat the matrix products.
+  """
+  def __init__ (self, objs):
+    self.objs = list (objs)
+    self.obj_set = set (self.objs)
+    # mapping non-exported object -> vtree_entry, where matrix is the
+    # product of the local matrices up to the ancestor (None: identity).
+    self.chains = {}
+    self.entries = {}
+
+  def get_chain (self, obj):
+    """return the vtree_entry of the ancestor-chain starting at obj
+       (which can be None or an exported object).
+    """
+    # walk up until an object with a known result is found.
+    pending = []
+    while obj is not None and obj not in self.obj_set\
+          and obj not in self.chains:
+      pending.append (obj)
+      obj = obj.parent
+    if obj is None:
+      entry = vtree_entry (None, None)
+    elif obj in self.obj_set:
+      entry = vtree_entry (obj, None)
+    else:
+      entry = self.chains[obj]
+    # then fill in the results top-down.
+    for obj in reversed (pending):
+      if entry.matrix is None:
+        matrix = obj.matrix_local
+      else:
+        matrix = entry.matrix * obj.matrix_local
+      entry = vtree_entry (entry.ancestor, matrix)
+      self.chains[obj] = entry
+    return entry
+
+  def get_entry (self, obj):
+    """return the vtree_entry (ancestor, matrix) of the exported obj.
+    """
+    entry = self.entries.get (obj)
+    if entry is None:
+      chain = self.get_chain (obj.parent)
+      if chain.matrix is None:
+        matrix = obj.matrix_local
+      else:
+        matrix = chain.matrix * obj.matrix_local
+      entry = vtree_entry (chain.ancestor, matrix)
+      self.entries[obj] = entry
+    return entry
+
+  def get_vtree (self):
+    """return the dictionary object->vtree_entry of all objects.
+    """
+    return { obj: self.get_entry (obj) for obj in self.obj_set }
+
+  def get_parent_first (self):
+    """return the exported objects ordered such that every object comes
+       after its ancestor. Otherwise the original order is kept.
+    """
+    ordered = []
+    done = set ()
+    for obj in self.objs:
+      # collect the ancestors not yet written, then write them top-down.
+      pending = []
+      while obj is not None and obj not in done:
+        pending.append (obj)
+        done.add (obj)
+        obj = self.get_entry (obj).ancestor
+      ordered.extend (reversed (pending))
+    return ordered
+
 def make_vtree (objs):
   """create a ancestor-relationship for all objects in objs.
      Returns a dictionary object->{ancestor, transformation}
   """
-  obj_set = set (objs)
-  def walk_up_hierarchy (obj, matrix):
-    while obj and obj not in obj_set:
-      matrix = obj.matrix_local * matrix
-      obj = obj.parent
-    return vtree_entry (obj, matrix)
-  anc_dic = {}
-  for obj in obj_set:
-    if obj not in anc_dic:
-      matrix = obj.matrix_local
-      entry = walk_up_hierarchy (obj.parent, matrix)
-      anc_dic[obj] = entry
-  return anc_dic
+  return hierarchy_resolver (objs).get_vtree ()
 
 class scene_writer (object):
   """write scene subset files.
@@ -101,11 +167,36 @@ class scene_writer (object):
     data.update (self.make_transformations (hier_entry.matrix))
     return data
 
+  def get_content_hash (self, objs):
+    """return a hash of the data the scene file of objs is created
+       from: the transformation, and the names, parents and local
+       matrices of the objects and their ancestors, together with the
+       urls of their geometries. This is much cheaper than creating the
+       scene file, so unchanged scenes need not be created at all.
+    """
+    digest = hashlib.blake2b (digest_size = 16)
+    def update (*values):
+      digest.update (repr (values).encode ('utf-8'))
+    update ([list (row) for row in self.transform])
+    seen = set ()
+    for obj in objs:
+      update ('node', obj.name, self.objmap[obj.data])
+      while obj is not None and obj not in seen:
+        seen.add (obj)
+        parent = obj.parent
+        update (obj.name, parent.name if parent else None,
+                [list (row) for row in obj.matrix_local])
+        obj = parent
+    return digest.hexdigest ()
+
+  @dsf.trace.traced ()
   def create_scene_file (self, objs):
     """create a scene-subset with the given objects.
     """
-    vtree = make_vtree (objs)
-    scene_nodes = [self.create_node_ref (obj, vtree) for obj in objs]
+    resolver = hierarchy_resolver (objs)
+    vtree = resolver.get_vtree ()
+    scene_nodes = [self.create_node_ref (obj, vtree)
+                   for obj in resolver.get_parent_first ()]
     data = {
       "asset_info": {},
       "scene": {
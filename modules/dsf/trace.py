@@ -0,0 +1,326 @@
+# nested timed spans for finding out where imports and exports spend
+# their time. Tracing is off unless a tracer is active; instrumented
+# code then only pays for a global lookup:
+#   with dsf.trace.span ('intern_geometry') as sp:
+#     ...
+#     sp.add_items (len (faces))
+# operators wrap their work in dsf.trace.session, which activates a
+# tracer if enabled by the environment:
+#   DSF_TRACE=1          trace operators and log a text report.
+#   DSF_TRACE_MEMORY=1   also record the tracemalloc peak of each span.
+#   DSF_TRACE_DIR=path   write a json report and a chrome trace
+#                        (chrome://tracing, perfetto) into path.
+# json, inspect and tracemalloc are imported where needed, this module
+# is loaded at blender startup.
+import contextlib, functools, logging, os, os.path, re
+import threading, time
+
+log = logging.getLogger ('dsf-trace')
+
+# the active tracer; None if tracing is off.
+active = None
+
+# settings of the operator sessions, see configure.
+settings = {
+  'enabled': os.environ.get ('DSF_TRACE', '') not in ('', '0'),
+  'memory': os.environ.get ('DSF_TRACE_MEMORY', '') not in ('', '0'),
+  'output_dir': os.environ.get ('DSF_TRACE_DIR') or None,
+}
+
+class null_span (object):
+  """the span returned while tracing is off; does nothing.
+  """
+  __slots__ = ()
+  def __enter__ (self):
+    return self
+  def __exit__ (self, *exc):
+    return False
+  def add_items (self, count):
+    pass
+  def set_arg (self, key, value):
+    pass
+
+null = null_span ()
+
+class span_rec (object):
+  """a single timed span. Spans are context managers; entering pushes
+     them on the span stack of the current thread.
+  """
+  __slots__ = ('tracer', 'name', 'args', 'items', 'tid', 'parent',
+               'depth', 'start', 'end', 'peak', 'running_peak')
+  def __init__ (self, tracer, name, items, args):
+    self.tracer = tracer
+    self.name = name
+    self.args = args
+    self.items = items
+    self.tid = None
+    self.parent = None
+    self.depth = 0
+    self.start = None
+    self.end = None
+    self.peak = None
+    self.running_peak = 0
+
+  def add_items (self, count):
+    """add to the number of items (vertices, files, ...) processed.
+    """
+    self.items = (self.items or 0) + count
+
+  def set_arg (self, key, value):
+    self.args[key] = value
+
+  def __enter__ (self):
+    self.tracer.enter (self)
+    return self
+
+  def __exit__ (self, *exc):
+    self.tracer.exit (self)
+    return False
+
+  def get_seconds (self):
+    return self.end - self.start
+
+class tracer (object):
+  """collect the spans of all threads.
+  """
+  def __init__ (self, memory = False):
+    """memory: record the peak of traced memory (tracemalloc) within
+       each span. This slows down the traced code considerably.
+    """
+    self.memory = memory
+    self.spans = []
+    self.local = threading.local ()
+    self.lock = threading.Lock ()
+    self.origin = time.perf_counter ()
+    self.started_tracemalloc = False
+
+  def start (self):
+    if self.memory:
+      import tracemalloc
+      if not tracemalloc.is_tracing ():
+        tracemalloc.start ()
+        self.started_tracemalloc = True
+
+  def stop (self):
+    if self.started_tracemalloc:
+      import tracemalloc
+      tracemalloc.stop ()
+      self.started_tracemalloc = False
+
+  def get_stack (self):
+    stack = getattr (self.local, 'stack', None)
+    if stack is None:
+      stack = self.local.stack = []
+    return stack
+
+  def span (self, name, items = None, args = None):
+    return span_rec (self, name, items, args or {})
+
+  def enter (self, rec):
+    stack = self.get_stack ()
+    if stack:
+      rec.parent = stack[-1]
+      rec.depth = len (stack)
+    rec.tid = threading.get_ident ()
+    if self.memory:
+      import tracemalloc
+      if tracemalloc.is_tracing ():
+        # the peak is reset for each span, so the peak reached so far
+        # is kept in the enclosing span.
+        peak = tracemalloc.get_traced_memory ()[1]
+        for outer in stack:
+          outer.running_peak = max (outer.running_peak, peak)
+        if hasattr (tracemalloc, 'reset_peak'):
+          # python 3.9; before, the peak of a span is the overall peak.
+          tracemalloc.reset_peak ()
+    stack.append (rec)
+    rec.start = time.perf_counter ()
+
+  def exit (self, rec):
+    rec.end = time.perf_counter ()
+    stack = self.get_stack ()
+    if stack and stack[-1] is rec:
+      stack.pop ()
+    if self.memory:
+      import tracemalloc
+      if tracemalloc.is_tracing ():
+        rec.peak = max (rec.running_peak,
+                        tracemalloc.get_traced_memory ()[1])
+        for outer in stack:
+          outer.running_peak = max (outer.running_peak, rec.peak)
+    with self.lock:
+      self.spans.append (rec)
+
+  def get_path (self, rec):
+    names = []
+    while rec is not None:
+      names.append (rec.name)
+      rec = rec.parent
+    return '/'.join (reversed (names))
+
+  def get_summary (self):
+    """aggregate the spans by their path (the names of the enclosing
+       spans and their own). Returns a list of dictionaries in order of
+       the first start of each path.
+    """
+    entries = {}
+    child_seconds = {}
+    for rec in self.spans:
+      if rec.parent is not None:
+        child_seconds[id (rec.parent)] = child_seconds.get\
+          (id (rec.parent), 0) + rec.get_seconds ()
+    for rec in sorted (self.spans, key = lambda rec: rec.start):
+      path = self.get_path (rec)
+      entry = entries.get (path)
+      if entry is None:
+        entry = entries[path] = {
+          'path': path, 'name': rec.name, 'depth': rec.depth, 'calls': 0,
+          'seconds': 0.0, 'self_seconds': 0.0, 'items': None,
+          'peak_bytes': None,
+        }
+      entry['calls'] += 1
+      entry['seconds'] += rec.get_seconds ()
+      entry['self_seconds'] += rec.get_seconds ()\
+        - child_seconds.get (id (rec), 0)
+      if rec.items is not None:
+        entry['items'] = (entry['items'] or 0) + rec.items
+      if rec.peak is not None:
+        entry['peak_bytes'] = max (entry['peak_bytes'] or 0, rec.peak)
+    return list (entries.values ())
+
+  def format_report (self):
+    """return the summary as a text table.
+    """
+    lines = ["%-48s %6s %10s %10s %10s %12s"
+             % ('span', 'calls', 'seconds', 'self', 'items', 'peak mem')]
+    for entry in self.get_summary ():
+      lines.append ("%-48s %6d %10.4f %10.4f %10s %12s" % (
+        '  ' * entry['depth'] + entry['name'], entry['calls'],
+        entry['seconds'], entry['self_seconds'],
+        '' if entry['items'] is None else entry['items'],
+        '' if entry['peak_bytes'] is None else entry['peak_bytes']))
+    return '\n'.join (lines)
+
+  def write_report (self, filepath):
+    """write the summary as json.
+    """
+    import json
+    with open (filepath, 'w', encoding = 'utf-8') as ofh:
+      json.dump ({'memory': self.memory, 'spans': self.get_summary ()},
+                 ofh, indent = 2)
+
+  def get_chrome_events (self):
+    events = []
+    for rec in sorted (self.spans, key = lambda rec: rec.start):
+      args = dict (rec.args)
+      if rec.items is not None:
+        args['items'] = rec.items
+      if rec.peak is not None:
+        args['peak_bytes'] = rec.peak
+      events.append ({
+        'name': rec.name, 'ph': 'X', 'pid': os.getpid (), 'tid': rec.tid,
+        'ts': (rec.start - self.origin) * 1e6,
+        'dur': rec.get_seconds () * 1e6,
+        'args': {key: value if isinstance (value, (int, float, bool))
+                 else str (value) for (key, value) in args.items ()},
+      })
+    return events
+
+  def write_chrome_trace (self, filepath):
+    """write the spans in the trace event format of chrome://tracing.
+    """
+    import json
+    with open (filepath, 'w', encoding = 'utf-8') as ofh:
+      json.dump ({'traceEvents': self.get_chrome_events (),
+                  'displayTimeUnit': 'ms'}, ofh)
+
+def span (name, items = None, **args):
+  """return a span for name, a context manager timing its body. items
+     is the number of processed items, args are shown in the trace.
+  """
+  if active is None:
+    return null
+  return active.span (name, items, args)
+
+def traced (name = None):
+  """decorator putting each call of a function into a span (named
+     after the function by default). For generator functions the span
+     lasts until the generator is exhausted.
+  """
+  def decorate (func):
+    import inspect
+    label = name or func.__name__
+    if inspect.isgeneratorfunction (func):
+      @functools.wraps (func)
+      def generator_wrapper (*arg, **kwarg):
+        if active is None:
+          return (yield from func (*arg, **kwarg))
+        with active.span (label):
+          return (yield from func (*arg, **kwarg))
+      return generator_wrapper
+    @functools.wraps (func)
+    def wrapper (*arg, **kwarg):
+      if active is None:
+        return func (*arg, **kwarg)
+      with active.span (label):
+        return func (*arg, **kwarg)
+    return wrapper
+  return decorate
+
+def enable (memory = False):
+  """activate a new tracer and return it.
+  """
+  global active
+  active = tracer (memory)
+  active.start ()
+  return active
+
+def disable ():
+  """stop tracing. Returns the tracer that was active.
+  """
+  global active
+  (rec, active) = (active, None)
+  if rec is not None:
+    rec.stop ()
+  return rec
+
+def configure (enabled = None, memory = None, output_dir = None):
+  """change the settings of the operator sessions (the defaults come
+     from the environment).
+  """
+  for (key, value) in [('enabled', enabled), ('memory', memory),
+                       ('output_dir', output_dir)]:
+    if value is not None:
+      settings[key] = value
+
+def get_report_name (name):
+  return "%s-%s" % (re.sub (r'[^\w.-]+', '_', name),
+                    time.strftime ('%Y%m%d-%H%M%S'))
+
+@contextlib.contextmanager
+def session (name, **args):
+  """trace the body (eg. the execute function of an operator) as a span
+     named name. If no tracer is active and tracing is enabled in the
+     settings, a tracer is activated for the session; the report is
+     logged and written to the output directory at the end.
+  """
+  if active is not None or not settings['enabled']:
+    with span (name, **args) as rec:
+      yield rec
+    return
+  rec = enable (settings['memory'])
+  try:
+    with rec.span (name, None, args) as root:
+      yield root
+  finally:
+    disable ()
+    # logged as warnings, so the report requested by DSF_TRACE shows
+    # up without configuring logging.
+    log.warning ("%s:\n%s", name, rec.format_report ())
+    output_dir = settings['output_dir']
+    if output_dir is not None:
+      os.makedirs (output_dir, exist_ok = True)
+      basename = os.path.join (output_dir, get_report_name (name))
+      rec.write_report (basename + '.json')
+      rec.write_chrome_trace (basename + '.trace.json')
+      log.warning ("wrote trace %s.trace.json", basename)
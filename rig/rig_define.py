@@ -2,6 +2,8 @@ import math, logging
 import mathutils
 import bpy
 
+from .. import dsf_trace
+
 log = logging.getLogger ('rig-def')
 
 def create_blender_armature (name, ctx):
@@ -142,6 +144,7 @@ def configure_bones (armdat, bone_mapping, armobj):
     order = si_bone.get ('rotation_order')
     bbone.rotation_mode = order
 
+@dsf_trace.traced ()
 def define_armature (si_arm, ctx):
   """create a blender-armature object from the given armature-data.
      blender-function.
@@ -371,3 +371,25 @@ class average_map (weight_map):
     """return the union of all subdomains.
     """
     return (self.min, self.max)
+
+class index_map (weight_map):
+  """a map that looks up the weights of another map through an
+     index table (eg. when the vertex order of a mesh has changed).
+  """
+  def __init__ (self, other, indices, **kwarg):
+    """initialize with another map other. indices[i] is the index within
+       other for vertex i, or negative if vertex i has no weight.
+    """
+    super (index_map, self).__init__ (**kwarg)
+    self.other = other
+    self.indices = indices
+  def get_weight (self, index):
+    """return the weight of the vertex mapped to index.
+    """
+    if 0 <= index < len (self.indices):
+      other_index = int (self.indices[index])
+      if other_index >= 0:
+        return self.other.get_weight (other_index)
+    return 0
+  def get_domain (self):
+    return (0, len (self.indices))
@@ -1,3 +1,4 @@
+from .. import dsf_trace
 
 def make_lookup (obj):
   """create a lookup function that takes a vertex index and
@@ -17,6 +18,7 @@ def make_vertex_group (obj, gname):
   vg = obj.vertex_groups.new (name = gname)
   return vg
 
+@dsf_trace.traced ()
 def paint_group (wmap, mshobj, gname):
   """paint vertices is the mesh data object mshobj.
      This creates or redefines the group named gname.